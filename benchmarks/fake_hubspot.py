@@ -0,0 +1,333 @@
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SEARCH_RESULT_LIMIT = 10000
+FIRST_CREATEDATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DEAL_NAMES = ["Custom API Integration", "Cybersecurity Bundle", "ITSM Implementation", "Private Cloud Migration", "Platform Customization"]
+SEARCH_OPERATORS = {
+    "EQ": lambda a, b: a == b,
+    "GT": lambda a, b: a > b,
+    "GTE": lambda a, b: a >= b,
+    "LT": lambda a, b: a < b,
+    "LTE": lambda a, b: a <= b
+}
+
+
+def iso(moment):
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+def epoch_ms(timestamp):
+    return int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp() * 1000)
+
+
+# 🔹 Lokaler Stand-in für die HubSpot CRM API, so weit Generator und Exporter sie nutzen
+# Deals mit Paging und Company-Associations, Search (inkl. 10k-Limit), batch/create, Deal und Company batch/read,
+# v4 Associations. Optional: feste Latenz pro Request und ein Burst-Limit mit 429 + Retry-After wie bei HubSpot.
+# batch/create lehnt wie HubSpot den ganzen Chunk mit 400 ab, wenn ein Deal ein ungültiges `amount` hat;
+# mit partial_batches=True legt es stattdessen die gültigen an und meldet die übrigen per 207 Multi-Status.
+class FakeHubSpot:
+    def __init__(self, deals=0, companies=None, latency=0.0, burst=None, interval=10.0, seed=1, partial_batches=False):
+        self.latency = latency
+        self.burst = burst
+        self.interval = interval
+        self.partial_batches = partial_batches
+        self.lock = threading.Lock()
+        self.requests = Counter()  # "METHOD /pfad" -> Anzahl
+        self.scripted = {}  # "METHOD /pfad" -> Liste vorgegebener (Status, Header) für die nächsten Requests
+        self.rate_limited = 0
+        self.window_start = time.monotonic()
+        self.window_count = 0
+
+        rng = random.Random(seed)
+        company_count = companies or max(10, deals // 20)
+        self.companies = {str(900000 + i): f"Company {i}" for i in range(company_count)}
+        company_ids = list(self.companies)
+        self.deals = []
+        self.search_cache = {}  # Filter + Sortierung -> Treffer, damit Paging nicht jedes Mal alle Deals filtert
+        self.archived = 0  # gelöschte Deals
+        modified = FIRST_CREATEDATE + timedelta(days=700)
+        for i in range(deals):
+            created = FIRST_CREATEDATE + timedelta(minutes=rng.randint(0, 600 * 24 * 60))
+            self.add_deal({
+                "dealname": rng.choice(DEAL_NAMES),
+                "amount": str(rng.randint(500, 50000)),
+                "deal_type": rng.choice(["newbusiness", "existingbusiness"]),
+                "createdate": iso(created),
+                "hs_lastmodifieddate": iso(modified + timedelta(seconds=i)),
+                "company_name": ""
+            }, rng.choice(company_ids) if i % 7 else None)
+        self.server = None
+        self.thread = None
+
+    def add_deal(self, properties, company_id=None):
+        with self.lock:
+            deal_id = str(len(self.deals) + 1)
+            properties = dict(properties, hs_object_id=deal_id)
+            properties.setdefault("hs_lastmodifieddate", iso(datetime.now(timezone.utc)))
+            self.deals.append({"id": deal_id, "properties": properties, "company": company_id})
+            self.search_cache.clear()
+        return deal_id
+
+    # Deal ändern (z. B. für Tests des Watch-Modus), setzt hs_lastmodifieddate auf jetzt; company_id ordnet ihn neu zu
+    def update_deal(self, deal_id, properties, company_id=None):
+        with self.lock:
+            deal = self.deals[int(deal_id) - 1]
+            deal["properties"].update(properties, hs_lastmodifieddate=iso(datetime.now(timezone.utc)))
+            if company_id is not None:
+                deal["company"] = company_id
+            self.search_cache.clear()
+
+    # Deal löschen: bleibt als Lücke in der Liste stehen, damit IDs und Paging-Offsets gültig bleiben
+    def delete_deal(self, deal_id):
+        with self.lock:
+            self.deals[int(deal_id) - 1]["archived"] = True
+            self.archived += 1
+            self.search_cache.clear()
+
+    # Die nächsten Requests auf `method path` bekommen der Reihe nach diese Antworten, z. B. (429, {"Retry-After": "1"});
+    # bei Status < 400 wird der Request normal beantwortet und bekommt nur die Header (z. B. X-HubSpot-RateLimit-*)
+    def script(self, method, path, *responses):
+        with self.lock:
+            self.scripted.setdefault(f"{method} {path}", []).extend(
+                response if isinstance(response, tuple) else (response, {}) for response in responses
+            )
+
+    def next_scripted(self, method, path):
+        with self.lock:
+            queue = self.scripted.get(f"{method} {path}")
+            return queue.pop(0) if queue else None
+
+    def active_deals(self):
+        return [deal for deal in self.deals if not deal.get("archived")] if self.archived else self.deals
+
+    # Burst-Fenster wie HubSpot: `burst` Requests pro `interval` Sekunden, danach 429
+    def admit(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= self.interval:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            if self.burst is None:
+                return True, None
+            if self.window_count > self.burst:
+                self.rate_limited += 1
+                return False, self.interval - (now - self.window_start)
+            return True, self.burst - self.window_count
+
+    def stats(self):
+        with self.lock:
+            return {"requests": sum(self.requests.values()), "by_endpoint": dict(self.requests), "rate_limited": self.rate_limited}
+
+    def start(self, port=0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    # Deal im Format der List-API, mit Company-Association
+    @staticmethod
+    def listed(deal, properties=None):
+        props = deal["properties"] if properties is None else {p: deal["properties"].get(p) for p in properties}
+        result = {"id": deal["id"], "properties": props}
+        if deal["company"]:
+            result["associations"] = {"companies": {"results": [{"id": deal["company"], "type": "deal_to_company"}]}}
+        return result
+
+    def list_deals(self, query):
+        after = int(query.get("after", 0))
+        limit = min(int(query.get("limit", 10)), 100)
+        properties = query["properties"].split(",") if query.get("properties") else None
+        deals = self.active_deals()
+        page = deals[after:after + limit]
+        response = {"results": [self.listed(deal, properties) for deal in page]}
+        if after + limit < len(deals):
+            response["paging"] = {"next": {"after": str(after + limit)}}
+        return 200, response
+
+    def search_deals(self, body):
+        after = int(body.get("after", 0))
+        if after >= SEARCH_RESULT_LIMIT:
+            return 400, {"status": "error", "category": "VALIDATION_ERROR", "message": "Search results are limited to 10,000"}
+
+        def value(deal, name):
+            if name == "hs_object_id":
+                return int(deal["id"])
+            return epoch_ms(deal["properties"][name])
+
+        filters = [f for group in body.get("filterGroups", [])[:1] for f in group.get("filters", [])]
+        sorts = body.get("sorts", [{"propertyName": "hs_object_id"}])
+        key = json.dumps([filters, sorts], sort_keys=True)
+        hits = self.search_cache.get(key)
+        if hits is None:
+            hits = [
+                deal for deal in self.active_deals()
+                if all(SEARCH_OPERATORS[f["operator"]](value(deal, f["propertyName"]), int(f["value"])) for f in filters)
+            ]
+            for sort in reversed(sorts):
+                hits.sort(key=lambda deal: value(deal, sort["propertyName"]), reverse=sort.get("direction") == "DESCENDING")
+            self.search_cache[key] = hits
+        limit = min(int(body.get("limit", 10)), 100)
+        page = hits[after:after + limit]
+        properties = body.get("properties")
+        response = {"total": len(hits), "results": [{"id": d["id"], "properties": self.listed(d, properties)["properties"]} for d in page]}
+        if after + limit < len(hits):
+            response["paging"] = {"next": {"after": str(after + limit)}}
+        return 200, response
+
+    # HubSpot-Fehler für ein ungültiges amount, sonst None
+    @staticmethod
+    def invalid_amount(properties):
+        try:
+            float(properties.get("amount") or 0)
+        except (TypeError, ValueError):
+            return {"category": "VALIDATION_ERROR", "message": f"{properties['amount']!r} is not a valid number for amount"}
+        return None
+
+    def create_deal(self, body):
+        properties = body.get("properties", {})
+        error = self.invalid_amount(properties)
+        if error:
+            return 400, dict(error, status="error")
+        return 201, {"id": self.add_deal(properties), "properties": properties}
+
+    def create_deals(self, body):
+        errors = []
+        for item in body["inputs"]:
+            error = self.invalid_amount(item.get("properties", {}))
+            if error:
+                errors.append(dict(error, context={"objectWriteTraceId": [item.get("objectWriteTraceId")]}))
+        if errors and not self.partial_batches:
+            return 400, {"status": "error", "category": "VALIDATION_ERROR", "message": errors[0]["message"]}
+        failed = {trace_id for error in errors for trace_id in error["context"]["objectWriteTraceId"]}
+        results = [
+            {"id": self.add_deal(item.get("properties", {})), "properties": item.get("properties", {})}
+            for item in body["inputs"] if item.get("objectWriteTraceId") not in failed
+        ]
+        if errors:
+            return 207, {"status": "COMPLETE", "results": results, "errors": errors}
+        return 201, {"status": "COMPLETE", "results": results}
+
+    def read_deals(self, body):
+        found = [self.deals[int(item["id"]) - 1] for item in body["inputs"] if 0 < int(item["id"]) <= len(self.deals)]
+        found = [deal for deal in found if not deal.get("archived")]
+        response = {"status": "COMPLETE", "results": [
+            {"id": deal["id"], "properties": self.listed(deal, body.get("properties"))["properties"]} for deal in found
+        ]}
+        if len(found) < len(body["inputs"]):
+            response["errors"] = [{"category": "OBJECT_NOT_FOUND", "message": "Could not get some DEAL objects"}]
+            return 207, response
+        return 200, response
+
+    def read_companies(self, body):
+        found = [item["id"] for item in body["inputs"] if item["id"] in self.companies]
+        response = {"status": "COMPLETE", "results": [{"id": cid, "properties": {"name": self.companies[cid]}} for cid in found]}
+        if len(found) < len(body["inputs"]):
+            response["errors"] = [{"category": "OBJECT_NOT_FOUND", "message": "Could not get some COMPANY objects"}]
+            return 207, response
+        return 200, response
+
+    def read_associations(self, body):
+        by_id = {deal["id"]: deal for deal in self.active_deals()}
+        results = [
+            {"from": {"id": item["id"]}, "to": [{"toObjectId": int(by_id[item["id"]]["company"]), "associationTypes": []}]}
+            for item in body["inputs"] if item["id"] in by_id and by_id[item["id"]]["company"]
+        ]
+        return 200, {"status": "COMPLETE", "results": results}
+
+    def route(self, method, path, query, body):
+        if method == "GET" and path == "/crm/v3/objects/deals":
+            return self.list_deals(query)
+        if method == "POST" and path == "/crm/v3/objects/deals":
+            return self.create_deal(body)
+        if method == "POST" and path == "/crm/v3/objects/deals/batch/create":
+            return self.create_deals(body)
+        if method == "POST" and path == "/crm/v3/objects/deals/batch/read":
+            return self.read_deals(body)
+        if method == "POST" and path == "/crm/v3/objects/deals/search":
+            return self.search_deals(body)
+        if method == "POST" and path == "/crm/v3/objects/companies/batch/read":
+            return self.read_companies(body)
+        if method == "POST" and path == "/crm/v4/associations/deals/companies/batch/read":
+            return self.read_associations(body)
+        return 404, {"status": "error", "message": f"{method} {path} is not emulated"}
+
+
+def make_handler(hubspot):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # sonst hängen kleine Antworten ~40 ms im Delayed ACK des Clients
+
+        def handle_request(self, method):
+            url = urllib.parse.urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+            with hubspot.lock:
+                hubspot.requests[f"{method} {url.path}"] += 1
+            if hubspot.latency:
+                time.sleep(hubspot.latency)
+
+            allowed, remaining = hubspot.admit()
+            headers = {}
+            scripted = hubspot.next_scripted(method, url.path)
+            if not allowed:
+                status = 429
+                payload = {"status": "error", "category": "RATE_LIMITS", "message": "You have reached your secondly limit."}
+                headers["Retry-After"] = f"{max(remaining, 0.0):.2f}"
+            elif scripted and scripted[0] >= 400:
+                status = scripted[0]
+                payload = {"status": "error", "category": "SCRIPTED", "message": f"Scripted {status} response"}
+            else:
+                status, payload = hubspot.route(method, url.path, dict(urllib.parse.parse_qsl(url.query)), body)
+            if hubspot.burst is not None:
+                headers["X-HubSpot-RateLimit-Max"] = str(hubspot.burst)
+                headers["X-HubSpot-RateLimit-Remaining"] = str(max(remaining, 0) if allowed else 0)
+            if scripted:
+                headers.update(scripted[1])
+
+            out = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(out)
+
+        def do_GET(self):
+            self.handle_request("GET")
+
+        def do_POST(self):
+            self.handle_request("POST")
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local HubSpot CRM stand-in")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--deals", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--burst", type=int, help="requests per 10 second window before answering 429")
+    args = parser.parse_args()
+    fake = FakeHubSpot(args.deals, latency=args.latency_ms / 1000, burst=args.burst)
+    print(f"🔧 Fake HubSpot with {args.deals} deals on {fake.start(args.port)}")
+    fake.thread.join()
@@ -0,0 +1,88 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# 🔹 Lokaler Stand-in für eine OpenAI-kompatible Chat-API (POST /v1/chat/completions), für --llm-base-url
+# Antwortet auf jeden Prompt mit einer Zusammenfassung pro Record, eingepackt in ```json wie echte Modelle es oft tun.
+# fail_ids: Prompts, die einen dieser Records enthalten, scheitern mit 500 (für Tests des Fehlerpfads).
+class FakeChatAPI:
+    def __init__(self, latency=0.0, fail_ids=()):
+        self.latency = latency
+        self.fail_ids = {str(record_id) for record_id in fail_ids}
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.records = 0
+        self.failed = 0
+        self.server = None
+        self.thread = None
+
+    def start(self, port=0):
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def complete(self, body):
+        records = json.loads(body["messages"][-1]["content"])
+        with self.lock:
+            self.requests += 1
+            if any(record["id"] in self.fail_ids for record in records):
+                self.failed += 1
+                return 500, {"error": {"message": "fake failure", "type": "server_error"}}
+            self.records += len(records)
+        summaries = {
+            record["id"]: f"{record.get('deal_name') or record.get('company_name')}: {record.get('current_stage', record.get('deals'))}."
+            for record in records
+        }
+        return 200, {
+            "id": f"chatcmpl-{self.requests}", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {
+                "role": "assistant", "content": "```json\n" + json.dumps(summaries) + "\n```"
+            }}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            if api.latency:
+                time.sleep(api.latency)
+            if self.path.rstrip("/").endswith("/chat/completions"):
+                status, payload = api.complete(body)
+            else:
+                status, payload = 404, {"error": {"message": f"POST {self.path} is not emulated"}}
+            out = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible chat API stand-in")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    fake = FakeChatAPI(latency=args.latency_ms / 1000)
+    print(f"🔧 Fake chat API on {fake.start(args.port)} (--llm-base-url)")
+    fake.thread.join()
@@ -0,0 +1,87 @@
+from hubspot_sales_pipeline_analysis.sheets_sync import parse_a1
+
+
+# 🔹 In-Memory-Stand-in für ein gspread Worksheet (für Tests und Benchmarks ohne Google-Zugang)
+class MemoryWorksheet:
+    def __init__(self, title="Sheet1", rows=None, sheet_id=0):
+        self.title = title
+        self.id = sheet_id
+        self.rows = [list(row) for row in rows or []]
+        self.calls = []  # Name jedes API-Aufrufs, um Schreibzugriffe zählen zu können
+
+    @property
+    def row_count(self):
+        return len(self.rows)
+
+    @property
+    def col_count(self):
+        return max((len(row) for row in self.rows), default=0)
+
+    def get_all_values(self, **kwargs):
+        self.calls.append("get_all_values")
+        return [list(row) for row in self.rows]
+
+    def clear(self):
+        self.calls.append("clear")
+        self.rows = []
+
+    def append_row(self, values, **kwargs):
+        self.calls.append("append_row")
+        self.rows.append(list(values))
+
+    def append_rows(self, values, **kwargs):
+        self.calls.append("append_rows")
+        self.rows.extend(list(row) for row in values)
+
+    def delete_rows(self, start_index, end_index=None):
+        self.calls.append("delete_rows")
+        del self.rows[start_index - 1:(end_index or start_index)]
+
+    def batch_update(self, data, **kwargs):
+        self.calls.append("batch_update")
+        for update in data:
+            start_col, start_row = parse_a1(update["range"].split(":")[0])
+            for r, values in enumerate(update["values"]):
+                row_index = start_row - 1 + r
+                while len(self.rows) <= row_index:
+                    self.rows.append([])
+                row = self.rows[row_index]
+                while len(row) < start_col - 1 + len(values):
+                    row.append("")
+                row[start_col - 1:start_col - 1 + len(values)] = values
+
+
+# 🔹 In-Memory-Stand-in für ein gspread Spreadsheet mit den Requests, die der SheetsWriter zum Umschalten nutzt
+class MemorySpreadsheet:
+    def __init__(self, titles=()):
+        self.sheets = []
+        self.calls = []
+        for title in titles:
+            self.add_worksheet(title)
+
+    def worksheets(self):
+        self.calls.append("worksheets")
+        return list(self.sheets)
+
+    def worksheet(self, title):
+        return next(sheet for sheet in self.sheets if sheet.title == title)
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.calls.append("add_worksheet")
+        sheet = MemoryWorksheet(title, sheet_id=max((s.id for s in self.sheets), default=-1) + 1)
+        self.sheets.append(sheet)
+        return sheet
+
+    def del_worksheet(self, worksheet):
+        self.calls.append("del_worksheet")
+        self.sheets.remove(worksheet)
+
+    def batch_update(self, body):
+        self.calls.append("batch_update")
+        by_id = {sheet.id: sheet for sheet in self.sheets}
+        for request in body["requests"]:
+            if "updateCells" in request:
+                by_id[request["updateCells"]["range"]["sheetId"]].rows = []
+            elif "copyPaste" in request:
+                source = by_id[request["copyPaste"]["source"]["sheetId"]]
+                by_id[request["copyPaste"]["destination"]["sheetId"]].rows = [list(row) for row in source.rows]
@@ -0,0 +1,234 @@
+# 🔹 Offline-Benchmarks für Generator und Exporter
+# Startet pro Portalgröße einen lokalen HubSpot-Stand-in (benchmarks/fake_hubspot.py) und misst jedes Szenario in einem
+# eigenen Prozess, damit Peak RSS pro Szenario vergleichbar ist. Google Sheets wird durch MemorySpreadsheet ersetzt.
+#
+#   python -m benchmarks.run --sizes 1000 10000 100000
+#   python -m benchmarks.run --sizes 10000 --scenarios export export-stages --latency-ms 20 --burst 190
+#
+# Ergebnis: JSON mit Laufzeit, Rows/s, Requests pro Deal, 429-Antworten und Peak RSS je Größe und Szenario.
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+from benchmarks.fake_hubspot import FakeHubSpot
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [1000, 10000, 100000]
+
+# Export-Varianten: Keyword-Argumente für exporter.export()
+EXPORT_VARIANTS = {
+    "export": {},
+    "export-numpy": {"engine": "numpy", "numbering": "columnar"},
+    "export-sharded": {"shards": 8, "workers": 8}
+}
+# Generator-Szenarien legen neue Deals an und laufen deshalb nach den Exporten
+SCENARIOS = list(EXPORT_VARIANTS) + ["export-stages", "numbering", "generate", "generate-batch"]
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)  # Linux: KiB
+
+
+def rate(count, seconds):
+    return round(count / seconds, 1) if seconds else None
+
+
+# 🔹 Vergleichsbasis für die Nummerierung: die Logik des ursprünglichen Export-Skripts, alle Zeilen im Speicher
+# Pro Company erst die "sql"-Zeilen nach Create Date (jede bekommt die nächste Deal Number), dann die übrigen
+# Zeilen der nummerierten Deals in Originalreihenfolge.
+def number_in_memory(stage_row_lists):
+    company_deals = defaultdict(list)
+    for stage_rows in stage_row_lists:
+        for row in stage_rows:
+            company_deals[row[1]].append(row)
+    numbered = []
+    deal_numbers = {}
+    for company_rows in company_deals.values():
+        sql_rows = sorted((row for row in company_rows if row[7] == "sql"), key=lambda row: row[10])
+        for deal_number, row in enumerate(sql_rows, 1):
+            deal_numbers[row[0]] = deal_number
+            numbered.append(row[:14] + [deal_number] + row[14:])
+        for row in company_rows:
+            if row[7] != "sql" and deal_numbers.get(row[0]):
+                numbered.append(row[:14] + [deal_numbers[row[0]]] + row[14:])
+    return [numbered]
+
+
+# 🔹 Ein Szenario im Kindprozess ausführen, gibt die Messwerte als dict zurück
+def run_scenario(spec):
+    from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient
+    from benchmarks.memory_sheets import MemorySpreadsheet
+    from hubspot_sales_pipeline_analysis.exporter import DEAL_TAB, COMPANY_TAB, OWNER_TAB
+
+    hubspot = HubSpotClient(
+        "benchmark", base_url=spec["base_url"], burst=spec["client_burst"], daily_limit=None, search_rate=spec["search_rate"]
+    )
+    spreadsheet = MemorySpreadsheet([DEAL_TAB, COMPANY_TAB, OWNER_TAB])
+    scenario = spec["scenario"]
+    result = {}
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        if scenario in ("generate", "generate-batch"):
+            from hubspot_sales_pipeline_analysis.hubspot_deals_generator import generate_deals
+
+            created = generate_deals(spec["size"], scenario == "generate-batch", hubspot)
+            seconds = time.perf_counter() - start
+            result.update(deals=created, seconds=round(seconds, 3), deals_per_sec=rate(created, seconds))
+        elif scenario == "export-stages":
+            from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver
+            from hubspot_sales_pipeline_analysis.export_pipeline import ExportState
+            from hubspot_sales_pipeline_analysis.exporter import fetch, synthesize, number, write
+
+            # Jede Stufe wird vollständig materialisiert, damit ihre Zeit getrennt messbar ist
+            stages = {}
+            state = ExportState()
+            pages = list(fetch(hubspot))
+            stages["fetch"] = {"seconds": time.perf_counter() - start, "count": sum(len(page) for page in pages)}
+            mark = time.perf_counter()
+            stage_row_lists = list(synthesize(iter(pages), CompanyResolver(hubspot), state))
+            stages["synthesize"] = {"seconds": time.perf_counter() - mark, "count": sum(len(rows) for rows in stage_row_lists)}
+            stages["synthesize"]["peak_rss_mb"] = peak_rss_mb()
+            mark = time.perf_counter()
+            deal_chunks = list(number(stage_row_lists))
+            stages["number"] = {"seconds": time.perf_counter() - mark, "count": sum(len(chunk) for chunk in deal_chunks)}
+            stages["number"]["peak_rss_mb"] = peak_rss_mb()
+            mark = time.perf_counter()
+            write(spreadsheet, deal_chunks, state)
+            stages["write"] = {"seconds": time.perf_counter() - mark, "count": len(spreadsheet.worksheet(DEAL_TAB).rows) - 1}
+            for stage in stages.values():
+                stage["per_sec"] = rate(stage["count"], stage["seconds"])
+                stage["seconds"] = round(stage["seconds"], 3)
+            seconds = time.perf_counter() - start
+            result.update(deals=stages["fetch"]["count"], rows=stages["write"]["count"], seconds=round(seconds, 3), stages=stages)
+        elif scenario == "numbering":
+            from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver
+            from hubspot_sales_pipeline_analysis.export_pipeline import ExportState, number_deals
+            from hubspot_sales_pipeline_analysis.exporter import fetch, synthesize
+            from hubspot_sales_pipeline_analysis.row_table import number_deals_columnar
+
+            # Dieselben Stage-Zeilen durch jede Nummerierung, gemessen wird nur Stufe 4 (bester von drei Läufen)
+            stage_row_lists = list(synthesize(fetch(hubspot), CompanyResolver(hubspot), ExportState(rng=random.Random(spec["seed"]))))
+            numberings = {"in_memory": number_in_memory, "spool": number_deals, "columnar": number_deals_columnar}
+            timings = {}
+            for name, numbering in numberings.items():
+                runs = []
+                for _ in range(3):
+                    mark = time.perf_counter()
+                    rows = sum(len(chunk) for chunk in numbering(stage_row_lists))
+                    runs.append(time.perf_counter() - mark)
+                timings[name] = {"seconds": round(min(runs), 3), "per_sec": rate(rows, min(runs))}
+            for timing in timings.values():
+                timing["vs_in_memory"] = round(timing["seconds"] / timings["in_memory"]["seconds"], 2)
+            seconds = time.perf_counter() - start
+            result.update(deals=spec["size"], rows=rows, seconds=round(seconds, 3), numbering=timings)
+        else:
+            from hubspot_sales_pipeline_analysis.exporter import export
+
+            export(spreadsheet=spreadsheet, hubspot=hubspot, seed=spec["seed"], **EXPORT_VARIANTS[scenario])
+            seconds = time.perf_counter() - start
+            result.update(deals=spec["size"], rows=len(spreadsheet.worksheet(DEAL_TAB).rows) - 1, seconds=round(seconds, 3))
+
+    if "rows" in result:
+        result["rows_per_sec"] = rate(result["rows"], seconds)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+# Szenario in einem frischen Python-Prozess starten, das Ergebnis kommt als JSON über stdout
+def run_child(spec):
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--child", json.dumps(spec)],
+        cwd=REPO_ROOT, check=True, stdout=subprocess.PIPE, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, scenarios, latency=0.0, burst=None, client_burst=None, search_rate=1000, seed=1):
+    results = []
+    for size in sizes:
+        fake = FakeHubSpot(size, latency=latency, burst=burst)
+        base_url = fake.start()
+        try:
+            for scenario in [s for s in SCENARIOS if s in scenarios]:
+                before = fake.stats()
+                spec = {
+                    "scenario": scenario, "size": size, "base_url": base_url, "seed": seed, "search_rate": search_rate,
+                    "client_burst": client_burst or burst or 100000
+                }
+                result = run_child(spec)
+                after = fake.stats()
+                requests = after["requests"] - before["requests"]
+                result.update(
+                    size=size, scenario=scenario, requests=requests,
+                    requests_per_deal=round(requests / result["deals"], 4) if result["deals"] else None,
+                    rate_limited=after["rate_limited"] - before["rate_limited"],
+                    by_endpoint={k: v - before["by_endpoint"].get(k, 0) for k, v in after["by_endpoint"].items()
+                                 if v - before["by_endpoint"].get(k, 0)}
+                )
+                results.append(result)
+                per_sec = f"{result['rows_per_sec']} rows/s" if "rows_per_sec" in result else f"{result['deals_per_sec']} deals/s"
+                print(f"⏱️ {size:>7} deals  {scenario:<15} {result['seconds']:>8.2f}s  {per_sec:<20} "
+                      f"{result['requests_per_deal']} req/deal  {result['rate_limited']} x 429  {result['peak_rss_mb']} MB")
+        finally:
+            fake.stop()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HubSpot generator and exporter against local stand-ins")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="portal sizes in deals (default: 1000 10000 100000)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency the fake HubSpot adds to every request")
+    parser.add_argument("--burst", type=int, help="fake HubSpot answers 429 after this many requests per 10 seconds")
+    parser.add_argument("--client-burst", type=int, help="client-side burst limit (default: --burst, else unthrottled)")
+    parser.add_argument("--search-rate", type=float, default=1000, help="client-side search requests per second (default: 1000)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON result file (default: benchmarks/results/<commit>-<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        print(json.dumps(run_scenario(json.loads(args.child))))
+        return
+
+    started = datetime.now(timezone.utc)
+    results = run(args.sizes, args.scenarios, args.latency_ms / 1000, args.burst, args.client_burst, args.search_rate, args.seed)
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "started": started.isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {
+            "latency_ms": args.latency_ms, "burst": args.burst, "client_burst": args.client_burst,
+            "search_rate": args.search_rate, "seed": args.seed
+        },
+        "results": results
+    }
+    output = args.output or os.path.join(REPO_ROOT, "benchmarks", "results", f"{commit or 'unknown'}-{started:%Y%m%dT%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"💾 Ergebnisse gespeichert: {output}")
+
+
+if __name__ == "__main__":
+    main()
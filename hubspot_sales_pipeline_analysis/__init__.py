@@ -0,0 +1,37 @@
+from importlib import import_module
+
+# 🔹 Öffentliche API, die Module werden erst beim ersten Zugriff importiert
+# (import hubspot_sales_pipeline_analysis lädt weder requests noch gspread oder numpy)
+_EXPORTS = {
+    "generate": ("hubspot_deals_generator", "generate_deals"),
+    "fetch": ("exporter", "fetch"),
+    "synthesize": ("exporter", "synthesize"),
+    "number": ("exporter", "number"),
+    "write": ("exporter", "write"),
+    "export": ("exporter", "export"),
+    "export_portals": ("multi_portal", "export_portals"),
+    "watch_deals": ("watch", "watch_deals"),
+    "open_spreadsheet": ("exporter", "open_spreadsheet"),
+    "HubSpotClient": ("hubspot_client", "HubSpotClient"),
+    "CompanyResolver": ("company_resolver", "CompanyResolver"),
+    "DealStore": ("deal_store", "DealStore"),
+    "ExportState": ("export_pipeline", "ExportState"),
+    "SheetsWriter": ("sheets_writer", "SheetsWriter"),
+    "CsvSink": ("file_sinks", "CsvSink"),
+    "ParquetSink": ("file_sinks", "ParquetSink"),
+    "ArrowSink": ("file_sinks", "ArrowSink"),
+    "PipelineAnalytics": ("analytics", "PipelineAnalytics"),
+    "DealSummarizer": ("deal_summaries", "DealSummarizer"),
+    "DealWatcher": ("watch", "DealWatcher")
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attribute = _EXPORTS[name]
+    value = getattr(import_module(f"{__name__}.{module_name}"), attribute)
+    globals()[name] = value
+    return value
@@ -0,0 +1,168 @@
+import numpy as np
+
+from hubspot_sales_pipeline_analysis.export_pipeline import STAGE_PROBABILITIES, SALES_REPS
+
+# 🔹 Zusammenfassungs-Tabs für Dashboards (wenige hundert Zeilen statt der kompletten Stage History)
+STAGE_SUMMARY_TAB = "Analytics - Stages"
+WIN_RATE_TAB = "Analytics - Win Rates"
+STAGE_SUMMARY_HEADER = [
+    "Deal Stage", "Deals Entered", "Conversion to Next", "Conversion from SQL", "Median Days in Stage", "P90 Days in Stage",
+    "Open Deals", "Open Amount", "Weighted Forecast"
+]
+WIN_RATE_HEADER = ["Dimension", "Group", "Won", "Lost", "Win Rate", "Won Amount"]
+
+STAGES = list(STAGE_PROBABILITIES)
+STAGE_CODES = {stage: code for code, stage in enumerate(STAGES)}
+FUNNEL = STAGES[:STAGES.index("closedwon") + 1]  # sql -> ... -> contractsent -> closedwon, closedlost ist der Abgang
+WON, LOST = STAGE_CODES["closedwon"], STAGE_CODES["closedlost"]
+EMPTY = ("", None)  # kein Amount: "" oder None ("amount": null von HubSpot)
+
+
+# Funktion: Perzentil aus einem Histogramm (Nearest Rank: kleinster Wert, bis zu dem q aller Werte liegen)
+def histogram_percentile(counts, q):
+    total = counts.sum()
+    if total == 0:
+        return ""
+    return int(np.searchsorted(np.cumsum(counts), q * total))
+
+
+# 🔹 Gewonnen/Verloren je Gruppe (Sales Rep, Company, Deal Type), Gruppen werden beim ersten Auftreten angelegt
+class OutcomeCounter:
+    def __init__(self):
+        self.keys = []
+        self.codes = {}
+        self.won = np.zeros(0, dtype=np.int64)
+        self.lost = np.zeros(0, dtype=np.int64)
+        self.won_amount = np.zeros(0)
+
+    def add(self, keys, won, amounts):
+        if len(keys) == 0:
+            return
+        unique, inverse = np.unique(keys, return_inverse=True)
+        codes = np.array([self.codes.setdefault(key, len(self.codes)) for key in unique.tolist()])
+        self.keys.extend(list(self.codes)[len(self.keys):])
+        size = len(self.keys)
+        index = codes[inverse]
+        self.won = np.pad(self.won, (0, size - len(self.won))) + np.bincount(index[won], minlength=size)
+        self.lost = np.pad(self.lost, (0, size - len(self.lost))) + np.bincount(index[~won], minlength=size)
+        self.won_amount = np.pad(self.won_amount, (0, size - len(self.won_amount))) + np.bincount(index, weights=np.where(won, amounts, 0.0), minlength=size)
+
+    # Gruppen über eine Zuordnung zusammenfassen (z. B. Company -> Industry)
+    def rollup(self, group_of):
+        rolled = OutcomeCounter()
+        groups = [group_of(key) for key in self.keys]
+        if not groups:
+            return rolled
+        unique, inverse = np.unique(np.array(groups, dtype=object), return_inverse=True)
+        rolled.keys = unique.tolist()
+        rolled.codes = {key: code for code, key in enumerate(rolled.keys)}
+        rolled.won = np.bincount(inverse, weights=self.won, minlength=len(unique)).astype(np.int64)
+        rolled.lost = np.bincount(inverse, weights=self.lost, minlength=len(unique)).astype(np.int64)
+        rolled.won_amount = np.bincount(inverse, weights=self.won_amount, minlength=len(unique))
+        return rolled
+
+    def rows(self, dimension, label=str):
+        rows = []
+        for i, key in enumerate(self.keys):
+            won, lost = int(self.won[i]), int(self.lost[i])
+            rows.append([dimension, label(key), won, lost, round(won / (won + lost), 4), round(float(self.won_amount[i]), 2)])
+        return sorted(rows, key=lambda row: row[1])
+
+
+# 🔹 Pipeline-Kennzahlen über die Stage-Zeilen, inkrementell pro Chunk aktualisiert
+# Pro Stage: wie viele Deals sie erreicht haben, Histogramm der Days in Stage, offene Deals mit Amount und gewichtetem
+# Forecast (Forecast Amount der aktuellen Stage). Gewonnen/Verloren je Sales Rep, Company und Deal Type; Industry und
+# ICP Tier werden erst beim Ausgeben aus den Companies zusammengefasst. Die aktuelle Stage eines Deals ist die Zeile
+# ohne Days in Stage, die Reihenfolge der Zeilen spielt also keine Rolle.
+class PipelineAnalytics:
+    def __init__(self):
+        self.deals_entered = np.zeros(len(STAGES), dtype=np.int64)
+        self.days_histogram = np.zeros((len(STAGES), 0), dtype=np.int64)
+        self.open_deals = np.zeros(len(STAGES), dtype=np.int64)
+        self.open_amount = np.zeros(len(STAGES))
+        self.weighted_forecast = np.zeros(len(STAGES))
+        self.by_sales_rep = OutcomeCounter()
+        self.by_company = OutcomeCounter()
+        self.by_deal_type = OutcomeCounter()
+
+    # Stage-Zeilen im Format von DEAL_HEADER (ein Chunk) einrechnen
+    def update(self, rows):
+        if not rows:
+            return
+        columns = list(zip(*rows))
+        n = len(rows)
+        stage = np.fromiter((STAGE_CODES[value] for value in columns[7]), dtype=np.int64, count=n)
+        days = np.fromiter((-1 if value == "" else value for value in columns[12]), dtype=np.int64, count=n)
+        amount = np.fromiter((0.0 if value in EMPTY else float(value) for value in columns[4]), dtype=np.float64, count=n)
+        forecast = np.fromiter((0.0 if value in EMPTY else value for value in columns[5]), dtype=np.float64, count=n)
+        stage_count = len(STAGES)
+
+        self.deals_entered += np.bincount(stage, minlength=stage_count)
+        finished = days >= 0
+        if finished.any():
+            width = max(self.days_histogram.shape[1], int(days.max()) + 1)
+            histogram = np.pad(self.days_histogram, ((0, 0), (0, width - self.days_histogram.shape[1])))
+            histogram += np.bincount(stage[finished] * width + days[finished], minlength=stage_count * width).reshape(stage_count, width)
+            self.days_histogram = histogram
+
+        current = ~finished
+        is_open = current & (stage != WON) & (stage != LOST)
+        self.open_deals += np.bincount(stage[is_open], minlength=stage_count)
+        self.open_amount += np.bincount(stage[is_open], weights=amount[is_open], minlength=stage_count)
+        self.weighted_forecast += np.bincount(stage[is_open], weights=forecast[is_open], minlength=stage_count)
+
+        closed = current & ~is_open
+        won = stage[closed] == WON
+        self.by_sales_rep.add(np.array(columns[2])[closed], won, amount[closed])
+        self.by_company.add(np.array(columns[1])[closed], won, amount[closed])
+        self.by_deal_type.add(np.array(columns[8], dtype=object)[closed], won, amount[closed])
+
+    # Chunks unverändert durchreichen und dabei mitzählen (zwischen Nummerierung und Sink)
+    def observe(self, row_chunks):
+        for chunk in row_chunks:
+            self.update(chunk)
+            yield chunk
+
+    # 🔹 Stage-Tab: Funnel-Conversion, Median/P90 der Verweildauer, offene Pipeline und gewichteter Forecast
+    def stage_rows(self):
+        entered = self.deals_entered
+        sql_entered = entered[STAGE_CODES["sql"]]
+        rows = []
+        for stage in STAGES:
+            code = STAGE_CODES[stage]
+            next_stage = FUNNEL[FUNNEL.index(stage) + 1] if stage in FUNNEL[:-1] else None
+            conversion_to_next = round(entered[STAGE_CODES[next_stage]] / entered[code], 4) if next_stage and entered[code] else ""
+            histogram = self.days_histogram[code]
+            rows.append([
+                stage, int(entered[code]), conversion_to_next, round(entered[code] / sql_entered, 4) if sql_entered else "",
+                histogram_percentile(histogram, 0.5), histogram_percentile(histogram, 0.9), int(self.open_deals[code]),
+                round(float(self.open_amount[code]), 2), round(float(self.weighted_forecast[code]), 2)
+            ])
+        rows.append([
+            "Total", int(entered[STAGE_CODES["sql"]]), "", "", "", "", int(self.open_deals.sum()),
+            round(float(self.open_amount.sum()), 2), round(float(self.weighted_forecast.sum()), 2)
+        ])
+        return rows
+
+    # 🔹 Win-Rate-Tab: gewonnen/verloren je Sales Rep, Company, Industry, ICP Tier und Deal Type
+    # companies/sales_reps wie in ExportState ({Company ID: {...}}, {Sales Rep ID: Name})
+    def win_rate_rows(self, companies, sales_reps=None):
+        sales_reps = sales_reps or {}
+
+        def company(company_id):
+            return companies.get(company_id, {})
+
+        return (
+            self.by_sales_rep.rows("Sales Rep", lambda rep_id: sales_reps.get(rep_id) or SALES_REPS[rep_id - 1001])
+            + self.by_company.rows("Company", lambda company_id: company(company_id).get("Company Name", str(company_id)))
+            + self.by_company.rollup(lambda company_id: company(company_id).get("Industry", "")).rows("Industry")
+            + self.by_company.rollup(lambda company_id: company(company_id).get("ICP Tier", "")).rows("ICP Tier")
+            + self.by_deal_type.rows("Deal Type")
+        )
+
+    # Tabs im Format von write_tabs (SheetsWriter oder FileSink)
+    def tabs(self, state):
+        return [
+            (STAGE_SUMMARY_TAB, STAGE_SUMMARY_HEADER, [self.stage_rows()]),
+            (WIN_RATE_TAB, WIN_RATE_HEADER, [self.win_rate_rows(state.companies, state.sales_reps)])
+        ]
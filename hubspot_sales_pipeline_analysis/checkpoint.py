@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+
+from hubspot_sales_pipeline_analysis.export_pipeline import fetch_page_cursors, resolve_companies, synthesize
+
+CHECKPOINT_EVERY = 20  # Seiten (à 100 Deals) zwischen zwei Checkpoints
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoint (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_rows (
+    seq INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+# 🔹 Lokale Checkpoint-Datei für lange Exporte: Seiten-Cursor, Exportzustand, Zufallszustand und die bisherigen Stage-Zeilen
+# Cursor, Zustand und Zeilen landen in einer SQLite-Transaktion, ein Checkpoint ist also vollständig oder gar nicht da.
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def reset(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM checkpoint")
+            self.conn.execute("DELETE FROM stage_rows")
+
+    # Checkpoint fertig verarbeitet -> Datei entfernen, der nächste Lauf beginnt von vorn
+    def remove(self):
+        self.close()
+        os.remove(self.path)
+
+    def load(self):
+        row = self.conn.execute("SELECT value FROM checkpoint WHERE key = 'state'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, cursor, state, stage_row_lists, resolver=None, engine=None):
+        snapshot = {
+            "cursor": cursor,
+            "done": cursor is None,
+            "companies": list(state.companies.items()),  # Listen statt dicts: Integer-Keys bleiben Integer
+            "company_mapping": state.company_mapping,
+            "sales_reps": list(state.sales_reps.items()),
+            "deal_id_counter": state.deal_id_counter,
+            "company_id_counter": state.company_id_counter,
+            "latest_modified": state.latest_modified,
+            "random_state": state.rng.getstate(),
+            "engine_state": engine.rng.bit_generator.state if engine else None,
+            "company_names": resolver.names if resolver else {},
+            "company_fetched": resolver.fetched if resolver else {}
+        }
+        with self.conn:
+            self.conn.executemany("INSERT INTO stage_rows (data) VALUES (?)", [(json.dumps(rows),) for rows in stage_row_lists])
+            self.conn.execute(
+                "INSERT INTO checkpoint (key, value) VALUES ('state', ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (json.dumps(snapshot),)
+            )
+
+    # Gespeicherten Stand in state (samt rng), Engine und Resolver zurückspielen
+    @staticmethod
+    def restore(snapshot, state, resolver=None, engine=None):
+        state.companies = {company_id: attributes for company_id, attributes in snapshot["companies"]}
+        state.company_mapping = snapshot["company_mapping"]
+        state.sales_reps = {sales_reps_id: name for sales_reps_id, name in snapshot["sales_reps"]}
+        state.deal_id_counter = snapshot["deal_id_counter"]
+        state.company_id_counter = snapshot["company_id_counter"]
+        state.latest_modified = snapshot["latest_modified"]
+        version, internal, gauss_next = snapshot["random_state"]
+        state.rng.setstate((version, tuple(internal), gauss_next))
+        if engine and snapshot["engine_state"]:
+            engine.rng.bit_generator.state = snapshot["engine_state"]
+        if resolver:
+            resolver.names.update(snapshot["company_names"])
+            resolver.fetched.update(snapshot.get("company_fetched", {}))
+
+    def iter_stage_rows(self):
+        cursor = self.conn.cursor()
+        for (data,) in cursor.execute("SELECT data FROM stage_rows ORDER BY seq"):
+            yield json.loads(data)
+
+
+# 🔹 Stufe 1-3 mit Checkpoints: Seite holen, Companies auflösen, synthetisieren, alle `every` Seiten sichern
+# Jede Seite wird für sich synthetisiert, damit ein Checkpoint genau auf einer Seitengrenze liegt. Mit resume=True
+# kommen erst die gesicherten Zeilen, dann geht es ab dem gespeicherten Cursor weiter; die Ausgabe ist dieselbe
+# wie bei einem Lauf ohne Unterbrechung. Nur für den seriellen Abruf (List- oder Search-API), nicht für Shards.
+def checkpointed_stage_rows(client, resolver, state, checkpoint, since=None, store=None, engine=None, resume=False,
+                            every=CHECKPOINT_EVERY):
+    snapshot = checkpoint.load() if resume else None
+    seen = store is not None and since is None  # Vollabruf: gesehene Deals im Store vermerken (mit den Deals committet)
+    cursor = {"since": since, "after": None}
+    if snapshot:
+        Checkpoint.restore(snapshot, state, resolver, engine)
+        yield from checkpoint.iter_stage_rows()
+        if snapshot["done"]:
+            return
+        cursor = snapshot["cursor"]
+    else:
+        checkpoint.reset()
+        if seen:
+            store.reset_seen()
+
+    pending = []
+    pages = 0
+    for page, next_cursor in fetch_page_cursors(client, cursor["since"], cursor["after"]):
+        if seen:
+            store.mark_seen(deal["id"] for deal in page)
+        stage_row_lists = list(synthesize(resolve_companies([page], resolver), state, store, engine))
+        pending.extend(stage_row_lists)
+        pages += 1
+        if next_cursor is None or pages >= every:
+            if store:
+                store.commit()
+            checkpoint.save(next_cursor, state, pending, resolver, engine)
+            pending = []
+            pages = 0
+        yield from stage_row_lists
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotError
+
+BATCH_READ_URL = "/crm/v3/objects/companies/batch/read"
+BATCH_SIZE = 100  # HubSpot limit for batch/read
+UNKNOWN_COMPANY = "Unknown Company"
+DEFAULT_CACHE_DAYS = 7  # cached names older than this are read again, so renamed companies show up
+
+
+# 🔹 Resolves HubSpot company IDs to names via batch/read, memoized for the whole run
+# Only names HubSpot actually returned go to the cache file, each with the time it was read. IDs missing from a
+# 207 response are "Unknown Company" for this run only and are asked for again next time.
+class CompanyResolver:
+    def __init__(self, client, cache_file=None, cache_days=DEFAULT_CACHE_DAYS):
+        self.client = client
+        self.cache_file = cache_file
+        self.names = {}    # {hubspot_company_id: name}, including the misses of this run
+        self.fetched = {}  # {hubspot_company_id: unix time of the batch/read}, only for names HubSpot returned
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, encoding="utf-8") as f:
+                cached = json.load(f)
+            oldest = time.time() - cache_days * 86400
+            for company_id, entry in cached.items():
+                # entries without a timestamp come from older cache files and are read again
+                if isinstance(entry, dict) and entry.get("fetched", 0) >= oldest:
+                    self.names[company_id] = entry["name"]
+                    self.fetched[company_id] = entry["fetched"]
+
+    def resolve(self, company_ids):
+        missing = list(dict.fromkeys(str(i) for i in company_ids if str(i) not in self.names))
+        for start in range(0, len(missing), BATCH_SIZE):
+            chunk = missing[start:start + BATCH_SIZE]
+            response = self.client.post(BATCH_READ_URL, json={
+                "properties": ["name"],
+                "inputs": [{"id": company_id} for company_id in chunk]
+            })
+            # 207: some IDs were not found, the rest of the response is still valid
+            if response.status_code not in (200, 207):
+                raise HubSpotError(response)
+            now = time.time()
+            for company in response.json().get("results", []):
+                name = (company.get("properties", {}).get("name") or UNKNOWN_COMPANY).strip()
+                self.names[str(company["id"])] = name
+                self.fetched[str(company["id"])] = now
+            for company_id in chunk:
+                self.names.setdefault(company_id, UNKNOWN_COMPANY)
+        return {str(i): self.names[str(i)] for i in company_ids}
+
+    def name(self, company_id):
+        return self.names.get(str(company_id), UNKNOWN_COMPANY)
+
+    def save(self):
+        if not self.cache_file:
+            return
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({
+                company_id: {"name": self.names[company_id], "fetched": fetched} for company_id, fetched in self.fetched.items()
+            }, f)
+        os.replace(tmp_file, self.cache_file)
@@ -0,0 +1,136 @@
+import json
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    company_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    attributes TEXT NOT NULL,
+    deal_count INTEGER NOT NULL DEFAULT 0,
+    first_closed_won INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS deals (
+    hs_deal_id TEXT PRIMARY KEY,
+    deal_id INTEGER NOT NULL UNIQUE,
+    company_id INTEGER NOT NULL REFERENCES companies(company_id),
+    properties TEXT NOT NULL,
+    history TEXT NOT NULL,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS seen_deals (
+    hs_deal_id TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# 🔹 Local SQLite store for incremental exports: deals, companies, synthesized stage histories and sync state
+class DealStore:
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # 🔹 Sync state (high-water mark etc.)
+    def get_state(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        self.conn.execute(
+            "INSERT INTO sync_state (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+            (key, value)
+        )
+
+    # 🔹 Companies: returns ({company_id: attributes}, {company_name: mapping state}) like the exporter keeps them
+    def load_companies(self):
+        companies = {}
+        company_mapping = {}
+        for company_id, name, attributes, deal_count, first_closed_won in self.conn.execute(
+            "SELECT company_id, name, attributes, deal_count, first_closed_won FROM companies ORDER BY company_id"
+        ):
+            companies[company_id] = json.loads(attributes)
+            company_mapping[name] = {
+                "company_id": company_id,
+                "first_closed_won": bool(first_closed_won),
+                "deal_count": deal_count
+            }
+        return companies, company_mapping
+
+    def upsert_company(self, name, attributes, deal_count, first_closed_won):
+        self.conn.execute(
+            "INSERT INTO companies (company_id, name, attributes, deal_count, first_closed_won) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(company_id) DO UPDATE SET name = excluded.name, attributes = excluded.attributes, "
+            "deal_count = excluded.deal_count, first_closed_won = excluded.first_closed_won",
+            (attributes["Company ID"], name, json.dumps(attributes), deal_count, int(first_closed_won))
+        )
+
+    # 🔹 Deals: record = {deal_id, company_id, properties, history}
+    def get_deal(self, hs_deal_id):
+        row = self.conn.execute(
+            "SELECT deal_id, company_id, properties, history FROM deals WHERE hs_deal_id = ?", (hs_deal_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"deal_id": row[0], "company_id": row[1], "properties": json.loads(row[2]), "history": json.loads(row[3])}
+
+    # company_ids: only the deals of these companies (watch mode renumbers single companies)
+    def iter_deals(self, company_ids=None):
+        query, params = "SELECT deal_id, company_id, properties, history FROM deals", ()
+        if company_ids is not None:
+            # one JSON parameter instead of one placeholder per company (SQLite caps the number of placeholders)
+            query += " WHERE company_id IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(sorted(company_ids)),)
+        cursor = self.conn.cursor()
+        for deal_id, company_id, properties, history in cursor.execute(query + " ORDER BY deal_id", params):
+            yield {"deal_id": deal_id, "company_id": company_id, "properties": json.loads(properties), "history": json.loads(history)}
+
+    def upsert_deal(self, hs_deal_id, record):
+        self.conn.execute(
+            "INSERT INTO deals (hs_deal_id, deal_id, company_id, properties, history, last_modified) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(hs_deal_id) DO UPDATE SET company_id = excluded.company_id, properties = excluded.properties, "
+            "last_modified = excluded.last_modified",
+            (
+                hs_deal_id, record["deal_id"], record["company_id"], json.dumps(record["properties"]),
+                json.dumps(record["history"]), record["properties"].get("hs_lastmodifieddate")
+            )
+        )
+
+    def delete_deal(self, hs_deal_id):
+        self.conn.execute("DELETE FROM deals WHERE hs_deal_id = ?", (hs_deal_id,))
+
+    # deal count and "first deal closed won" of a company, from its stored deals (the first deal has the lowest deal_id)
+    def company_stats(self, company_id):
+        deal_count = self.conn.execute("SELECT COUNT(*) FROM deals WHERE company_id = ?", (company_id,)).fetchone()[0]
+        first = self.conn.execute("SELECT history FROM deals WHERE company_id = ? ORDER BY deal_id LIMIT 1", (company_id,)).fetchone()
+        return deal_count, first is not None and json.loads(first[0])["stages"][-1] == "closedwon"
+
+    # 🔹 Full fetch: every deal HubSpot returned is marked as seen, stored deals that were not seen are deleted there
+    # The marks are committed together with the deals, so a resumed checkpointed export keeps the ones from before the crash.
+    def reset_seen(self):
+        self.conn.execute("DELETE FROM seen_deals")
+
+    def mark_seen(self, hs_deal_ids):
+        self.conn.executemany("INSERT OR IGNORE INTO seen_deals (hs_deal_id) VALUES (?)", [(str(i),) for i in hs_deal_ids])
+
+    # returns the company IDs of the deleted deals, their deal counts have to be recomputed
+    def delete_unseen(self):
+        unseen = "FROM deals WHERE hs_deal_id NOT IN (SELECT hs_deal_id FROM seen_deals)"
+        company_ids = [company_id for (company_id,) in self.conn.execute("SELECT DISTINCT company_id " + unseen)]
+        self.conn.execute("DELETE " + unseen)
+        self.conn.execute("DELETE FROM seen_deals")
+        return company_ids
+
+    def max_ids(self):
+        max_deal_id = self.conn.execute("SELECT MAX(deal_id) FROM deals").fetchone()[0]
+        max_company_id = self.conn.execute("SELECT MAX(company_id) FROM companies").fetchone()[0]
+        return max_deal_id, max_company_id
+
+    def commit(self):
+        self.conn.commit()
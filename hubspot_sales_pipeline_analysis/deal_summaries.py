@@ -0,0 +1,232 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from hubspot_sales_pipeline_analysis.hubspot_client import TokenBucket
+from hubspot_sales_pipeline_analysis.export_pipeline import STAGE_PROBABILITIES, SALES_REPS
+
+DEFAULT_MODEL = "gpt-4o-mini"
+DEALS_PER_PROMPT = 20  # Deals (bzw. Accounts) pro Chat-Request
+DEFAULT_WORKERS = 4
+DEFAULT_REQUESTS_PER_MINUTE = 60
+
+DEAL_SUMMARY_TAB = "AI - Deal Summaries"
+ACCOUNT_SUMMARY_TAB = "AI - Account Summaries"
+DEAL_SUMMARY_HEADER = ["Deal ID", "Company ID", "Deal Name", "Summary"]
+ACCOUNT_SUMMARY_HEADER = ["Company ID", "Company Name", "Summary"]
+
+STAGE_ORDER = {stage: i for i, stage in enumerate(STAGE_PROBABILITIES)}
+
+# Änderungen am Prompt ändern auch den Cache-Key, alte Zusammenfassungen werden dann neu erzeugt
+SYSTEM_PROMPT = (
+    "You write short summaries of CRM records for a sales pipeline review. "
+    "You receive a JSON list of {kind} records, each with an \"id\". "
+    "Reply with one JSON object that maps every id to a summary of at most two sentences: "
+    "where the {kind} stands, how it got there and what stands out. No other text."
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS summaries (
+    key TEXT PRIMARY KEY,
+    summary TEXT NOT NULL
+);
+"""
+
+
+# Funktion: Inhalts-Hash eines Records (Modell + Prompt + Fakten), gleiche Fakten = gleicher Key
+def content_key(model, kind, facts):
+    payload = json.dumps({"model": model, "prompt": SYSTEM_PROMPT.format(kind=kind), "facts": facts}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Funktion: JSON-Objekt aus der Antwort lesen, auch wenn das Modell es in Text oder ```json einpackt
+def parse_summaries(content):
+    start, end = content.find("{"), content.rfind("}")
+    if start < 0 or end < start:
+        return {}
+    try:
+        summaries = json.loads(content[start:end + 1])
+    except ValueError:
+        return {}
+    return {str(key): str(value).strip() for key, value in summaries.items()} if isinstance(summaries, dict) else {}
+
+
+# 🔹 Zusammenfassungen auf der Platte, Key = content_key; unveränderte Deals werden nie neu zusammengefasst
+class SummaryCache:
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def get_many(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(self.conn.execute(f"SELECT key, summary FROM summaries WHERE key IN ({placeholders})", batch))
+        return found
+
+    def put_many(self, items):
+        self.conn.executemany(
+            "INSERT INTO summaries (key, summary) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET summary = excluded.summary", items
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+# 🔹 Deal-Fakten aus den nummerierten Stage-Zeilen sammeln (Chunks werden unverändert durchgereicht)
+# Die Zeilen eines Deals liegen nach der Nummerierung nicht zwingend hintereinander, daher ein dict pro Deal ID.
+class DealFacts:
+    def __init__(self):
+        self.deals = {}
+
+    def update(self, rows):
+        for row in rows:
+            deal = self.deals.get(row[0])
+            if deal is None:
+                deal = self.deals[row[0]] = {
+                    "deal_name": row[3], "company_id": row[1], "sales_rep": SALES_REPS[row[2] - 1001], "amount": row[4],
+                    "deal_type": row[8], "created": "", "stages": []
+                }
+            if row[10]:
+                deal["created"] = row[10]
+            deal["stages"].append([row[7], row[11], row[12]])
+
+    def observe(self, row_chunks):
+        for chunk in row_chunks:
+            self.update(chunk)
+            yield chunk
+
+    # Fakten eines Deals für den Prompt: Stages in Reihenfolge mit Eintrittsdatum und Tagen in der Stage
+    def deal_records(self):
+        for deal_id, deal in self.deals.items():
+            stages = sorted(deal["stages"], key=lambda stage: (stage[1], STAGE_ORDER[stage[0]]))
+            yield deal_id, {
+                "deal_name": deal["deal_name"], "amount": deal["amount"], "deal_type": deal["deal_type"],
+                "sales_rep": deal["sales_rep"], "created": deal["created"], "current_stage": stages[-1][0],
+                "stage_history": [{"stage": stage, "entered": entered, "days_in_stage": days} for stage, entered, days in stages]
+            }
+
+    # Fakten je Company: Stammdaten und Kennzahlen über alle ihre Deals
+    def account_records(self, companies):
+        accounts = {}
+        for deal_id, record in self.deal_records():
+            account = accounts.setdefault(self.deals[deal_id]["company_id"], {
+                "deals": 0, "won": 0, "lost": 0, "open": 0, "open_amount": 0.0, "won_amount": 0.0, "deal_names": []
+            })
+            amount = float(record["amount"] or 0)
+            account["deals"] += 1
+            account["deal_names"].append(record["deal_name"])
+            if record["current_stage"] == "closedwon":
+                account["won"] += 1
+                account["won_amount"] += amount
+            elif record["current_stage"] == "closedlost":
+                account["lost"] += 1
+            else:
+                account["open"] += 1
+                account["open_amount"] += amount
+        for company_id, account in accounts.items():
+            company = companies.get(company_id, {})
+            account["open_amount"] = round(account["open_amount"], 2)
+            account["won_amount"] = round(account["won_amount"], 2)
+            yield company_id, {
+                "company_name": company.get("Company Name", ""), "industry": company.get("Industry", ""),
+                "company_size": company.get("Company Size", ""), "country": company.get("Country", ""),
+                "icp_tier": company.get("ICP Tier", ""), **account
+            }
+
+
+# 🔹 Zusammenfassungen über eine OpenAI-kompatible Chat-API: mehrere Records pro Prompt, parallele Requests
+# mit Token Bucket (requests_per_minute), Cache-Treffer werden übersprungen. base_url zeigt z. B. auf einen lokalen Stub.
+class DealSummarizer:
+    def __init__(self, cache_path, model=DEFAULT_MODEL, base_url=None, api_key=None, deals_per_prompt=DEALS_PER_PROMPT,
+                 workers=DEFAULT_WORKERS, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, max_retries=5, timeout=120,
+                 client=None, metrics=None):
+        if client is None:
+            from openai import OpenAI
+
+            load_dotenv()
+            client = OpenAI(
+                api_key=api_key or os.getenv("OPENAI_API_KEY"), base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+                max_retries=max_retries, timeout=timeout
+            )
+        self.client = client
+        self.model = model
+        self.deals_per_prompt = deals_per_prompt
+        self.workers = workers
+        self.bucket = TokenBucket(requests_per_minute, 60.0)
+        self.cache = SummaryCache(cache_path)
+        self.metrics = metrics
+
+    # Ein Chat-Request für eine Liste von (id, Fakten), gibt {id: Zusammenfassung} zurück
+    def _complete(self, kind, batch):
+        self.bucket.acquire()
+        started = time.perf_counter()
+        status = 200
+        try:
+            response = self.client.chat.completions.create(model=self.model, temperature=0, messages=[
+                {"role": "system", "content": SYSTEM_PROMPT.format(kind=kind)},
+                {"role": "user", "content": json.dumps([dict(facts, id=str(record_id)) for record_id, facts in batch], ensure_ascii=False)}
+            ])
+        except Exception as error:
+            status = getattr(error, "status_code", None) or type(error).__name__
+            raise
+        finally:
+            if self.metrics:
+                self.metrics.observe_request("LLM chat.completions", status, time.perf_counter() - started)
+        return parse_summaries(response.choices[0].message.content or "")
+
+    # 🔹 Records zusammenfassen: records = [(id, Fakten), ...], gibt {id: Zusammenfassung} zurück
+    # Fehlt eine ID in der Antwort oder scheitert ein ganzer Request, bleibt sie leer und wird nicht gecacht, der nächste
+    # Lauf versucht sie erneut. Die Stufe ist optional und läuft nach den Haupt-Tabs, ein Fehler bricht den Export nicht ab.
+    def summarize(self, kind, records):
+        records = list(records)
+        keys = {record_id: content_key(self.model, kind, facts) for record_id, facts in records}
+        cached = self.cache.get_many(set(keys.values()))
+        summaries = {record_id: cached[key] for record_id, key in keys.items() if key in cached}
+        missing = [(record_id, facts) for record_id, facts in records if record_id not in summaries]
+        batches = [missing[start:start + self.deals_per_prompt] for start in range(0, len(missing), self.deals_per_prompt)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = {executor.submit(self._complete, kind, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    answers = future.result()
+                except Exception as error:
+                    print(f"⚠️ {len(futures[future])} {kind} Records ohne Zusammenfassung, der nächste Lauf versucht sie erneut: {error}")
+                    continue
+                new_items = []
+                for record_id, _ in futures[future]:
+                    summary = answers.get(str(record_id))
+                    if summary:
+                        summaries[record_id] = summary
+                        new_items.append((keys[record_id], summary))
+                self.cache.put_many(new_items)  # nach jedem Request sichern, ein Abbruch verliert nichts
+        if self.metrics:
+            self.metrics.add_rows("summaries", len(records))
+        return summaries
+
+    # Tabs im Format von write_tabs (SheetsWriter oder FileSink)
+    def tabs(self, facts, state):
+        deal_summaries = self.summarize("deal", facts.deal_records())
+        account_summaries = self.summarize("account", facts.account_records(state.companies))
+        deal_rows = [
+            [deal_id, deal["company_id"], deal["deal_name"], deal_summaries.get(deal_id, "")] for deal_id, deal in facts.deals.items()
+        ]
+        account_rows = [
+            [company_id, company["Company Name"], account_summaries.get(company_id, "")] for company_id, company in state.companies.items()
+        ]
+        return [
+            (DEAL_SUMMARY_TAB, DEAL_SUMMARY_HEADER, [deal_rows]),
+            (ACCOUNT_SUMMARY_TAB, ACCOUNT_SUMMARY_HEADER, [account_rows])
+        ]
+
+    def close(self):
+        self.cache.close()
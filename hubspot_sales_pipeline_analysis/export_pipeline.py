@@ -0,0 +1,613 @@
+import json
+import queue
+import random
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotError
+
+# 🔹 HubSpot Endpoints
+DEALS_URL = "/crm/v3/objects/deals"
+SEARCH_URL = "/crm/v3/objects/deals/search"
+SEARCH_RESULT_LIMIT = 10000  # Search-API liefert nicht mehr Treffer pro Abfrage
+ASSOCIATIONS_URL = "/crm/v4/associations/deals/companies/batch/read"
+PARAMS = {
+    "limit": 100,
+    "properties": "company_name,dealname,amount,probability,deal_type,deal_stage_sales,closedate,createdate,hubspot_owner_id,hs_lastmodifieddate",
+    "associations": "companies"
+}
+
+# 🔹 Spalten der drei Tabs
+DEAL_HEADER = [
+    "Deal ID", "Company ID", "Sales Rep ID", "Deal Name", "Amount", "Forecast Amount", "Probability",
+    "Deal Stage", "Deal Type", "Close Date", "Create Date", "Entered Stage Date", "Days in Stage", "Pipeline", "Deal Number"
+]
+COMPANY_HEADER = ["Company ID", "Company Name", "Industry", "Company Size", "Country", "ICP Tier"]
+OWNER_HEADER = ["Sales Rep ID", "Sales Rep", "Department", "Team", "Region"]
+
+CHUNK_SIZE = 1000  # Zeilen pro Chunk zwischen Nummerierung und Sink
+ROW_FIELDS = 15  # Felder einer Stage-Zeile aus build_stage_rows (ohne Deal Number)
+
+DEAL_ID_START = 1001  # Deal IDs beginnen bei 1001
+COMPANY_ID_START = 111111  # Company IDs beginnen bei 111111
+
+# Deal Types
+DEAL_TYPE = ["newbusiness", "existingbusiness"]
+
+# 🔹 Dummy-Daten für Deal Owners
+SALES_REPS = [
+    "John Peterson", "Celine Dupont", "Margaret Wilson", "Charlotte Becker", "David Klein",
+    "Andre Moreau", "Philip Schneider", "Emily Carter", "Lucas Hoffmann", "Anna Fischer",
+    "Noah Müller", "Isabelle Lang", "Leon Weber", "Nina Schröder", "Tom Berger"
+]
+SALES_REPS_IDS = {name: i + 1001 for i, name in enumerate(SALES_REPS)}
+DEPARTMENTS = ["Sales", "Account Management", "Enterprise Sales"]
+TEAMS = ["Team A", "Team B", "Team C"]
+REGIONS = ["EMEA", "AMER", "APAC"]
+
+STAGE_PROBABILITIES = {
+    "sql": 0.05,
+    "appointmentscheduled": 0.10,
+    "qualifiedtobuy": 0.25,
+    "presentationscheduled": 0.40,
+    "decisionmakerboughtin": 0.60,
+    "contractsent": 0.80,
+    "closedwon": 1.00,
+    "closedlost": 0.00
+}
+LEAD_SOURCES = ["Website", "Referral", "Outbound", "Email Campaign", "Social Media", "Inbound Lead", "Event", "Cold Call", "Referral Partner", "Content Marketing"]
+INDUSTRIES = ["FMCG", "SaaS", "Healthcare", "Finance", "Retail", "Durable Goods", "Agency", "Mobility & Automotive"]
+COMPANY_SIZES = ["Small", "Medium", "Enterprise"]
+ICP_TIER = ["ICP 1", "ICP 2", "ICP 3"]
+COUNTRIES = [
+    "Albania", "Andorra", "Armenia", "Austria", "Belarus", "Belgium", "Bosnia and Herzegovina", "Bulgaria", "Croatia", "Cyprus", "Czech Republic", "Denmark", "Estonia",
+    "Finland", "France", "Georgia", "Germany", "Greece", "Hungary", "Iceland", "Ireland", "Italy", "Kosovo", "Latvia", "Lithuania", "Luxembourg",
+    "Malta", "Moldova", "Monaco", "Montenegro", "Netherlands", "North Macedonia", "Norway", "Poland", "Portugal", "Romania", "Serbia", "Slovakia", "Slovenia",
+    "Spain", "Sweden", "Switzerland", "Turkey", "Ukraine", "United Kingdom"
+]
+
+# Mögliche Stage-Verläufe und ihre Gewichte
+STAGE_PATHS = [
+    # Closed Deals (Won & Lost)
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "decisionmakerboughtin", "contractsent", "closedwon"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "decisionmakerboughtin", "contractsent", "closedlost"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "decisionmakerboughtin", "closedlost"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "closedlost"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "closedlost"],
+    ["sql", "appointmentscheduled", "closedlost"],
+    ["sql", "closedlost"],
+
+    # Open Deals (keine closedwon/closedlost)
+    ["sql"],
+    ["sql", "appointmentscheduled"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "decisionmakerboughtin"],
+    ["sql", "appointmentscheduled", "qualifiedtobuy", "presentationscheduled", "decisionmakerboughtin", "contractsent"],
+]
+STAGE_WEIGHTS = [
+    # Closed Weights
+    0.15,  # closedwon
+    0.01,
+    0.02,
+    0.30,
+    0.03,
+    0.03,
+    0.03,
+
+    # Open Weights (mehr frühe offene Deals, abnehmend in späteren Stufen)
+    0.07,  # nur sql
+    0.06,
+    0.05,
+    0.06,
+    0.06,
+    0.06
+]
+
+
+# Funktion: Create Date eines Deals lesen, None wenn nicht parsebar
+def parse_create_date(deal):
+    try:
+        return datetime.strptime(deal.get("createdate", "")[:10], "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+# Funktion: Ziehe die zufälligen Teile der Stage History (Pfad, Sales Rep, Tage zwischen den Stages) aus `rng`
+def synthesize_history(computed_deal_type, rng=random):
+    selected_stages = rng.choices(STAGE_PATHS, weights=STAGE_WEIGHTS, k=1)[0]
+    sales_reps_id = SALES_REPS_IDS[rng.choice(SALES_REPS)]
+    day_offsets = [rng.randint(2, 30) for _ in selected_stages[1:]]
+    return {"stages": selected_stages, "sales_reps_id": sales_reps_id, "day_offsets": day_offsets, "deal_type": computed_deal_type}
+
+# Funktion: Baue die Stage-Zeilen aus einer History und den aktuellen Deal-Properties
+def build_stage_rows(deal, company_id, deal_id, history):
+    deal_name = deal.get("dealname", "")
+    deal_type = deal.get("deal_type", "")
+    amount = deal.get("amount", "")
+    current_date = parse_create_date(deal)
+    if current_date is None:
+        return []
+    create_date = current_date.strftime("%Y-%m-%d")
+    sales_reps_id = history["sales_reps_id"]
+
+    selected_stages = history["stages"]
+    entered_stage_dates = [current_date]
+    for days in history["day_offsets"]:
+        entered_stage_dates.append(entered_stage_dates[-1] + timedelta(days=days))
+
+    stage_rows = []
+    for i, stage in enumerate(selected_stages):
+        entered_stage_date = entered_stage_dates[i]
+        next_date = entered_stage_dates[i+1] if i+1 < len(entered_stage_dates) else ""
+        days_in_stage = (next_date - entered_stage_date).days if next_date else ""
+        probability = STAGE_PROBABILITIES[stage]
+        forecast_amount = round(float(amount)*probability,2) if amount else ""
+        closed_date_value = entered_stage_date.strftime("%Y-%m-%d") if stage in ["closedwon", "closedlost"] else ""
+        stage_rows.append([
+            deal_id, company_id, sales_reps_id, deal_name, amount, forecast_amount, probability, stage,
+            history["deal_type"], closed_date_value, create_date if i==0 else "", entered_stage_date.strftime("%Y-%m-%d"),
+            days_in_stage, "Sales Pipeline", deal_type
+        ])
+    return stage_rows
+
+# Funktion: Generiere Stage History für einen Deal, gibt (Zeilen, History) zurück
+def generate_stage_history(deal, company_id, deal_id, computed_deal_type, rng=random):
+    if parse_create_date(deal) is None:
+        return [], None
+    history = synthesize_history(computed_deal_type, rng)
+    return build_stage_rows(deal, company_id, deal_id, history), history
+
+
+# 🔹 Fehler, wenn ein Export mehr Deal- oder Company-IDs braucht, als sein ID-Bereich hergibt
+class IdSpaceError(ValueError):
+    pass
+
+
+# 🔹 Laufzustand des Exports: Companies, Sales Reps, Company Mapping, ID-Zähler und der Zufallsgenerator der Synthese
+# rng: eigener random.Random (z. B. random.Random(seed)), der Export verstellt nie das globale `random` des Prozesses
+# id_space: höchstens so viele IDs ab deal_id_start bzw. company_id_start (multi_portal), None = unbegrenzt. Geprüft
+# wird beim Vergeben, also bevor eine ID im Store landet.
+class ExportState:
+    def __init__(self, deal_id_start=DEAL_ID_START, company_id_start=COMPANY_ID_START, rng=None, id_space=None):
+        self.rng = rng if rng is not None else random.Random()
+        self.deal_id_limit = None if id_space is None else deal_id_start + id_space
+        self.company_id_limit = None if id_space is None else company_id_start + id_space
+        self.companies = {}        # {our_company_id: {Company ID, Company Name, Industry, Company Size, Country, ICP Tier, Lifecycle Stage}}
+        self.sales_reps = {}       # {sales_reps_id: sales_reps}
+        self.company_mapping = {}  # {company_name: {"company_id": x, "first_closed_won": False, "deal_count": 0}}
+        self.deal_id_counter = deal_id_start
+        self.company_id_counter = company_id_start
+        self.latest_modified = None  # höchstes hs_lastmodifieddate dieses Laufs
+
+    # Bekannte Companies, Zähler und High-Water-Mark aus dem lokalen Store übernehmen
+    @classmethod
+    def from_store(cls, store, **kwargs):
+        state = cls(**kwargs)
+        state.companies, state.company_mapping = store.load_companies()
+        max_deal_id, max_company_id = store.max_ids()
+        if max_deal_id:
+            state.deal_id_counter = max_deal_id + 1
+        if max_company_id:
+            state.company_id_counter = max_company_id + 1
+        state.latest_modified = store.get_state("high_water_mark")
+        return state
+
+    def save(self, store):
+        for company_name, comp_info in self.company_mapping.items():
+            store.upsert_company(company_name, self.companies[comp_info["company_id"]], comp_info["deal_count"], comp_info["first_closed_won"])
+        if self.latest_modified:
+            store.set_state("high_water_mark", self.latest_modified)
+
+    def track_modified(self, props):
+        modified = props.get("hs_lastmodifieddate")
+        if modified and (self.latest_modified is None or modified > self.latest_modified):
+            self.latest_modified = modified
+
+    # Nächste freie Deal ID; der Zähler steigt erst, wenn der Deal tatsächlich Zeilen bekommt
+    def next_deal_id(self):
+        if self.deal_id_limit is not None and self.deal_id_counter >= self.deal_id_limit:
+            raise IdSpaceError(f"Deal ID {self.deal_id_counter} is outside the ID space (< {self.deal_id_limit})")
+        return self.deal_id_counter
+
+    # Aufbau des Company Mappings: Jede Company (realer Name) nur einmal
+    def company_id_for(self, company_name):
+        if company_name in self.company_mapping:
+            return self.company_mapping[company_name]["company_id"]
+        if self.company_id_limit is not None and self.company_id_counter >= self.company_id_limit:
+            raise IdSpaceError(f"Company ID {self.company_id_counter} is outside the ID space (< {self.company_id_limit})")
+        company_id = self.company_id_counter
+        self.company_mapping[company_name] = {"company_id": company_id, "first_closed_won": False, "deal_count": 0}
+        self.companies[company_id] = {
+            "Company ID": company_id,
+            "Company Name": company_name,
+            "Industry": self.rng.choice(INDUSTRIES),
+            "Company Size": self.rng.choice(COMPANY_SIZES),
+            "Country": self.rng.choice(COUNTRIES),
+            "ICP Tier": self.rng.choice(ICP_TIER),
+            "Lifecycle Stage": ""  # wird später gesetzt
+        }
+        self.company_id_counter += 1
+        return company_id
+
+    # Berechnung des Deal Typs
+    def computed_deal_type(self, company_name):
+        comp_info = self.company_mapping[company_name]
+        if comp_info["deal_count"] == 0:
+            return "newbusiness"
+        return "existingbusiness" if comp_info["first_closed_won"] else "newbusiness"
+
+    def record_deal(self, company_name, final_stage):
+        comp_info = self.company_mapping[company_name]
+        comp_info["deal_count"] += 1
+        if comp_info["deal_count"] == 1 and final_stage == "closedwon":
+            comp_info["first_closed_won"] = True
+
+    # Deal Count und first_closed_won einer Company aus ihren gespeicherten Deals neu berechnen
+    # (nachdem ein Deal die Company gewechselt hat oder gelöscht wurde), damit spätere Deals denselben Deal Type
+    # bekommen wie bei einem frischen Export
+    def recount_company(self, store, company_id):
+        deal_count, first_closed_won = store.company_stats(company_id)
+        comp_info = self.company_mapping[self.companies[company_id]["Company Name"]]
+        comp_info["deal_count"] = deal_count
+        comp_info["first_closed_won"] = first_closed_won
+
+    def record_sales_rep(self, sales_reps_id):
+        self.sales_reps[sales_reps_id] = SALES_REPS[sales_reps_id - 1001]
+
+    def record_rows(self, stage_rows):
+        for row in stage_rows[:1]:
+            self.record_sales_rep(row[2])
+
+    def company_rows(self):
+        return [list(comp.values()) for comp in self.companies.values()]
+
+    # Department, Team und Region sind zufällig, aber fest pro Sales Rep ID: jeder Lauf schreibt dieselben Zeilen,
+    # --sync diff muss den Tab also nicht bei jedem Lauf neu schreiben
+    def owner_rows(self):
+        owner_rows = []
+        for sales_reps_id, sales_reps_name in self.sales_reps.items():
+            rng = random.Random(sales_reps_id)
+            owner_rows.append([sales_reps_id, sales_reps_name, rng.choice(DEPARTMENTS), rng.choice(TEAMS), rng.choice(REGIONS)])
+        return owner_rows
+
+
+# Funktion: ISO-Zeitstempel von HubSpot in Millisekunden für Search-Filter
+def to_epoch_ms(timestamp):
+    return str(int(datetime.fromisoformat(timestamp.replace("Z", "+00:00")).timestamp() * 1000))
+
+# Funktion: Company-Assoziationen für Search-Ergebnisse nachladen (Search liefert keine associations)
+def attach_company_associations(client, results):
+    if not results:
+        return
+    response = client.post(ASSOCIATIONS_URL, json={"inputs": [{"id": deal["id"]} for deal in results]})
+    if response.status_code not in (200, 207):
+        raise HubSpotError(response)
+    assoc_by_deal = {str(r["from"]["id"]): r.get("to", []) for r in response.json().get("results", [])}
+    for deal in results:
+        targets = assoc_by_deal.get(str(deal["id"]), [])
+        deal["associations"] = {"companies": {"results": [{"id": str(t["toObjectId"])} for t in targets]}}
+
+
+# 🔹 Stufe 1: Deals seitenweise holen, alle über die List-API oder nur die seit `since` geänderten über die Search-API
+def fetch_pages(client, since=None):
+    for page, _ in fetch_page_cursors(client, since):
+        yield page
+
+# Funktion: Wie fetch_pages, liefert aber zu jeder Seite den Cursor für die nächste ({"since", "after"}, None = fertig)
+# Mit since/after aus einem gespeicherten Cursor setzt der Abruf genau dort wieder an.
+def fetch_page_cursors(client, since=None, after=None):
+    while True:
+        if since is None:
+            params = dict(PARAMS, after=after) if after else PARAMS
+            response = client.get_json(DEALS_URL, params=params)  # wirft HubSpotError statt Fehler-Body als Seite zu lesen
+        else:
+            body = {
+                "filterGroups": [{"filters": [{"propertyName": "hs_lastmodifieddate", "operator": "GTE", "value": to_epoch_ms(since)}]}],
+                "sorts": [{"propertyName": "hs_lastmodifieddate", "direction": "ASCENDING"}],
+                "properties": PARAMS["properties"].split(","),
+                "limit": 100
+            }
+            if after:
+                body["after"] = after
+            response = client.post_json(SEARCH_URL, json=body)
+            attach_company_associations(client, response.get("results", []))
+        if not response.get("paging"):
+            yield response.get("results", []), None
+            break
+        after = response["paging"]["next"]["after"]
+        if since is not None and int(after) >= SEARCH_RESULT_LIMIT:
+            # Search-API liefert max. 10.000 Treffer pro Abfrage -> ab dem letzten Änderungsdatum neu starten
+            since = response["results"][-1]["properties"]["hs_lastmodifieddate"]
+            after = None
+        yield response.get("results", []), {"since": since, "after": after}
+
+# Funktion: Zeitfenster [start, end) über die Create Dates aufteilen, entweder in `shards` gleich große Fenster oder in Fenster von `window_days` Tagen
+def createdate_windows(start, end, shards=None, window_days=None):
+    start_ms, end_ms = int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+    step = window_days * 86400000 if window_days else -(-(end_ms - start_ms) // (shards or 1))
+    return [(window_start, min(window_start + step, end_ms)) for window_start in range(start_ms, end_ms, step)]
+
+# Funktion: Ältestes Create Date im Portal, Startpunkt für die Shards
+def oldest_createdate(client):
+    response = client.post_json(SEARCH_URL, json={
+        "sorts": [{"propertyName": "createdate", "direction": "ASCENDING"}],
+        "properties": ["createdate"],
+        "limit": 1
+    })
+    results = response.get("results", [])
+    if not results:
+        return None
+    return datetime.fromisoformat(results[0]["properties"]["createdate"].replace("Z", "+00:00"))
+
+# Funktion: Ein Shard (Create-Date-Fenster) über die Search-API holen, sortiert nach Deal ID, liefert die Seiten
+def fetch_shard(client, window):
+    window_start, window_end = window
+    last_id = None
+    after = None
+    while True:
+        filters = [
+            {"propertyName": "createdate", "operator": "GTE", "value": str(window_start)},
+            {"propertyName": "createdate", "operator": "LT", "value": str(window_end)}
+        ]
+        if last_id is not None:
+            filters.append({"propertyName": "hs_object_id", "operator": "GT", "value": last_id})
+        body = {
+            "filterGroups": [{"filters": filters}],
+            "sorts": [{"propertyName": "hs_object_id", "direction": "ASCENDING"}],
+            "properties": PARAMS["properties"].split(","),
+            "limit": 100
+        }
+        if after:
+            body["after"] = after
+        response = client.post_json(SEARCH_URL, json=body)
+        results = response.get("results", [])
+        attach_company_associations(client, results)
+        yield results
+        if not response.get("paging"):
+            break
+        after = response["paging"]["next"]["after"]
+        if int(after) >= SEARCH_RESULT_LIMIT:
+            # Mehr als 10.000 Treffer im Fenster -> ab der letzten Deal ID neu suchen
+            last_id = results[-1]["id"]
+            after = None
+
+# 🔹 Stufe 1 (parallel): Shards nach Create Date gleichzeitig holen
+# Die Deals werden in einer temporären SQLite-Datei gesammelt und in aufsteigender Deal ID ausgegeben,
+# also in derselben Reihenfolge wie die List-API. Deal Type und Nummerierung sind damit identisch zum seriellen Lauf.
+def fetch_pages_sharded(client, start=None, end=None, shards=8, window_days=None, workers=8):
+    start = start or oldest_createdate(client)
+    if start is None:
+        return
+    end = end or datetime.now(timezone.utc) + timedelta(days=1)
+    windows = createdate_windows(start, end, shards, window_days)
+    pages = queue.Queue(maxsize=workers * 4)
+    stop = threading.Event()
+
+    # Mit Timeout einreihen, damit kein Worker in einer vollen Queue hängt, wenn der Verbraucher aufgehört hat
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    # Worker: Seiten (Listen) eines Shards einreihen, zum Schluss das Tupel (window, Fehler oder None); nach stop
+    # schickt er keine Requests mehr
+    def run(window):
+        error = None
+        try:
+            for page in fetch_shard(client, window):
+                if not put(page):
+                    return
+        except Exception as shard_error:
+            error = shard_error
+        finally:
+            put((window, error))
+
+    conn = sqlite3.connect("")  # privates temporäres On-Disk-File
+    conn.execute("CREATE TABLE deals (id INTEGER PRIMARY KEY, data TEXT)")
+    executor = ThreadPoolExecutor(max_workers=workers)
+    futures = [executor.submit(run, window) for window in windows]
+    try:
+        finished = 0
+        while finished < len(windows):
+            page = pages.get()
+            if isinstance(page, tuple):
+                finished += 1
+                if page[1] is not None:
+                    raise page[1]  # erster Fehler eines Shards bricht den ganzen Abruf ab
+                continue
+            conn.executemany("INSERT OR REPLACE INTO deals VALUES (?, ?)", [(int(deal["id"]), json.dumps(deal)) for deal in page])
+    except BaseException:
+        conn.close()
+        raise
+    finally:
+        # Bei einem Fehler (auch im Verbraucher, z. B. Ctrl+C) die übrigen Shards abbrechen: wartende gar nicht erst
+        # starten, laufende hören nach ihrem aktuellen Request auf
+        stop.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+    cursor = conn.execute("SELECT data FROM deals ORDER BY id")
+    try:
+        while True:
+            chunk = cursor.fetchmany(PARAMS["limit"])
+            if not chunk:
+                break
+            yield [json.loads(data) for (data,) in chunk]
+    finally:
+        conn.close()
+
+# Funktion: Seiten durchreichen und ihre Deals im Store als gesehen vermerken (Vollabruf, danach delete_unseen)
+def mark_seen(pages, store):
+    store.reset_seen()
+    for page in pages:
+        store.mark_seen(deal["id"] for deal in page)
+        yield page
+
+# 🔹 Stufe 2: Company-Namen pro Seite gesammelt per batch/read auflösen, liefert (deal, company_name)
+def resolve_companies(pages, company_resolver):
+    for page in pages:
+        company_resolver.resolve([
+            assoc[0]["id"] for assoc in (
+                deal.get("associations", {}).get("companies", {}).get("results", []) for deal in page
+            ) if assoc
+        ])
+        for deal in page:
+            company_assoc = deal.get("associations", {}).get("companies", {}).get("results", [])
+            company_name = (deal["properties"].get("company_name") or "").strip()
+            if company_assoc:
+                company_name = company_resolver.name(company_assoc[0]["id"])
+            yield deal, company_name
+
+# 🔹 Stufe 3: Stage History für neue Deals synthetisieren, liefert die Stage-Zeilen pro Deal
+# Mit `engine` (StageHistoryEngine) werden die Deals in Batches vektorisiert synthetisiert.
+def synthesize(deals, state, store=None, engine=None):
+    if engine is not None:
+        for batch in chunked(deals, PARAMS["limit"]):
+            stage_rows = synthesize_batch(batch, state, store, engine)
+            if stage_rows:
+                yield stage_rows
+        return
+
+    for deal, company_name in deals:
+        props = deal["properties"]
+        state.track_modified(props)
+
+        record = store.get_deal(deal["id"]) if store else None
+        if record is not None:
+            update_stored_deal(deal, company_name, record, state, store)
+            continue
+
+        company_id = state.company_id_for(company_name)
+        computed_deal_type = state.computed_deal_type(company_name)
+        deal_id = state.next_deal_id()
+        stage_rows, history = generate_stage_history(props, company_id, deal_id, computed_deal_type, state.rng)
+        if stage_rows:
+            state.record_deal(company_name, stage_rows[-1][7])  # Index 7 = Deal Stage
+            state.record_rows(stage_rows)
+            if store:
+                store.upsert_deal(deal["id"], {"deal_id": deal_id, "company_id": company_id, "properties": props, "history": history})
+            state.deal_id_counter += 1
+            yield stage_rows
+
+# Funktion: Bereits bekannten Deal aktualisieren, die Stage History bleibt stabil
+# Hat HubSpot den Deal einer anderen Company zugeordnet, wandert er dorthin; beide Companies werden neu gezählt.
+def update_stored_deal(deal, company_name, record, state, store):
+    old_company_id = record["company_id"]
+    record["company_id"] = state.company_id_for(company_name)
+    record["properties"] = deal["properties"]
+    store.upsert_deal(deal["id"], record)
+    if record["company_id"] != old_company_id:
+        state.recount_company(store, old_company_id)
+        state.recount_company(store, record["company_id"])
+
+# Funktion: Einen Batch neuer Deals mit der vektorisierten Engine synthetisieren
+# Die Zufallsteile werden für alle Deals auf einmal gezogen, Deal Type und Zähler danach der Reihe nach vergeben.
+def synthesize_batch(batch, state, store, engine):
+    new_deals = []
+    for deal, company_name in batch:
+        props = deal["properties"]
+        state.track_modified(props)
+        record = store.get_deal(deal["id"]) if store else None
+        if record is not None:
+            update_stored_deal(deal, company_name, record, state, store)
+            continue
+        new_deals.append((deal, company_name, parse_create_date(props) is not None))
+
+    samples = engine.sample(sum(1 for _, _, valid in new_deals if valid))
+    final_stages = engine.final_stages(samples)
+    props_list, company_ids, deal_ids, deal_types = [], [], [], []
+    for deal, company_name, valid in new_deals:
+        company_id = state.company_id_for(company_name)
+        if not valid:
+            continue
+        i = len(props_list)
+        deal_id = state.next_deal_id()
+        computed_deal_type = state.computed_deal_type(company_name)
+        state.record_deal(company_name, final_stages[i])
+        state.record_sales_rep(int(samples["sales_reps_id"][i]))
+        if store:
+            history = engine.history(samples, i, computed_deal_type)
+            store.upsert_deal(deal["id"], {"deal_id": deal_id, "company_id": company_id, "properties": deal["properties"], "history": history})
+        props_list.append(deal["properties"])
+        company_ids.append(company_id)
+        deal_ids.append(deal_id)
+        deal_types.append(computed_deal_type)
+        state.deal_id_counter += 1
+
+    if not props_list:
+        return []
+    return engine.stage_rows(props_list, company_ids, deal_ids, deal_types, samples)
+
+# Alle Deals im Store (auch unveränderte aus früheren Läufen) aus ihrer gespeicherten History neu aufbauen
+# Mit company_ids nur die Deals dieser Companies (Watch-Modus: Nummerierung pro Company neu berechnen)
+def stored_stage_rows(store, state, company_ids=None):
+    for record in store.iter_deals(company_ids):
+        stage_rows = build_stage_rows(record["properties"], record["company_id"], record["deal_id"], record["history"])
+        if stage_rows:
+            state.record_rows(stage_rows)
+            yield stage_rows
+
+# 🔹 Stufe 4: Deals pro Company nach Create Date nummerieren
+# Die Zeilen werden in eine temporäre SQLite-Datei ausgelagert, im Speicher bleibt nur die Reihenfolge der Companies.
+# Ausgabe wie bisher: Companies in Reihenfolge ihres ersten Auftretens, pro Company erst die "sql"-Zeilen
+# sortiert nach Create Date, dann alle übrigen Zeilen in Originalreihenfolge.
+# Kosten: gebundener Speicher gegen Laufzeit. Jede Zeile geht einmal durch SQLite hinein und wieder heraus, das
+# dauert etwa 3-5x so lange wie eine Nummerierung komplett im Speicher (366k Zeilen: ~6-7s statt ~2s, gemessen mit
+# `python -m benchmarks.run --scenarios numbering`). Die 15 Felder liegen als eigene Spalten ohne Typ-Affinität im
+# Spool statt als JSON, SQLite gibt also genau die Python-Werte zurück ("" bleibt "", "6430" bleibt Text).
+def number_deals(stage_row_lists, chunk_size=CHUNK_SIZE):
+    # privates temporäres On-Disk-File, wird beim Schließen gelöscht; der Generator darf in einem anderen Thread
+    # weiterlaufen als dem, der ihn gestartet hat (SheetsWriter schreibt die Tabs parallel)
+    conn = sqlite3.connect("", check_same_thread=False)
+    fields = ", ".join(f"f{i}" for i in range(ROW_FIELDS))
+    conn.execute(f"CREATE TABLE rows (seq INTEGER PRIMARY KEY, company_rank INTEGER, is_sql INTEGER, {fields})")
+    insert = f"INSERT INTO rows VALUES ({', '.join('?' * (ROW_FIELDS + 3))})"
+    company_ranks = {}
+    seq = 0
+    batch = []
+    for stage_rows in stage_row_lists:
+        for row in stage_rows:
+            # Index 1 = Company ID, Index 7 = Stage
+            batch.append((seq, company_ranks.setdefault(row[1], len(company_ranks)), row[7] == "sql", *row))
+            seq += 1
+        if len(batch) >= chunk_size:
+            conn.executemany(insert, batch)
+            batch = []
+    conn.executemany(insert, batch)
+
+    # Deal Number je Deal ID (jeder Deal hat genau eine sql-Zeile): f0 = Deal ID, f1 = Company ID, f10 = Create Date
+    conn.execute("""
+        CREATE TABLE numbers AS
+        SELECT f0 AS deal_id, ROW_NUMBER() OVER (PARTITION BY f1 ORDER BY f10, seq) AS deal_number FROM rows WHERE is_sql
+    """)
+    conn.execute("CREATE UNIQUE INDEX numbers_deal_id ON numbers (deal_id)")
+    cursor = conn.execute(f"""
+        SELECT {", ".join(f"r.f{i}" for i in range(14))}, n.deal_number, r.f14
+        FROM rows r JOIN numbers n ON n.deal_id = r.f0
+        ORDER BY r.company_rank, r.is_sql DESC, CASE WHEN r.is_sql THEN r.f10 END, r.seq
+    """)
+    try:
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                break
+            yield list(map(list, chunk))  # Deal Number steht schon an Index 14
+    finally:
+        conn.close()
+
+# Funktion: Einzelne Zeilen in Chunks fester Größe bündeln
+def chunked(rows, chunk_size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        yield chunk
@@ -0,0 +1,341 @@
+import argparse
+import random
+from itertools import chain
+
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver, DEFAULT_CACHE_DAYS
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.metrics import Metrics, timed, phase, add_metrics_arguments
+from hubspot_sales_pipeline_analysis.file_sinks import FILE_SINKS, FileSink
+from hubspot_sales_pipeline_analysis.checkpoint import Checkpoint, checkpointed_stage_rows
+from hubspot_sales_pipeline_analysis.deal_summaries import DEFAULT_MODEL, DEFAULT_WORKERS, DEFAULT_REQUESTS_PER_MINUTE, DEALS_PER_PROMPT
+from hubspot_sales_pipeline_analysis.export_pipeline import (
+    DEAL_HEADER, COMPANY_HEADER, OWNER_HEADER, ExportState, fetch_pages, fetch_pages_sharded, mark_seen, resolve_companies,
+    synthesize as synthesize_deals, stored_stage_rows, number_deals
+)
+
+# 🔐 Google Sheets
+SCOPES = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
+CREDS_FILE = "hs-sales-pipeline-analysis-0d212e642d40.json"
+SPREADSHEET_NAME = "HubSpot - Sales Pipeline Analysis"
+DEAL_TAB = "HubSpot - Deal"
+COMPANY_TAB = "HubSpot - Company"
+OWNER_TAB = "HubSpot - Sales Reps"
+
+# Datei-Sinks bekommen auch die Spalten ohne Überschrift im Sheet (HubSpot Deal Type, Lifecycle Stage)
+DEAL_FILE_HEADER = DEAL_HEADER + ["HubSpot Deal Type"]
+COMPANY_FILE_HEADER = COMPANY_HEADER + ["Lifecycle Stage"]
+
+
+# Funktion: Spreadsheet öffnen; gspread und google-auth werden erst hier importiert
+def open_spreadsheet(creds_file=CREDS_FILE, name=SPREADSHEET_NAME):
+    import gspread
+    from google.oauth2.service_account import Credentials
+
+    creds = Credentials.from_service_account_file(creds_file, scopes=SCOPES)
+    return gspread.authorize(creds).open(name)
+
+
+# 🔹 Stufe 1: Deal-Seiten holen, seriell (optional nur Änderungen seit since) oder parallel nach createdate-Fenstern
+def fetch(hubspot, since=None, shards=None, window_days=None, workers=8, metrics=None):
+    if since is None and (shards or window_days):
+        pages = fetch_pages_sharded(hubspot, shards=shards, window_days=window_days, workers=workers)
+    else:
+        pages = fetch_pages(hubspot, since)
+    return timed(metrics, "fetch", pages)
+
+
+# 🔹 Stufe 2+3: Companies auflösen und Stage History synthetisieren
+# Mit Store werden die Änderungen erst übernommen und danach alle gespeicherten Deals aus ihrer stabilen History ausgegeben.
+# prune: die Seiten sind ein Vollabruf, gespeicherte Deals, die darin fehlen, sind in HubSpot gelöscht
+def synthesize(pages, resolver, state, store=None, engine=None, metrics=None, prune=False):
+    if prune:
+        pages = mark_seen(pages, store)
+    deals = timed(metrics, "companies", resolve_companies(pages, resolver), size=lambda deal: 1)
+    stage_row_lists = timed(metrics, "synthesize", synthesize_deals(deals, state, store, engine))
+    return replay(stage_row_lists, state, store, metrics, prune) if store else stage_row_lists
+
+
+# Funktion: Mit Store die Stage-Zeilen durchlaufen lassen, Store sichern und alle gespeicherten Deals ausgeben
+# Nach einem Vollabruf (prune) werden die nicht mehr gelieferten Deals gelöscht und ihre Companies neu gezählt.
+def replay(stage_row_lists, state, store, metrics=None, prune=False):
+    for _ in stage_row_lists:
+        pass
+    with phase(metrics, "store"):
+        if prune:
+            for company_id in store.delete_unseen():
+                state.recount_company(store, company_id)
+        state.save(store)
+        store.commit()
+    state.sales_reps = {}
+    return timed(metrics, "replay", stored_stage_rows(store, state))
+
+
+# 🔹 Stufe 4: Deals nummerieren, über SQLite-Spool (begrenzter Speicher) oder Spaltentabelle (schneller als der Spool, etwa so schnell wie im Speicher)
+def number(stage_row_lists, numbering="spool", metrics=None):
+    if numbering == "columnar":
+        from hubspot_sales_pipeline_analysis.row_table import number_deals_columnar
+        return timed(metrics, "number", number_deals_columnar(stage_row_lists))
+    return timed(metrics, "number", number_deals(stage_row_lists))
+
+
+# 🔹 Stufe 5: Alle drei Tabs schreiben, in ein Spreadsheet oder einen FileSink (CSV/Parquet/Arrow, je Tab eine Datei)
+# replace: Tabs leeren und parallel neu schreiben, diff: nur geänderte Zellen, neue und entfernte Zeilen (nur Sheets)
+# Mit Metrics zählt die Phase "write" nur die Zeit auf dem aufrufenden Thread ohne die vorgelagerten Stufen;
+# Deal-Chunks, die die Writer-Threads nach dem ersten Chunk ziehen, laufen parallel zum Upload.
+def write(spreadsheet, deal_chunks, state, sync="replace", staging=False, metrics=None):
+    with phase(metrics, "write"):
+        results = _write_tabs(spreadsheet, deal_chunks, state, sync, staging, metrics)
+    if metrics:
+        metrics.add_rows("write", sum(
+            stats["rows_updated"] + stats["rows_appended"] if sync == "diff" else stats for stats in results.values()
+        ))
+    return results
+
+
+def _write_tabs(spreadsheet, deal_chunks, state, sync, staging, metrics):
+    if sync == "diff":
+        from hubspot_sales_pipeline_analysis.sheets_sync import sync_sheet, DEAL_KEY, COMPANY_KEY, OWNER_KEY
+
+        totals = {"cells_written": 0, "cells_unchanged": 0}
+        results = {}
+
+        def report(tab, stats):
+            results[tab] = stats
+            totals["cells_written"] += stats["cells_written"]
+            totals["cells_unchanged"] += stats["cells_unchanged"]
+            print(f"🔁 {tab}: {stats['rows_updated']} Zeilen geändert, {stats['rows_appended']} neu, {stats['rows_deleted']} gelöscht")
+
+        # Reihenfolge wichtig: Companies und Sales Reps stehen erst fest, wenn alle Deals durchgelaufen sind
+        report(DEAL_TAB, sync_sheet(spreadsheet.worksheet(DEAL_TAB), DEAL_HEADER, deal_chunks, DEAL_KEY))
+        report(COMPANY_TAB, sync_sheet(spreadsheet.worksheet(COMPANY_TAB), COMPANY_HEADER, [state.company_rows()], COMPANY_KEY))
+        report(OWNER_TAB, sync_sheet(spreadsheet.worksheet(OWNER_TAB), OWNER_HEADER, [state.owner_rows()], OWNER_KEY))
+        print(f"📊 {totals['cells_written']} Zellen geschrieben, {totals['cells_unchanged']} Zellen unverändert")
+        return results
+
+    # Der erste nummerierte Chunk steht erst fest, wenn alle Deals synthetisiert sind;
+    # danach sind auch Companies und Sales Reps vollständig und alle drei Tabs können parallel geschrieben werden.
+    deal_chunks = iter(deal_chunks)
+    first_chunk = next(deal_chunks, [])
+    deal_header, company_header = DEAL_HEADER, COMPANY_HEADER
+    if isinstance(spreadsheet, FileSink):
+        deal_header, company_header = DEAL_FILE_HEADER, COMPANY_FILE_HEADER
+    return tab_writer(spreadsheet, staging, metrics).write_tabs([
+        (DEAL_TAB, deal_header, chain([first_chunk], deal_chunks)),
+        (COMPANY_TAB, company_header, [state.company_rows()]),
+        (OWNER_TAB, OWNER_HEADER, [state.owner_rows()])
+    ])
+
+
+# Funktion: Writer für ein Spreadsheet (SheetsWriter) oder einen FileSink, der selbst schon write_tabs kann
+def tab_writer(spreadsheet, staging=False, metrics=None):
+    if isinstance(spreadsheet, FileSink):
+        return spreadsheet
+    from hubspot_sales_pipeline_analysis.sheets_writer import SheetsWriter
+    return SheetsWriter(spreadsheet, staging=staging, metrics=metrics)
+
+
+# 🔹 Zusammenfassungs-Tabs (Conversion, Verweildauer, Forecast, Win Rates) schreiben, immer komplett ersetzt
+def write_analytics(spreadsheet, analytics, state, staging=False, metrics=None):
+    with phase(metrics, "analytics"):
+        return tab_writer(spreadsheet, staging, metrics).write_tabs(analytics.tabs(state))
+
+
+# 🔹 KI-Zusammenfassungen je Deal und Account schreiben (nur Cache-Fehltreffer gehen an das Modell)
+def write_summaries(spreadsheet, summarizer, facts, state, staging=False, metrics=None):
+    with phase(metrics, "summaries"):
+        return tab_writer(spreadsheet, staging, metrics).write_tabs(summarizer.tabs(facts, state))
+
+
+# 🔹 Nummerierte Deals und den Laufzustand ausgeben: Sink öffnen, drei Tabs schreiben, optional Analytics und Zusammenfassungen
+# Analytics und Deal-Fakten zählen mit, während die Deal-Chunks zum Sink laufen; ihre Tabs folgen danach.
+def write_outputs(spreadsheet, deal_chunks, state, sync="replace", staging=False, metrics=None, sink="sheets", output_dir=".",
+                  analytics=False, summarizer=None):
+    pipeline_analytics = None
+    if analytics:
+        from hubspot_sales_pipeline_analysis.analytics import PipelineAnalytics
+        pipeline_analytics = PipelineAnalytics()
+        deal_chunks = pipeline_analytics.observe(deal_chunks)
+    deal_facts = None
+    if summarizer:
+        from hubspot_sales_pipeline_analysis.deal_summaries import DealFacts
+        deal_facts = DealFacts()
+        deal_chunks = deal_facts.observe(deal_chunks)
+    if sink != "sheets":
+        spreadsheet = FILE_SINKS[sink](output_dir)
+    elif spreadsheet is None:
+        with phase(metrics, "open_spreadsheet"):
+            spreadsheet = open_spreadsheet()
+    results = write(spreadsheet, deal_chunks, state, sync, staging, metrics)
+    if pipeline_analytics:
+        results.update(write_analytics(spreadsheet, pipeline_analytics, state, staging, metrics))
+    if summarizer:
+        results.update(write_summaries(spreadsheet, summarizer, deal_facts, state, staging, metrics))
+    return results
+
+
+# 🔹 Kompletter Export: HubSpot -> Stage History -> Nummerierung -> Google Sheets
+# spreadsheet/hubspot können von außen übergeben werden (z. B. aus einem Worker, der sie wiederverwendet).
+def export(spreadsheet=None, hubspot=None, company_cache=None, store_path=None, full=False, shards=None, window_days=None,
+           workers=8, engine="python", numbering="spool", sync="replace", staging=False, seed=None, metrics=None,
+           sink="sheets", output_dir=".", checkpoint_path=None, resume=False, analytics=False,
+           summarizer=None, company_cache_days=DEFAULT_CACHE_DAYS):
+    if sink != "sheets" and sync == "diff":
+        raise ValueError("sync='diff' needs the Google Sheets sink")
+    if checkpoint_path and (shards or window_days):
+        raise ValueError("checkpoints only work with the serial fetch, not with shards/window_days")
+    stage_engine = None
+    if engine == "numpy":
+        from hubspot_sales_pipeline_analysis.stage_engine import StageHistoryEngine
+        stage_engine = StageHistoryEngine(seed)
+
+    hubspot = hubspot or HubSpotClient.from_env(metrics=metrics)
+    if metrics and hubspot.metrics is None:
+        hubspot.metrics = metrics
+    company_resolver = CompanyResolver(hubspot, company_cache, company_cache_days)
+    store = DealStore(store_path) if store_path else None
+    rng = random.Random(seed)  # eigener Generator, das globale `random` des Prozesses bleibt unberührt
+    state = ExportState.from_store(store, rng=rng) if store else ExportState(rng=rng)
+    since = store.get_state("high_water_mark") if store and not full else None
+    prune = store is not None and since is None
+
+    checkpoint = Checkpoint(checkpoint_path) if checkpoint_path else None
+    completed = False
+    # Store und Checkpoint auch bei einem Fehler schließen, sonst scheitert ein Retry im selben Prozess mit "database is locked"
+    try:
+        if checkpoint:
+            # Abruf und Synthese seitenweise mit Checkpoints, die Zeit zählt komplett zu "synthesize"
+            stage_row_lists = timed(metrics, "synthesize", checkpointed_stage_rows(
+                hubspot, company_resolver, state, checkpoint, since, store, stage_engine, resume
+            ))
+            if store:
+                stage_row_lists = replay(stage_row_lists, state, store, metrics, prune)
+        else:
+            pages = fetch(hubspot, since, shards, window_days, workers, metrics)
+            stage_row_lists = synthesize(pages, company_resolver, state, store, stage_engine, metrics, prune)
+        deal_chunks = number(stage_row_lists, numbering, metrics)
+        results = write_outputs(spreadsheet, deal_chunks, state, sync, staging, metrics, sink, output_dir, analytics, summarizer)
+        completed = True
+    finally:
+        company_resolver.save()
+        if store:
+            store.close()
+        if checkpoint and completed:
+            checkpoint.remove()  # Export vollständig geschrieben, der nächste Lauf beginnt von vorn
+        elif checkpoint:
+            checkpoint.close()  # bleibt für --resume liegen
+    return results
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Export HubSpot deals with stage history to Google Sheets")
+    parser.add_argument("--company-cache", help="JSON file that keeps company id -> name across runs")
+    parser.add_argument("--company-cache-days", type=float, default=DEFAULT_CACHE_DAYS,
+                        help=f"read cached company names again after this many days (default: {DEFAULT_CACHE_DAYS})")
+    parser.add_argument("--store", help="SQLite file for incremental sync, only deals modified since the last run are fetched")
+    parser.add_argument("--full", action="store_true",
+                        help="with --store: fetch all deals again instead of only the changes, and drop stored deals deleted in HubSpot")
+    parser.add_argument("--shards", type=int, help="fetch all deals in parallel, split into this many createdate windows")
+    parser.add_argument("--window-days", type=int, help="fetch all deals in parallel, one createdate window per this many days")
+    parser.add_argument("--workers", type=int, default=8, help="parallel shard fetches (default: 8)")
+    parser.add_argument("--engine", choices=["python", "numpy"], default="python", help="stage history simulation engine (default: python)")
+    parser.add_argument("--numbering", choices=["spool", "columnar"], default="spool",
+                        help="deal numbering via a temporary SQLite spool (bounded memory) or an in-memory columnar table (faster than the spool, about as fast as plain in-memory numbering)")
+    parser.add_argument("--sync", choices=["replace", "diff"], default="replace",
+                        help="replace: clear and rewrite every tab, diff: only write changed cells, new and removed rows")
+    parser.add_argument("--staging", action="store_true",
+                        help="with --sync replace: write each tab into a staging tab first and swap it in when complete")
+    parser.add_argument("--seed", type=int, help="seed the random generators for reproducible stage histories")
+    parser.add_argument("--sink", choices=["sheets"] + list(FILE_SINKS), default="sheets",
+                        help="write to Google Sheets (default) or one CSV/Parquet/Arrow file per tab")
+    parser.add_argument("--output-dir", default=".", help="directory for --sink csv/parquet/arrow (default: .)")
+    parser.add_argument("--analytics", action="store_true",
+                        help="also write summary tabs with stage conversion, stage velocity, weighted forecast and win rates")
+    parser.add_argument("--summaries", action="store_true",
+                        help="also write AI summaries per deal and per account (OpenAI-compatible API, OPENAI_API_KEY)")
+    parser.add_argument("--summary-cache", default="deal_summaries.db",
+                        help="SQLite cache of summaries keyed by content hash, unchanged deals are not sent again (default: deal_summaries.db)")
+    parser.add_argument("--llm-model", default=DEFAULT_MODEL, help=f"chat model for --summaries (default: {DEFAULT_MODEL})")
+    parser.add_argument("--llm-base-url", help="base URL of the OpenAI-compatible API (default: OPENAI_BASE_URL or api.openai.com)")
+    parser.add_argument("--llm-workers", type=int, default=DEFAULT_WORKERS, help=f"parallel LLM requests (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--llm-rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE,
+                        help=f"LLM requests per minute (default: {DEFAULT_REQUESTS_PER_MINUTE})")
+    parser.add_argument("--deals-per-prompt", type=int, default=DEALS_PER_PROMPT,
+                        help=f"deals or accounts summarized per LLM request (default: {DEALS_PER_PROMPT})")
+    parser.add_argument("--portals", help="JSON file with several HubSpot portals, exported concurrently into one output")
+    parser.add_argument("--checkpoint", help="SQLite file for periodic checkpoints of cursor, state and rows, removed after a successful run")
+    parser.add_argument("--resume", action="store_true", help="with --checkpoint: continue from the last checkpoint instead of starting over")
+    parser.add_argument("--watch", action="store_true",
+                        help="with --store: keep running, take deal webhooks and push small diffs of the affected companies to the sheet")
+    parser.add_argument("--listen", default="127.0.0.1:8780", help="with --watch: HOST:PORT of the webhook receiver (default: 127.0.0.1:8780)")
+    parser.add_argument("--webhook-url", help="with --watch: public URL HubSpot posts to, for signature checks behind a proxy")
+    parser.add_argument("--debounce", type=float, default=5.0,
+                        help="with --watch: seconds without new events before a batch is written (default: 5)")
+    parser.add_argument("--max-wait", type=float, default=30.0,
+                        help="with --watch: write a batch at the latest this many seconds after its first event (default: 30)")
+    parser.add_argument("--poll-interval", type=float, default=300.0,
+                        help="with --watch: seconds between hs_lastmodifieddate polls that catch missed webhooks, 0 = off (default: 300)")
+    add_metrics_arguments(parser)
+    return parser
+
+
+# 🔹 Einstiegspunkt für die Kommandozeile (console_scripts: hubspot-export)
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.sink != "sheets" and args.sync == "diff":
+        parser.error("--sync diff only works with --sink sheets")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if args.checkpoint and (args.shards or args.window_days):
+        parser.error("--checkpoint does not work with --shards/--window-days")
+    if args.portals and (args.checkpoint or args.store or args.company_cache):
+        parser.error("--portals takes store and company_cache per portal from the portal file and does not support --checkpoint")
+    if args.watch and (not args.store or args.sink != "sheets" or args.portals or args.checkpoint):
+        parser.error("--watch needs --store and the Google Sheets sink, and does not support --portals/--checkpoint")
+    metrics = Metrics("export") if args.metrics_json or args.metrics_prom else None
+    if args.watch:
+        from hubspot_sales_pipeline_analysis.watch import watch_deals
+        watch_deals(
+            args.store, company_cache=args.company_cache, company_cache_days=args.company_cache_days, listen=args.listen, public_url=args.webhook_url, debounce=args.debounce,
+            max_wait=args.max_wait, poll_interval=args.poll_interval, engine=args.engine, seed=args.seed, metrics=metrics
+        )
+        if metrics:
+            metrics.report()
+            metrics.write(args.metrics_json, args.metrics_prom)
+        return
+    summarizer = None
+    if args.summaries:
+        from hubspot_sales_pipeline_analysis.deal_summaries import DealSummarizer
+        summarizer = DealSummarizer(
+            args.summary_cache, model=args.llm_model, base_url=args.llm_base_url, deals_per_prompt=args.deals_per_prompt,
+            workers=args.llm_workers, requests_per_minute=args.llm_rpm, metrics=metrics
+        )
+    if args.portals:
+        from hubspot_sales_pipeline_analysis.multi_portal import load_portals, export_portals
+        export_portals(
+            load_portals(args.portals), shards=args.shards, window_days=args.window_days, workers=args.workers,
+            engine=args.engine, numbering=args.numbering, full=args.full, sync=args.sync, staging=args.staging, seed=args.seed,
+            metrics=metrics, sink=args.sink, output_dir=args.output_dir, analytics=args.analytics, summarizer=summarizer
+        )
+    else:
+        export(
+            company_cache=args.company_cache, store_path=args.store, full=args.full, shards=args.shards,
+            window_days=args.window_days, workers=args.workers, engine=args.engine, numbering=args.numbering,
+            sync=args.sync, staging=args.staging, seed=args.seed, metrics=metrics, sink=args.sink, output_dir=args.output_dir,
+            checkpoint_path=args.checkpoint, resume=args.resume, analytics=args.analytics,
+            summarizer=summarizer, company_cache_days=args.company_cache_days
+        )
+    if summarizer:
+        summarizer.close()
+    if args.sink == "sheets":
+        print("✅ Alle drei Tabs im Sheet wurden erfolgreich befüllt.")
+    else:
+        print(f"✅ Alle drei Tabs wurden als {args.sink} nach {args.output_dir} geschrieben.")
+    if metrics:
+        metrics.report()
+        metrics.write(args.metrics_json, args.metrics_prom)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+import csv
+import os
+import re
+
+ROW_GROUP_SIZE = 131072  # Zeilen pro Parquet-Row-Group bzw. Arrow-Record-Batch
+
+# 🔹 Spaltentypen nach Spaltenname, alles andere wird als String geschrieben
+# Leere Werte (EMPTY) werden in typisierten Spalten zu null; Kategorien als Dictionary (kleine Codes + einmal die Werte).
+EMPTY = ("", None)  # None z. B. aus "amount": null von HubSpot
+INT64_COLUMNS = {"Deal ID", "Company ID", "Deals Entered", "Open Deals", "Won", "Lost"}
+INT32_COLUMNS = {"Sales Rep ID", "Days in Stage", "Deal Number", "Median Days in Stage", "P90 Days in Stage"}
+FLOAT_COLUMNS = {
+    "Amount", "Forecast Amount", "Probability", "Conversion to Next", "Conversion from SQL", "Open Amount", "Weighted Forecast",
+    "Win Rate", "Won Amount"
+}
+DATE_COLUMNS = {"Close Date", "Create Date", "Entered Stage Date"}
+DICTIONARY_COLUMNS = {
+    "Deal Name", "Deal Stage", "Deal Type", "Pipeline", "HubSpot Deal Type", "Industry", "Company Size", "Country",
+    "ICP Tier", "Lifecycle Stage", "Department", "Team", "Region", "Dimension"
+}
+
+
+# Funktion: Dateiname aus dem Tab-Namen ("HubSpot - Deal" -> "hubspot_deal")
+def file_stem(title):
+    return re.sub(r"[^a-z0-9]+", "_", title.lower()).strip("_")
+
+
+# Funktion: Spaltennamen für Zeilen, die breiter als der Header sind
+def column_names(header, width):
+    return list(header[:width]) + [f"Column {i + 1}" for i in range(len(header), width)]
+
+
+# Funktion: Zeilen in Batches fester Größe umpacken
+def row_batches(row_chunks, batch_size):
+    batch = []
+    for chunk in row_chunks:
+        batch.extend(chunk)
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet/Arrow output needs pyarrow: pip install theblueprintlab[files]") from None
+    return pyarrow
+
+
+# 🔹 Gemeinsame Basis der Datei-Sinks: gleiche Schnittstelle wie SheetsWriter (write_tab/write_tabs)
+# Jeder Tab wird in eine eigene Datei im Ausgabeordner geschrieben, erst als .tmp und dann per os.replace umbenannt,
+# eine halb geschriebene Datei ist also nie unter dem endgültigen Namen sichtbar.
+class FileSink:
+    extension = None
+
+    def __init__(self, output_dir=".", batch_size=ROW_GROUP_SIZE):
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        os.makedirs(output_dir, exist_ok=True)
+
+    def path(self, title):
+        return os.path.join(self.output_dir, f"{file_stem(title)}.{self.extension}")
+
+    def write_tab(self, title, header, row_chunks):
+        path = self.path(title)
+        tmp_file = path + ".tmp"
+        rows_written = self.write_file(tmp_file, header, row_chunks)
+        os.replace(tmp_file, path)
+        return rows_written
+
+    def write_tabs(self, tabs):
+        return {title: self.write_tab(title, header, row_chunks) for title, header, row_chunks in tabs}
+
+
+# 🔹 CSV ohne Zusatzabhängigkeit: Zeilen unverändert, so wie sie auch im Sheet landen
+class CsvSink(FileSink):
+    extension = "csv"
+
+    def write_file(self, path, header, row_chunks):
+        rows_written = 0
+        with open(path, "w", newline="", encoding="utf-8", buffering=1 << 20) as f:
+            writer = csv.writer(f)
+            wrote_header = False
+            for chunk in row_chunks:
+                if not wrote_header and chunk:
+                    writer.writerow(column_names(header, max(len(header), len(chunk[0]))))
+                    wrote_header = True
+                writer.writerows(chunk)
+                rows_written += len(chunk)
+            if not wrote_header:
+                writer.writerow(header)
+        return rows_written
+
+
+# 🔹 Dictionary-Codes über alle Batches einer Datei stabil halten (neue Werte werden hinten angehängt)
+class DictionaryEncoder:
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, pa, column):
+        codes = self.codes
+        indices = []
+        for value in column:
+            if value is None:
+                indices.append(None)  # null als Index, nicht im Dictionary (kann Parquet nicht schreiben)
+                continue
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(pa.array(indices, pa.int32()), pa.array(self.values, pa.string()))
+
+
+# 🔹 Basis für Parquet und Arrow IPC: Zeilen spaltenweise in typisierte Arrow-Batches umwandeln
+class ArrowFileSink(FileSink):
+    def __init__(self, output_dir=".", batch_size=ROW_GROUP_SIZE):
+        super().__init__(output_dir, batch_size)
+        self.pa = import_pyarrow()
+
+    def schema(self, names):
+        pa = self.pa
+        fields = []
+        for name in names:
+            if name in INT64_COLUMNS:
+                field_type = pa.int64()
+            elif name in INT32_COLUMNS:
+                field_type = pa.int32()
+            elif name in FLOAT_COLUMNS:
+                field_type = pa.float64()
+            elif name in DATE_COLUMNS:
+                field_type = pa.date32()
+            elif name in DICTIONARY_COLUMNS:
+                field_type = pa.dictionary(pa.int32(), pa.string())
+            else:
+                field_type = pa.string()
+            fields.append(pa.field(name, field_type))
+        return pa.schema(fields)
+
+    def record_batch(self, schema, rows, encoders):
+        pa = self.pa
+        columns = list(zip(*rows))
+        arrays = []
+        for field, column in zip(schema, columns):
+            name = field.name
+            if name in DICTIONARY_COLUMNS:
+                arrays.append(encoders.setdefault(name, DictionaryEncoder()).encode(pa, column))
+            elif name in DATE_COLUMNS:
+                # "YYYY-MM-DD" über den Arrow-Cast parsen, "" -> null
+                arrays.append(pa.array([value or None for value in column], pa.string()).cast(field.type))
+            elif name in FLOAT_COLUMNS:
+                arrays.append(pa.array([None if value in EMPTY else float(value) for value in column], field.type))  # Amount kommt als String
+            elif field.type == pa.string():
+                arrays.append(pa.array(column, pa.string()))
+            else:
+                arrays.append(pa.array([None if value in EMPTY else value for value in column], field.type))
+        return pa.record_batch(arrays, schema=schema)
+
+    def write_file(self, path, header, row_chunks):
+        rows_written = 0
+        encoders = {}
+        writer = None
+        try:
+            for rows in row_batches(row_chunks, self.batch_size):
+                if writer is None:
+                    schema = self.schema(column_names(header, max(len(header), len(rows[0]))))
+                    writer = self.open_writer(path, schema)
+                writer.write_batch(self.record_batch(schema, rows, encoders))
+                rows_written += len(rows)
+            if writer is None:
+                writer = self.open_writer(path, self.schema(header))
+        finally:
+            if writer is not None:
+                writer.close()
+        return rows_written
+
+
+# 🔹 Parquet: eine Row Group pro Batch, Dictionary-Spalten bleiben dictionary-kodiert
+class ParquetSink(ArrowFileSink):
+    extension = "parquet"
+
+    def open_writer(self, path, schema):
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(path, schema, compression="zstd")
+
+
+# 🔹 Arrow IPC (Feather v2): unkomprimiert und per Memory-Map ohne Kopie lesbar
+# Neue Dictionary-Werte späterer Batches werden als Deltas geschrieben (im IPC-Dateiformat erlaubt, Ersetzen nicht).
+class ArrowSink(ArrowFileSink):
+    extension = "arrow"
+
+    def open_writer(self, path, schema):
+        pa = self.pa
+        return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+
+FILE_SINKS = {"csv": CsvSink, "parquet": ParquetSink, "arrow": ArrowSink}
@@ -0,0 +1,222 @@
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+from hubspot_sales_pipeline_analysis.metrics import endpoint_label
+
+BASE_URL = "https://api.hubapi.com"
+
+# 🔹 HubSpot private app defaults: 100 requests per 10 seconds, 250k per day
+DEFAULT_BURST = 100
+DEFAULT_INTERVAL = 10.0
+DEFAULT_DAILY_LIMIT = 250000
+DEFAULT_SEARCH_RATE = 4  # CRM search endpoints allow 5 requests per second on top of the burst limit
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class HubSpotError(Exception):
+    def __init__(self, response):
+        self.response = response
+        super().__init__(f"{response.status_code} - {response.text}")
+
+
+# 🔹 Token bucket: `burst` tokens refilled evenly over `interval` seconds, plus an optional daily cap
+class TokenBucket:
+    def __init__(self, burst=DEFAULT_BURST, interval=DEFAULT_INTERVAL, daily_limit=None):
+        self.capacity = burst
+        self.rate = burst / interval
+        self.tokens = float(burst)
+        self.daily_remaining = daily_limit
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if self.daily_remaining is not None and self.daily_remaining <= 0:
+                    raise RuntimeError("HubSpot daily API quota exhausted")
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    if self.daily_remaining is not None:
+                        self.daily_remaining -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    # Server-side view wins: never hand out more tokens than HubSpot says are left
+    def sync(self, remaining=None, daily_remaining=None):
+        with self.lock:
+            self._refill()
+            if remaining is not None:
+                self.tokens = min(self.tokens, float(remaining))
+            if daily_remaining is not None:
+                self.daily_remaining = daily_remaining
+
+    def pause(self, seconds):
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+# 🔹 Concurrency limit that shrinks on 429 and grows back slowly on success (AIMD)
+class AdaptiveLimiter:
+    def __init__(self, max_concurrency):
+        self.max_concurrency = max_concurrency
+        self.limit = max_concurrency
+        self.active = 0
+        self.cond = threading.Condition()
+
+    def __enter__(self):
+        with self.cond:
+            while self.active >= self.limit:
+                self.cond.wait()
+            self.active += 1
+        return self
+
+    def __exit__(self, *exc):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify_all()
+
+    def decrease(self):
+        with self.cond:
+            self.limit = max(1, self.limit // 2)
+
+    def increase(self):
+        with self.cond:
+            if self.limit < self.max_concurrency:
+                self.limit += 1
+                self.cond.notify_all()
+
+
+class HubSpotClient:
+    def __init__(self, access_token, base_url=BASE_URL, burst=DEFAULT_BURST, interval=DEFAULT_INTERVAL,
+                 daily_limit=DEFAULT_DAILY_LIMIT, search_rate=DEFAULT_SEARCH_RATE, max_concurrency=10, max_retries=5,
+                 backoff=0.5, timeout=30, metrics=None):
+        self.base_url = base_url.rstrip("/")
+        self.metrics = metrics  # optional Metrics: requests, latency and retries per endpoint
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.rng = random.Random()  # own generator for jitter, retries must not shift the seeded synthesis in `random`
+        self.bucket = TokenBucket(burst, interval, daily_limit)
+        self.search_bucket = TokenBucket(search_rate, 1.0)
+        self.limiter = AdaptiveLimiter(max_concurrency)
+
+        # Keep-alive pool sized for the maximum number of parallel requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_concurrency, pool_maxsize=max_concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        })
+
+    @classmethod
+    def from_env(cls, **kwargs):
+        load_dotenv()
+        access_token = os.getenv("HUBSPOT_API_KEY")
+        if not access_token:
+            raise ValueError("HubSpot API Key not found. Please set the HUBSPOT_API_KEY in your .env file.")
+        kwargs.setdefault("base_url", os.getenv("HUBSPOT_BASE_URL", BASE_URL))
+        kwargs.setdefault("burst", int(os.getenv("HUBSPOT_BURST_LIMIT", DEFAULT_BURST)))
+        kwargs.setdefault("daily_limit", int(os.getenv("HUBSPOT_DAILY_LIMIT", DEFAULT_DAILY_LIMIT)))
+        kwargs.setdefault("search_rate", float(os.getenv("HUBSPOT_SEARCH_RATE", DEFAULT_SEARCH_RATE)))
+        return cls(access_token, **kwargs)
+
+    def _update_from_headers(self, response):
+        headers = response.headers
+        remaining = headers.get("X-HubSpot-RateLimit-Remaining")
+        daily_remaining = headers.get("X-HubSpot-RateLimit-Daily-Remaining")
+        self.bucket.sync(
+            int(remaining) if remaining is not None else None,
+            int(daily_remaining) if daily_remaining is not None else None
+        )
+        maximum = headers.get("X-HubSpot-RateLimit-Max")
+        if remaining is not None and maximum and int(remaining) < int(maximum) // 10:
+            self.limiter.decrease()
+
+    def _retry_delay(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after) + self.rng.uniform(0, self.backoff)
+            except ValueError:
+                pass
+        # Full jitter exponential backoff
+        return self.rng.uniform(0, self.backoff * 2 ** attempt)
+
+    # 🔹 Send a request with rate limiting and retries, returns the last response
+    def request(self, method, path, **kwargs):
+        url = path if path.startswith("http") else self.base_url + path
+        kwargs.setdefault("timeout", self.timeout)
+        metrics = self.metrics
+        endpoint = endpoint_label(method, url) if metrics else None
+        for attempt in range(self.max_retries + 1):
+            if url.endswith("/search"):
+                self.search_bucket.acquire()
+            self.bucket.acquire()
+            try:
+                with self.limiter:
+                    started = time.perf_counter()
+                    response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if metrics:
+                    metrics.observe_request(endpoint, type(error).__name__, time.perf_counter() - started)
+                if attempt == self.max_retries:
+                    raise
+                if metrics:
+                    metrics.retry(endpoint, type(error).__name__)
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if metrics:
+                metrics.observe_request(endpoint, response.status_code, time.perf_counter() - started)
+            self._update_from_headers(response)
+            if response.status_code not in RETRY_STATUS or attempt == self.max_retries:
+                if response.status_code < 400:
+                    self.limiter.increase()
+                return response
+
+            if metrics:
+                metrics.retry(endpoint, response.status_code)
+            delay = self._retry_delay(attempt, response)
+            if response.status_code == 429:
+                # Pausing the shared bucket holds back every thread, not just this one
+                self.limiter.decrease()
+                self.bucket.pause(delay)
+            else:
+                time.sleep(delay)
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    # 🔹 Like request(), but raises HubSpotError instead of returning an error body
+    def request_json(self, method, path, **kwargs):
+        response = self.request(method, path, **kwargs)
+        if response.status_code >= 400:
+            raise HubSpotError(response)
+        return response.json()
+
+    def get_json(self, path, **kwargs):
+        return self.request_json("GET", path, **kwargs)
+
+    def post_json(self, path, **kwargs):
+        return self.request_json("POST", path, **kwargs)
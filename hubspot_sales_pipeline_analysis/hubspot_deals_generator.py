@@ -1,24 +1,18 @@
-import requests
 import json
+import os
 import random
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from dotenv import load_dotenv
-import os
-
-# 🔐 Load .env file
-load_dotenv()
-ACCESS_TOKEN = os.getenv("HUBSPOT_API_KEY")
-
-# Ensure that the API key is loaded
-if not ACCESS_TOKEN:
-    raise ValueError("HubSpot API Key not found. Please set the HUBSPOT_API_KEY in your .env file.")
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.metrics import Metrics, phase, add_metrics_arguments
 
-URL = "https://api.hubapi.com/crm/v3/objects/deals"
-
-HEADERS = {
-    "Authorization": f"Bearer {ACCESS_TOKEN}",
-    "Content-Type": "application/json"
-}
+URL = "/crm/v3/objects/deals"
+BATCH_URL = URL + "/batch/create"
+BATCH_SIZE = 100  # HubSpot limit for batch/create
+TOTAL = 1500
+NDJSON_NAME = "deals-{shard:05d}.ndjson"
 
 # 🔹 Possible Deal Stages in HubSpot
 DEAL_STAGES = [
@@ -125,55 +119,274 @@ DEAL_NAME_VARIATIONS = [
     "Data Warehousing Setup – Cloud-based Reporting"
 ]
 
-# 🔹 Generate Deals
-companies = {}  # Dictionary to store companies and their deals
+# 🔹 Log the result of a single deal
+def log_deal_result(i, deal_data, error=None):
+    props = deal_data["properties"]
+    if error is None:
+        print(f"✅ Deal {i+1} created: {props['dealname']} - {props['amount']}€ - {props['probability_amount']}€ - {props['probability']} - {props['dealtype']} - {props['deal_stage_sales']} - {props['company_name']} - {props['closedate']} - {props['createdate']}")
+    else:
+        print(f"❌ Error with Deal {i+1}: {error}")
+
+# 🔹 Send one chunk of deals to the batch endpoint, returns the number of created deals
+# With raise_errors=True a failure of the whole chunk (e.g. 5xx or 429 after all retries) raises HubSpotError
+# instead of being logged, so the caller can stop before marking the chunk as sent.
+def send_batch(client, batch, raise_errors=False):
+    inputs = [dict(deal_data, objectWriteTraceId=str(i)) for i, deal_data in batch]
+    response = client.post(BATCH_URL, json={"inputs": inputs})
+
+    if response.status_code == 400:
+        # One invalid property fails the whole chunk -> send the deals one by one so only the broken deal is lost
+        created = 0
+        for i, deal_data in batch:
+            single = client.post(URL, json=deal_data)
+            if single.status_code == 201:
+                log_deal_result(i, deal_data)
+                created += 1
+            else:
+                log_deal_result(i, deal_data, f"{single.status_code} - {single.text}")
+        return created
 
-for i in range(1500):  # Loop to generate 100 deals
-    company_name = random.choice(COMPANY_NAMES)
+    if response.status_code not in (200, 201, 207):
+        if raise_errors:
+            raise HubSpotError(response)
+        for i, deal_data in batch:
+            log_deal_result(i, deal_data, f"{response.status_code} - {response.text}")
+        return 0
 
-    # Create a company entry if it doesn't exist
-    if company_name not in companies:
-        companies[company_name] = {"deals": []}
+    # 207 Multi-Status: map errors to their records via objectWriteTraceId
+    failed = {}
+    for error in response.json().get("errors", []):
+        for trace_id in error.get("context", {}).get("objectWriteTraceId", []):
+            failed[int(trace_id)] = f"{error.get('category', response.status_code)} - {error.get('message', '')}"
+    for i, deal_data in batch:
+        log_deal_result(i, deal_data, failed.get(i))
+    return sum(1 for i, _ in batch if i not in failed)
 
-    # 🔹 Determine deal type based on previous deals
-    company_deals = companies[company_name]["deals"]
-    deal_name = f"{random.choice(DEAL_NAME_VARIATIONS)}"
-    amount = random.randint(500, 50000)
+# 🔹 Generate Deals, returns the number of created deals
+# client defaults to HubSpotClient.from_env(), which raises if HUBSPOT_API_KEY is missing
+def generate_deals(total=TOTAL, batch_mode=False, client=None, metrics=None):
+    client = client or HubSpotClient.from_env(metrics=metrics)
+    if metrics and client.metrics is None:
+        client.metrics = metrics
+    with phase(metrics, "generate"):
+        created = create_deals(client, total, batch_mode)
+    if metrics:
+        metrics.add_rows("generate", created)
+    return created
 
-    days_ago = random.randint(1, 60)
-    days_offset = random.randint(5, 30)
-    close_date_obj = datetime.now() - timedelta(days=days_ago)
+# 🔹 One random deal, drawn from `rng` (the random module or a seeded random.Random), dates relative to `today`
+def random_deal(rng=random, today=None):
+    company_name = rng.choice(COMPANY_NAMES)
+    deal_name = f"{rng.choice(DEAL_NAME_VARIATIONS)}"
+    amount = rng.randint(500, 50000)
+
+    days_ago = rng.randint(1, 60)
+    days_offset = rng.randint(5, 30)
+    close_date_obj = (today or datetime.now()) - timedelta(days=days_ago)
     create_date_obj = close_date_obj - timedelta(days=days_offset)
-    create_date = create_date_obj.strftime("%Y-%m-%d")
-    close_date = close_date_obj.strftime("%Y-%m-%d")
-    deal_stage_sales = random.choice(DEAL_STAGES)
+    deal_stage_sales = rng.choice(DEAL_STAGES)
     probability = STAGE_PROBABILITIES[deal_stage_sales]
     forecast_amount = round(amount * probability, 2)
-    deal_type = random.choice(DEAL_TYPE)
+    deal_type = rng.choice(DEAL_TYPE)
 
     # 🔹 Assemble deal
-    deal_data = {
+    return {
         "properties": {
             "dealname": deal_name,
             "amount": str(amount),
             "probability_amount": str(forecast_amount),
             "probability": float(probability),
             "deal_stage_sales": deal_stage_sales,
-            "closedate": close_date,
-            "createdate": create_date,
+            "closedate": close_date_obj.strftime("%Y-%m-%d"),
+            "createdate": create_date_obj.strftime("%Y-%m-%d"),
             "company_name": company_name,
             "pipeline": "default",
             "dealtype": deal_type
         }
     }
 
-    # 🔹 Append the full deal to the company's deals
-    company_deals.append(deal_data)
+# 🔹 Create `total` random deals one by one or in batches, returns the number of created deals
+def create_deals(client, total, batch_mode):
+    batch = []
+    created = 0
+    start_time = time.perf_counter()
+
+    for i in range(total):
+        deal_data = random_deal()
+
+        if batch_mode:
+            batch.append((i, deal_data))
+            if len(batch) == BATCH_SIZE:
+                created += send_batch(client, batch)
+                batch = []
+            continue
+
+        # Send request to HubSpot API
+        response = client.post(URL, json=deal_data)
+
+        if response.status_code == 201:
+            log_deal_result(i, deal_data)
+            created += 1
+        else:
+            log_deal_result(i, deal_data, f"{response.status_code} - {response.text}")
 
-    # Send request to HubSpot API
-    response = requests.post(URL, json=deal_data, headers=HEADERS)
+    if batch:
+        created += send_batch(client, batch)
 
-    if response.status_code == 201:
-        print(f"✅ Deal {i+1} created: {deal_name} - {amount}€ - {forecast_amount}€ - {probability} - {deal_type} - {deal_stage_sales} - {company_name} - {close_date} - {create_date}")
+    elapsed = time.perf_counter() - start_time
+    print(f"⏱️ {created}/{total} deals created in {elapsed:.1f}s ({created / elapsed if elapsed else 0:.1f} deals/s)")
+    return created
+
+
+# 🔹 Offline synthesis: write `count` deals of one shard to an NDJSON file (one deal per line)
+# Every shard has its own random.Random seeded from (seed, shard), so a shard's file is the same on every run,
+# no matter how many worker processes there are. Written to a .tmp file first and renamed when complete.
+def write_shard(path, shard, count, seed, today):
+    rng = random.Random(f"{seed}/{shard}")
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8", buffering=1 << 20) as f:
+        for _ in range(count):
+            f.write(json.dumps(random_deal(rng, today), ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+    os.replace(tmp_file, path)
+    return count
+
+# 🔹 Synthesize `total` deals into `shards` NDJSON files using `workers` processes, returns the file paths
+# `today` fixes the reference date for close/create dates, so the same seed and date give byte-identical files.
+def synthesize_ndjson(output_dir, total=TOTAL, shards=None, workers=None, seed=0, today=None, metrics=None):
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers
+    today = today or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    os.makedirs(output_dir, exist_ok=True)
+    counts = [total // shards + (1 if shard < total % shards else 0) for shard in range(shards)]
+    paths = [os.path.join(output_dir, NDJSON_NAME.format(shard=shard)) for shard in range(shards)]
+    start_time = time.perf_counter()
+    with phase(metrics, "synthesize"):
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = sum(executor.map(write_shard, paths, range(shards), counts, [seed] * shards, [today] * shards))
+    if metrics:
+        metrics.add_rows("synthesize", written)
+    elapsed = time.perf_counter() - start_time
+    print(f"⏱️ {written} deals written to {shards} NDJSON files in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f} deals/s)")
+    return paths
+
+# 🔹 NDJSON files of a directory (or explicit files) in replay order
+def ndjson_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith(".ndjson")))
+        else:
+            files.append(path)
+    return files
+
+# Save replay progress atomically: the file being sent, the byte offset after the last sent batch
+# and the number of lines read up to that offset, so deal numbers in the log continue after a resume
+def save_progress(progress_file, path, offset, lines):
+    tmp_file = progress_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"file": os.path.abspath(path), "offset": offset, "lines": lines}, f)
+    os.replace(tmp_file, progress_file)
+
+def load_progress(progress_file):
+    if not progress_file or not os.path.exists(progress_file):
+        return None
+    with open(progress_file, encoding="utf-8") as f:
+        return json.load(f)
+
+# 🔹 Replay NDJSON files to HubSpot in batches at no more than `rate` deals per second, returns the number of created deals
+# After every batch the byte offset is saved to `progress_file`; with resume=True the replay starts at that file and
+# offset, so an interrupted upload continues where it stopped. Generation and upload speed are independent.
+# If a whole batch fails, the replay stops with HubSpotError and the saved offset still points before that batch.
+def replay_ndjson(paths, client=None, rate=None, progress_file=None, resume=False, metrics=None):
+    client = client or HubSpotClient.from_env(metrics=metrics)
+    if metrics and client.metrics is None:
+        client.metrics = metrics
+    files = ndjson_files(paths)
+    progress = load_progress(progress_file) if resume else None
+    if progress:
+        resumed = [i for i, path in enumerate(files) if os.path.abspath(path) == progress["file"]]
+        if not resumed:
+            raise ValueError(f"{progress['file']} from {progress_file} is not part of this replay")
+        files = files[resumed[0]:]
+
+    created = 0
+    sent = 0
+    start_time = time.perf_counter()
+    with phase(metrics, "replay"):
+        for path in files:
+            offset, lines = 0, 0
+            if progress and os.path.abspath(path) == progress["file"]:
+                offset, lines = progress["offset"], progress.get("lines", 0)
+            with open(path, "rb") as f:
+                f.seek(offset)
+                batch = []
+                for line_number, line in enumerate(f, lines):
+                    offset += len(line)
+                    lines = line_number + 1
+                    if line.strip():
+                        batch.append((line_number, json.loads(line)))
+                    if len(batch) == BATCH_SIZE:
+                        created += send_batch(client, batch, raise_errors=True)
+                        sent += len(batch)
+                        batch = []
+                        if progress_file:
+                            save_progress(progress_file, path, offset, lines)
+                        throttle(start_time, sent, rate)
+                if batch:
+                    created += send_batch(client, batch, raise_errors=True)
+                    sent += len(batch)
+                if progress_file:
+                    save_progress(progress_file, path, offset, lines)
+    if metrics:
+        metrics.add_rows("replay", created)
+    elapsed = time.perf_counter() - start_time
+    print(f"⏱️ {created}/{sent} deals replayed in {elapsed:.1f}s ({created / elapsed if elapsed else 0:.1f} deals/s)")
+    return created
+
+# Sleep until `sent` deals fit into the target rate (deals per second) since `start_time`
+def throttle(start_time, sent, rate):
+    if rate:
+        delay = start_time + sent / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+# 🔹 Command line entry point (console_scripts: hubspot-generate-deals)
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate random deals in HubSpot")
+    parser.add_argument("--batch", action="store_true", help="create deals in chunks via the CRM batch endpoint")
+    parser.add_argument("--total", type=int, default=TOTAL, help=f"number of deals to create (default: {TOTAL})")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--ndjson", metavar="DIR", help="write the deals to NDJSON files in DIR instead of sending them to HubSpot")
+    mode.add_argument("--replay", metavar="PATH", nargs="+", help="send deals from NDJSON files (or directories of them) to HubSpot in batches")
+    parser.add_argument("--shards", type=int, help="with --ndjson: number of files (default: one per worker)")
+    parser.add_argument("--workers", type=int, help="with --ndjson: worker processes (default: CPU count)")
+    parser.add_argument("--seed", type=int, default=0, help="with --ndjson: seed, each shard draws from its own generator (default: 0)")
+    parser.add_argument("--today", type=lambda value: datetime.strptime(value, "%Y-%m-%d"),
+                        help="with --ndjson: reference date YYYY-MM-DD for close/create dates (default: today)")
+    parser.add_argument("--rate", type=float, help="with --replay: maximum deals per second")
+    parser.add_argument("--progress", help="with --replay: file that keeps the current file, byte offset and line count")
+    parser.add_argument("--resume", action="store_true", help="with --replay --progress: continue from the saved byte offset")
+    add_metrics_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.resume and not args.progress:
+        parser.error("--resume needs --progress")
+    metrics = Metrics("generate") if args.metrics_json or args.metrics_prom else None
+    if args.ndjson:
+        synthesize_ndjson(args.ndjson, args.total, args.shards, args.workers, args.seed, args.today, metrics)
+    elif args.replay:
+        try:
+            replay_ndjson(args.replay, rate=args.rate, progress_file=args.progress, resume=args.resume, metrics=metrics)
+        except HubSpotError as error:
+            hint = "run again with --resume to continue from the last sent batch" if args.progress else "nothing was saved, use --progress to resume"
+            parser.exit(1, f"❌ Replay stopped, a batch could not be sent: {error}\n{hint}\n")
     else:
-        print(f"❌ Error with Deal {i+1}: {response.status_code} - {response.text}")
+        generate_deals(args.total, args.batch, metrics=metrics)
+    if metrics:
+        metrics.report()
+        metrics.write(args.metrics_json, args.metrics_prom)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+# Obergrenzen der Latenz-Buckets in Sekunden (wie die Prometheus-Client-Defaults, ohne die ganz kurzen)
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+# Funktion: Endpoint-Label ohne Host, Query und IDs ("GET /crm/v3/objects/companies/{id}")
+def endpoint_label(method, url):
+    path = url.split("://", 1)[-1]
+    path = path[path.find("/"):] if "/" in path else "/"
+    return f"{method} {ID_SEGMENT.sub('/{id}', path.split('?', 1)[0])}"
+
+
+# Funktion: Peak RSS des Prozesses in Bytes (None, wo das resource-Modul fehlt, z. B. Windows)
+def peak_rss_bytes():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Linux liefert KiB
+
+
+# 🔹 Messwerte eines Laufs: Phasen, HTTP-Requests pro Endpoint, Retries, Zeilen pro Phase, Peak RSS
+# Ausgeschaltet wird einfach kein Metrics-Objekt übergeben (metrics=None); die Aufrufer prüfen darauf,
+# dann bleiben Generatoren unverpackt und pro Request fällt nur ein None-Vergleich an.
+class Metrics:
+    def __init__(self, job="export"):
+        self.job = job
+        self.started = time.time()
+        self.start = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.phase_seconds = defaultdict(float)
+        self.phase_rows = defaultdict(int)
+        self.requests = defaultdict(int)  # (endpoint, status) -> Anzahl
+        self.latency = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))  # endpoint -> Zähler je Bucket (+Inf zuletzt)
+        self.latency_sum = defaultdict(float)
+        self.retries = defaultdict(int)  # (endpoint, Grund) -> Anzahl
+
+    # Verschachtelte Phasen auf demselben Thread: die innere Zeit wird der äußeren abgezogen
+    def _stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _enter(self):
+        self._stack().append(0.0)
+        return time.perf_counter()
+
+    def _exit(self, name, started):
+        elapsed = time.perf_counter() - started
+        stack = self._stack()
+        nested = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self.lock:
+            self.phase_seconds[name] += elapsed - nested
+
+    @contextmanager
+    def phase(self, name):
+        started = self._enter()
+        try:
+            yield
+        finally:
+            self._exit(name, started)
+
+    # 🔹 Generator-Stufe messen: Zeit in next() (ohne vorgelagerte Stufen) und Anzahl Zeilen je Element
+    def timed(self, name, iterable, size=len):
+        iterator = iter(iterable)
+        while True:
+            started = self._enter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                self._exit(name, started)
+            self.add_rows(name, size(item))
+            yield item
+
+    def add_rows(self, name, count):
+        with self.lock:
+            self.phase_rows[name] += count
+
+    def observe_request(self, endpoint, status, seconds):
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            self.requests[(endpoint, str(status))] += 1
+            self.latency[endpoint][bucket] += 1
+            self.latency_sum[endpoint] += seconds
+
+    def retry(self, endpoint, reason):
+        with self.lock:
+            self.retries[(endpoint, str(reason))] += 1
+
+    # 🔹 Rohe Zähler als einfache dicts (picklebar), damit ein Portal-Prozess sie an den Elternprozess zurückgeben kann
+    def counters(self):
+        with self.lock:
+            return {
+                "phase_seconds": dict(self.phase_seconds),
+                "phase_rows": dict(self.phase_rows),
+                "requests": dict(self.requests),
+                "latency": {endpoint: list(counts) for endpoint, counts in self.latency.items()},
+                "latency_sum": dict(self.latency_sum),
+                "retries": dict(self.retries)
+            }
+
+    # Zähler aus counters() dazuaddieren; Phasenzeiten parallel laufender Prozesse summieren sich dabei
+    def merge(self, counters):
+        with self.lock:
+            for name in ("phase_seconds", "phase_rows", "requests", "latency_sum", "retries"):
+                totals = getattr(self, name)
+                for key, value in counters[name].items():
+                    totals[key] += value
+            for endpoint, counts in counters["latency"].items():
+                self.latency[endpoint] = [total + count for total, count in zip(self.latency[endpoint], counts)]
+
+    # 🔹 Zusammenfassung als dict (Grundlage für JSON und Prometheus)
+    def summary(self):
+        with self.lock:
+            endpoints = {}
+            for (endpoint, status), count in sorted(self.requests.items()):
+                entry = endpoints.setdefault(endpoint, {"requests": 0, "status": {}, "retries": {}})
+                entry["requests"] += count
+                entry["status"][status] = count
+            for (endpoint, reason), count in sorted(self.retries.items()):
+                endpoints.setdefault(endpoint, {"requests": 0, "status": {}, "retries": {}})["retries"][reason] = count
+            for endpoint, entry in endpoints.items():
+                counts = self.latency.get(endpoint, [0] * (len(LATENCY_BUCKETS) + 1))
+                entry["latency_seconds_sum"] = round(self.latency_sum.get(endpoint, 0.0), 6)
+                entry["latency_buckets"] = {str(bound): count for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts)}
+            return {
+                "job": self.job,
+                "started": self.started,
+                "duration_seconds": round(time.perf_counter() - self.start, 6),
+                "phases": {
+                    name: {"seconds": round(self.phase_seconds.get(name, 0.0), 6), "rows": self.phase_rows.get(name, 0)}
+                    for name in dict.fromkeys(list(self.phase_seconds) + list(self.phase_rows))
+                },
+                "http": endpoints,
+                "http_requests": sum(self.requests.values()),
+                "rate_limited": sum(count for (_, status), count in self.requests.items() if status == "429"),
+                "retries": sum(self.retries.values()),
+                "peak_rss_bytes": peak_rss_bytes()
+            }
+
+    def prometheus(self):
+        summary = self.summary()
+        prefix = f"hubspot_{self.job}"
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for suffix, labels, value in samples:
+                label_text = ",".join(f'{key}="{value_}"' for key, value_ in labels.items())
+                lines.append(f"{prefix}_{name}{suffix}{{{label_text}}} {value}" if label_text else f"{prefix}_{name}{suffix} {value}")
+
+        phases = summary["phases"]
+        metric("phase_seconds", "gauge", "Time spent in each phase of the last run",
+               [("", {"phase": name}, phase["seconds"]) for name, phase in phases.items()])
+        metric("phase_rows", "gauge", "Rows produced by each phase of the last run",
+               [("", {"phase": name}, phase["rows"]) for name, phase in phases.items()])
+        metric("http_requests", "gauge", "HTTP requests of the last run by endpoint and status",
+               [("", {"endpoint": endpoint, "status": status}, count)
+                for endpoint, entry in summary["http"].items() for status, count in entry["status"].items()])
+        metric("http_retries", "gauge", "HTTP retries of the last run by endpoint and reason",
+               [("", {"endpoint": endpoint, "reason": reason}, count)
+                for endpoint, entry in summary["http"].items() for reason, count in entry["retries"].items()])
+        histogram = []
+        for endpoint, entry in summary["http"].items():
+            cumulative = 0
+            for bound, count in entry["latency_buckets"].items():
+                cumulative += count
+                histogram.append(("_bucket", {"endpoint": endpoint, "le": bound}, cumulative))
+            histogram.append(("_sum", {"endpoint": endpoint}, entry["latency_seconds_sum"]))
+            histogram.append(("_count", {"endpoint": endpoint}, cumulative))
+        metric("http_request_duration_seconds", "histogram", "HTTP request latency of the last run", histogram)
+        metric("rate_limited", "gauge", "HTTP 429 responses of the last run", [("", {}, summary["rate_limited"])])
+        metric("duration_seconds", "gauge", "Wall time of the last run", [("", {}, summary["duration_seconds"])])
+        if summary["peak_rss_bytes"] is not None:
+            metric("peak_rss_bytes", "gauge", "Peak resident memory of the last run", [("", {}, summary["peak_rss_bytes"])])
+        metric("last_run_timestamp_seconds", "gauge", "Start time of the last run", [("", {}, summary["started"])])
+        return "\n".join(lines) + "\n"
+
+    # Atomar schreiben (tmp + os.replace), damit der node_exporter nie eine halbe Datei liest
+    @staticmethod
+    def _write(path, text):
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_file, path)
+
+    def write(self, json_file=None, prometheus_file=None):
+        if json_file:
+            self._write(json_file, json.dumps(self.summary(), indent=2))
+        if prometheus_file:
+            self._write(prometheus_file, self.prometheus())
+
+    # Kurzfassung für die Konsole
+    def report(self):
+        summary = self.summary()
+        phases = ", ".join(f"{name} {phase['seconds']:.2f}s/{phase['rows']}" for name, phase in summary["phases"].items())
+        print(f"📊 {summary['duration_seconds']:.2f}s gesamt | {phases} | {summary['http_requests']} Requests, "
+              f"{summary['retries']} Retries, {summary['rate_limited']}x 429")
+
+
+# Funktion: Generator messen, wenn Metrics aktiv sind, sonst unverändert durchreichen
+def timed(metrics, name, iterable, size=len):
+    return metrics.timed(name, iterable, size) if metrics else iterable
+
+
+# Funktion: Phase messen, wenn Metrics aktiv sind
+def phase(metrics, name):
+    return metrics.phase(name) if metrics else nullcontext()
+
+
+# Funktion: Gemeinsame Kommandozeilen-Flags für die Metriken (Export und Generator)
+def add_metrics_arguments(parser):
+    parser.add_argument("--metrics-json", help="write phase timings, request counts and latencies as JSON to this file")
+    parser.add_argument("--metrics-prom", help="write the same metrics in Prometheus textfile format to this file")
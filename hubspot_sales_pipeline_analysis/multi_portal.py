@@ -0,0 +1,137 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, BASE_URL
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver, DEFAULT_CACHE_DAYS
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.metrics import Metrics, phase
+from hubspot_sales_pipeline_analysis.export_pipeline import DEAL_ID_START, COMPANY_ID_START, ExportState, IdSpaceError
+
+PORTAL_ID_SPACE = 100_000_000  # Deal- und Company-IDs pro Portal: Portal i beginnt bei DEAL_ID_START + i * PORTAL_ID_SPACE
+CLIENT_SETTINGS = ("burst", "daily_limit", "search_rate", "max_concurrency")  # eigenes Rate-Budget pro Portal
+
+
+# 🔹 Portal-Liste aus einer JSON-Datei lesen
+# [{"name": "emea", "token_env": "HUBSPOT_API_KEY_EMEA", "base_url": ..., "burst": 100, "store": ..., "company_cache": ..., "company_cache_days": 7}, ...]
+# Statt token_env geht auch "token"; die Reihenfolge der Liste legt die ID-Bereiche fest und darf sich nicht ändern.
+def load_portals(path):
+    with open(path, encoding="utf-8") as f:
+        portals = json.load(f)
+    names = [portal.get("name") for portal in portals]
+    if not portals or None in names or len(set(names)) != len(names):
+        raise ValueError(f"{path}: need a non-empty list of portals with unique names")
+    return portals
+
+
+# Funktion: Token eines Portals, direkt oder aus der Umgebungsvariable token_env
+def portal_token(portal):
+    token = portal.get("token") or os.getenv(portal.get("token_env", ""))
+    if not token:
+        raise ValueError(f"No HubSpot token for portal {portal['name']!r}, set {portal.get('token_env') or 'token'}")
+    return token
+
+
+# Funktion: Erste Deal- und Company-ID des Portals an Position `index`
+def id_starts(index):
+    return {"deal_id_start": DEAL_ID_START + index * PORTAL_ID_SPACE, "company_id_start": COMPANY_ID_START + index * PORTAL_ID_SPACE}
+
+
+# 🔹 Ein Portal exportieren (läuft in einem eigenen Prozess): Abruf -> Synthese -> Nummerierung -> Spool-Datei
+# Eigener Prozess, damit jedes Portal seinen eigenen HubSpotClient hat; die Synthese zieht aus random.Random(seed + index).
+# Die nummerierten Chunks landen gepickelt in spool_file, zurück gehen nur Companies, Sales Reps und Zähler.
+# Mit with_metrics misst der Prozess eigene Metrics (Requests, Retries, Phasen) und gibt deren Zähler mit zurück.
+def export_portal(portal, index, spool_file, shards=None, window_days=None, workers=8, engine="python", numbering="spool",
+                  full=False, seed=None, with_metrics=False):
+    from hubspot_sales_pipeline_analysis.exporter import fetch, synthesize, number
+
+    started = time.perf_counter()
+    portal_seed = None if seed is None else seed + index
+    stage_engine = None
+    if engine == "numpy":
+        from hubspot_sales_pipeline_analysis.stage_engine import StageHistoryEngine
+        stage_engine = StageHistoryEngine(portal_seed)
+
+    metrics = Metrics() if with_metrics else None
+    hubspot = HubSpotClient(
+        portal_token(portal), base_url=portal.get("base_url", BASE_URL), metrics=metrics,
+        **{setting: portal[setting] for setting in CLIENT_SETTINGS if setting in portal}
+    )
+    company_resolver = CompanyResolver(hubspot, portal.get("company_cache"), portal.get("company_cache_days", DEFAULT_CACHE_DAYS))
+    store = DealStore(portal["store"]) if portal.get("store") else None
+    starts = id_starts(index)
+    rng = random.Random(portal_seed)
+    state = ExportState.from_store(store, rng=rng, id_space=PORTAL_ID_SPACE, **starts) if store else ExportState(
+        rng=rng, id_space=PORTAL_ID_SPACE, **starts
+    )
+    since = store.get_state("high_water_mark") if store and not full else None
+    prune = store is not None and since is None
+
+    # Store auch bei einem Fehler schließen, sonst scheitert ein Retry mit "database is locked". Ungültige IDs fallen
+    # schon beim Vergeben auf (IdSpaceError), der Store wird dann ohne Commit geschlossen und bleibt unverändert.
+    try:
+        pages = fetch(hubspot, since, shards, window_days, workers, metrics)
+        rows = 0
+        with open(spool_file, "wb") as f:
+            for chunk in number(synthesize(pages, company_resolver, state, store, stage_engine, metrics, prune), numbering, metrics):
+                pickle.dump(chunk, f, pickle.HIGHEST_PROTOCOL)
+                rows += len(chunk)
+    except IdSpaceError as error:
+        raise IdSpaceError(f"Portal {portal['name']!r} ran out of its ID space ({PORTAL_ID_SPACE} IDs): {error}") from error
+    finally:
+        company_resolver.save()
+        if store:
+            store.close()
+    return {"companies": state.companies, "sales_reps": state.sales_reps, "rows": rows, "seconds": time.perf_counter() - started,
+            "metrics": metrics.counters() if metrics else None}
+
+
+# Funktion: Gepickelte Chunks einer Spool-Datei nacheinander lesen
+def read_spool(spool_file):
+    with open(spool_file, "rb") as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+# 🔹 Mehrere Portale gleichzeitig exportieren und zu einem Deal-/Company-/Sales-Rep-Ergebnis zusammenführen
+# Jedes Portal läuft in einem eigenen Prozess mit eigenem Token und Rate-Budget, die Gesamtzeit bestimmt also das
+# langsamste Portal. Deals erscheinen in der Reihenfolge der Portale; Deal Numbers zählen pro Company, und Companies
+# gehören immer zu genau einem Portal, die Nummerierung pro Portal bleibt also auch im Gesamtergebnis richtig.
+def export_portals(portals, spreadsheet=None, shards=None, window_days=None, workers=8, engine="python", numbering="spool",
+                   full=False, sync="replace", staging=False, seed=None, metrics=None, sink="sheets", output_dir=".",
+                   analytics=False, summarizer=None):
+    from hubspot_sales_pipeline_analysis.exporter import write_outputs
+
+    if sink != "sheets" and sync == "diff":
+        raise ValueError("sync='diff' needs the Google Sheets sink")
+    with tempfile.TemporaryDirectory(prefix="hubspot-portals-") as spool_dir:
+        spool_files = [os.path.join(spool_dir, f"portal-{index}.pickle") for index in range(len(portals))]
+        with phase(metrics, "portals"):
+            with ProcessPoolExecutor(max_workers=len(portals)) as executor:
+                futures = [
+                    executor.submit(export_portal, portal, index, spool_file, shards, window_days, workers, engine, numbering, full, seed,
+                                    metrics is not None)
+                    for index, (portal, spool_file) in enumerate(zip(portals, spool_files))
+                ]
+                portal_results = [future.result() for future in futures]
+
+        state = ExportState()
+        for portal, result in zip(portals, portal_results):
+            print(f"🌍 {portal['name']}: {result['rows']} Zeilen, {len(result['companies'])} Companies in {result['seconds']:.1f}s")
+            state.companies.update(result["companies"])
+            for sales_reps_id, sales_reps in result["sales_reps"].items():
+                state.sales_reps.setdefault(sales_reps_id, sales_reps)
+        if metrics:
+            metrics.add_rows("portals", sum(result["rows"] for result in portal_results))
+            for result in portal_results:
+                metrics.merge(result["metrics"])
+        deal_chunks = chain.from_iterable(read_spool(spool_file) for spool_file in spool_files)
+        return write_outputs(spreadsheet, deal_chunks, state, sync, staging, metrics, sink, output_dir, analytics, summarizer)
@@ -0,0 +1,193 @@
+from datetime import date
+from itertools import chain
+
+import numpy as np
+
+from hubspot_sales_pipeline_analysis.export_pipeline import STAGE_PROBABILITIES, CHUNK_SIZE, chunked
+
+APPEND_BLOCK = 10000  # Stage-Zeilen pro append_rows-Aufruf
+
+
+# 🔹 Interning für wiederkehrende Strings (Stages, Deal Types, Pipeline, Deal-Namen, Amounts): String <-> kleiner Code
+class StringPool:
+    def __init__(self, values=()):
+        self.values = []
+        self.codes = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    # Codes einer ganzen Spalte: neue Werte einmal eintragen, dann per map(dict.__getitem__) ohne Python-Schleife
+    def encode(self, column):
+        for value in set(column).difference(self.codes):
+            self.code(value)
+        return map(self.codes.__getitem__, column)
+
+
+# 🔹 Spaltenweiser Speicher für Stage-Zeilen
+# Statt 15-elementiger Listen liegen die Zeilen in typisierten NumPy-Spalten: Strings als Codes, Datumswerte als
+# Ordinals (0 = leer), Days in Stage -1 = leer, Forecast NaN = leer. Die Probability ergibt sich aus der Stage.
+# Jeder append_rows-Aufruf legt pro Spalte einen Block an, column() fügt die Blöcke beim ersten Lesen zusammen.
+class StageRowTable:
+    COLUMNS = {
+        "deal_id": np.int64, "company_id": np.int64, "sales_reps_id": np.int32, "deal_name": np.int32, "amount": np.int32,
+        "forecast_amount": np.float64, "stage": np.int8, "deal_type": np.int8, "close_date": np.int32, "create_date": np.int32,
+        "entered_stage_date": np.int32, "days_in_stage": np.int32, "pipeline": np.int8, "hs_deal_type": np.int8
+    }
+
+    def __init__(self):
+        self.blocks = {name: [] for name in self.COLUMNS}
+        self.rows = 0
+
+        self.stages = StringPool(STAGE_PROBABILITIES)
+        self.deal_types = StringPool()
+        self.pipelines = StringPool()
+        self.names = StringPool()
+        self.amounts = StringPool()
+        self.ordinals = {"": 0}    # "YYYY-MM-DD" -> Ordinal
+        self.date_strings = {0: ""}  # Ordinal -> "YYYY-MM-DD"
+
+    def __len__(self):
+        return self.rows
+
+    def column(self, name):
+        blocks = self.blocks[name]
+        if len(blocks) != 1:
+            blocks[:] = [np.concatenate(blocks) if blocks else np.empty(0, dtype=self.COLUMNS[name])]
+        return blocks[0]
+
+    # Ordinals einer ganzen Datumsspalte, wie StringPool.encode
+    def _ordinals(self, column):
+        for value in set(column).difference(self.ordinals):
+            ordinal = self.ordinals[value] = date.fromisoformat(value).toordinal()
+            self.date_strings[ordinal] = value
+        return map(self.ordinals.__getitem__, column)
+
+    # Stage-Zeilen im Format von build_stage_rows anhängen, spaltenweise pro Batch statt Zeile für Zeile
+    def append_rows(self, stage_rows):
+        if not stage_rows:
+            return
+        count = len(stage_rows)
+
+        def column(index):
+            return [row[index] for row in stage_rows]
+
+        def add(name, values):
+            dtype = self.COLUMNS[name]
+            self.blocks[name].append(np.array(values, dtype=dtype) if isinstance(values, list) else np.fromiter(values, dtype, count))
+
+        add("deal_id", column(0))
+        add("company_id", column(1))
+        add("sales_reps_id", column(2))
+        add("deal_name", self.names.encode(column(3)))
+        add("amount", self.amounts.encode(column(4)))
+        add("forecast_amount", [float("nan") if value == "" else value for value in column(5)])
+        add("stage", self.stages.encode(column(7)))
+        add("deal_type", self.deal_types.encode(column(8)))
+        add("close_date", self._ordinals(column(9)))
+        add("create_date", self._ordinals(column(10)))
+        add("entered_stage_date", self._ordinals(column(11)))
+        add("days_in_stage", [-1 if value == "" else value for value in column(12)])
+        add("pipeline", self.pipelines.encode(column(13)))
+        add("hs_deal_type", self.deal_types.encode(column(14)))
+        self.rows += count
+
+    # 🔹 Nummerierung in einem Sort-Durchlauf über (Company, sql zuerst, Create Date, Reihenfolge)
+    # Liefert die Ausgabe-Reihenfolge der Zeilen und die Deal Number je Ausgabezeile, identisch zur bisherigen Logik:
+    # Companies in Reihenfolge ihres ersten Auftretens, pro Company erst die "sql"-Zeilen nach Create Date, dann der Rest.
+    def number(self):
+        n = len(self)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        deal_id = self.column("deal_id")
+        company_id = self.column("company_id")
+        create_date = self.column("create_date")
+        is_sql = self.column("stage") == self.stages.codes["sql"]
+
+        _, first_index, inverse = np.unique(company_id, return_index=True, return_inverse=True)
+        company_rank = np.argsort(np.argsort(first_index))[inverse]
+        order = np.lexsort((np.arange(n), np.where(is_sql, create_date, 0), ~is_sql, company_rank))
+
+        # Deal Number = Position der sql-Zeile innerhalb ihrer Company
+        sql_order = order[is_sql[order]]
+        if len(sql_order) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        sql_company = company_rank[sql_order]
+        group_starts = np.flatnonzero(np.r_[True, sql_company[1:] != sql_company[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(sql_order)])
+        sql_numbers = np.arange(len(sql_order)) - np.repeat(group_starts, group_sizes) + 1
+
+        sql_deal_ids = deal_id[sql_order]
+        sorter = np.argsort(sql_deal_ids, kind="stable")
+        sorted_deal_ids = sql_deal_ids[sorter]
+        position = np.minimum(np.searchsorted(sorted_deal_ids, deal_id[order]), len(sorted_deal_ids) - 1)
+        numbered = sorted_deal_ids[position] == deal_id[order]  # Zeilen ohne sql-Zeile bekommen keine Nummer und fallen weg
+        return order[numbered], sql_numbers[sorter][position][numbered]
+
+    # Zeilen (mit Deal Number an Index 14) in der gegebenen Reihenfolge chunkweise als Listen ausgeben
+    # Jede Spalte eines Chunks entsteht mit einem NumPy-Index (Codes -> Strings über Objekt-Arrays), die Zeilen erst
+    # am Ende per zip; in Python läuft pro Zeile nur noch das Zusammensetzen der Liste.
+    def iter_numbered_rows(self, order, deal_numbers, chunk_size=CHUNK_SIZE):
+        def values(pool):
+            return np.array(pool.values + [None], dtype=object)[:-1]  # [None]: Tupel-Werte bleiben Skalare
+
+        deal_id = self.column("deal_id")
+        company_id = self.column("company_id")
+        sales_reps_id = self.column("sales_reps_id")
+        deal_name = self.column("deal_name")
+        amount = self.column("amount")
+        forecast_amount = self.column("forecast_amount")
+        stage = self.column("stage")
+        deal_type = self.column("deal_type")
+        days_in_stage = self.column("days_in_stage")
+        pipeline = self.column("pipeline")
+        hs_deal_type = self.column("hs_deal_type")
+
+        stage_names = values(self.stages)
+        probabilities = np.array([STAGE_PROBABILITIES[stage_name] for stage_name in self.stages.values] + [None], dtype=object)[:-1]
+        names, amounts, deal_types, pipelines = values(self.names), values(self.amounts), values(self.deal_types), values(self.pipelines)
+
+        # Datumsspalte -> (Strings der vorkommenden Ordinals, Index je Zeile), einmal für die ganze Tabelle
+        def dates(name):
+            unique, inverse = np.unique(self.column(name), return_inverse=True)
+            return np.array([self.date_strings[ordinal] for ordinal in unique.tolist()] + [None], dtype=object)[:-1], inverse
+
+        close_dates, close_date = dates("close_date")
+        create_dates, create_date = dates("create_date")
+        entered_stage_dates, entered_stage_date = dates("entered_stage_date")
+
+        def or_empty(column, empty):
+            values = column.astype(object)
+            values[empty] = ""
+            return values.tolist()
+
+        for start in range(0, len(order), chunk_size):
+            rows = order[start:start + chunk_size]
+            chunk_stage = stage[rows]
+            chunk_forecast = forecast_amount[rows]
+            chunk_days = days_in_stage[rows]
+            columns = (
+                deal_id[rows].tolist(), company_id[rows].tolist(), sales_reps_id[rows].tolist(), names[deal_name[rows]].tolist(),
+                amounts[amount[rows]].tolist(), or_empty(chunk_forecast, np.isnan(chunk_forecast)),
+                probabilities[chunk_stage].tolist(), stage_names[chunk_stage].tolist(), deal_types[deal_type[rows]].tolist(),
+                close_dates[close_date[rows]].tolist(), create_dates[create_date[rows]].tolist(),
+                entered_stage_dates[entered_stage_date[rows]].tolist(), or_empty(chunk_days, chunk_days < 0),
+                pipelines[pipeline[rows]].tolist(), deal_numbers[start:start + chunk_size].tolist(), deal_types[hs_deal_type[rows]].tolist()
+            )
+            yield list(map(list, zip(*columns)))
+
+
+# 🔹 Stufe 4 (im Speicher): Alternative zu number_deals mit kompaktem Spaltenspeicher statt SQLite-Spool
+def number_deals_columnar(stage_row_lists, chunk_size=CHUNK_SIZE):
+    table = StageRowTable()
+    # Die Synthese liefert eine kurze Liste pro Deal; gebündelt lohnt sich das spaltenweise Anhängen erst
+    for rows in chunked(chain.from_iterable(stage_row_lists), APPEND_BLOCK):
+        table.append_rows(rows)
+    order, deal_numbers = table.number()
+    yield from table.iter_numbered_rows(order, deal_numbers, chunk_size)
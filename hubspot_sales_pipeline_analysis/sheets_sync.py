@@ -0,0 +1,182 @@
+import re
+
+# 🔹 Schlüsselspalten je Tab für den Abgleich
+DEAL_KEY = ("Deal ID", "Entered Stage Date")
+COMPANY_KEY = ("Company ID",)
+OWNER_KEY = ("Sales Rep ID",)
+
+
+# Funktion: Spaltennummer (1-basiert) in A1-Buchstaben
+def column_letter(column):
+    letters = ""
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+# Funktion: Zellwert so normalisieren, wie Sheets ihn unformatiert zurückliefert (1.0 -> "1", None -> "")
+def cell_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+# Funktion: A1-Zelle ("C5") in (Spalte, Zeile)
+def parse_a1(cell):
+    letters, digits = re.match(r"([A-Z]+)(\d+)", cell).groups()
+    column = 0
+    for letter in letters:
+        column = column * 26 + ord(letter) - 64
+    return column, int(digits)
+
+
+# Funktion: Geänderte Zellen einer Zeile als zusammenhängende Bereiche für batch_update, zählt in stats mit
+def changed_ranges(old_row, row, row_number, stats):
+    old_cells = [cell_text(value) for value in old_row] + [""] * max(0, len(row) - len(old_row))
+    updates = []
+    start = None
+    for col in range(len(row) + 1):
+        if col < len(row) and cell_text(row[col]) != old_cells[col]:
+            if start is None:
+                start = col
+            continue
+        if start is not None:
+            # Zusammenhängende geänderte Zellen einer Zeile als ein Bereich
+            updates.append({
+                "range": f"{column_letter(start + 1)}{row_number}:{column_letter(col)}{row_number}",
+                "values": [list(row[start:col])]
+            })
+            stats["cells_written"] += col - start
+            start = None
+        if col < len(row):
+            stats["cells_unchanged"] += 1
+    stats["rows_updated"] += bool(updates)
+    return updates
+
+# Funktion: Zeilen löschen, von unten nach oben (damit die Zeilennummern darüber gültig bleiben), benachbarte in einem Aufruf
+def delete_rows(sheet, row_numbers):
+    stale_rows = sorted(row_numbers, reverse=True)
+    while stale_rows:
+        end = start = stale_rows.pop(0)
+        while stale_rows and stale_rows[0] == start - 1:
+            start = stale_rows.pop(0)
+        sheet.delete_rows(start, end)
+
+
+# 🔹 Tab abgleichen statt clear() + append_rows
+# Liest den aktuellen Inhalt einmal, vergleicht Zeile für Zeile über die Schlüsselspalten und schickt nur geänderte
+# Zellbereiche in einem batch_update; neue Zeilen werden angehängt, verschwundene gelöscht.
+# Neue Zeilen bleiben dabei am Ende, bestehende behalten ihre Position im Tab.
+def sync_sheet(sheet, header, row_chunks, key_columns):
+    existing = sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")
+    key_index = [header.index(column) for column in key_columns]
+    stats = {"cells_written": 0, "cells_unchanged": 0, "rows_updated": 0, "rows_appended": 0, "rows_deleted": 0}
+    updates = []
+
+    existing_header = [cell_text(value) for value in existing[0]] if existing else []
+    if existing_header != [cell_text(value) for value in header]:
+        updates.append({"range": f"A1:{column_letter(len(header))}1", "values": [list(header)]})
+        stats["cells_written"] += len(header)
+
+    # Bestehende Zeilen nach Schlüssel, Zeilennummer im Sheet (Header = Zeile 1)
+    existing_rows = {}
+    duplicate_rows = []
+    for row_number, row in enumerate(existing[1:], start=2):
+        key = tuple(cell_text(row[i]) if i < len(row) else "" for i in key_index)
+        if key in existing_rows:
+            duplicate_rows.append(row_number)
+        else:
+            existing_rows[key] = (row_number, row)
+
+    seen = set()
+    new_rows = []
+    for chunk in row_chunks:
+        for row in chunk:
+            key = tuple(cell_text(row[i]) for i in key_index)
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in existing_rows:
+                new_rows.append(row)
+                continue
+            row_number, old_row = existing_rows[key]
+            updates.extend(changed_ranges(old_row, row, row_number, stats))
+
+    if updates:
+        sheet.batch_update(updates, value_input_option="RAW")
+
+    stale_rows = duplicate_rows + [row_number for key, (row_number, _) in existing_rows.items() if key not in seen]
+    stats["rows_deleted"] = len(stale_rows)
+    delete_rows(sheet, stale_rows)
+
+    if new_rows:
+        sheet.append_rows(new_rows, value_input_option="RAW")
+        stats["rows_appended"] = len(new_rows)
+        stats["cells_written"] += sum(len(row) for row in new_rows)
+    return stats
+
+
+# 🔹 Gespiegelter Tab für den Watch-Modus: Inhalt einmal lesen, danach nur noch einzelne Gruppen abgleichen
+# Gruppe = Wert einer Spalte (z. B. Company ID); replace_groups ersetzt alle Zeilen dieser Gruppen durch neue Zeilen
+# und schickt nur die Unterschiede. Der Spiegel wird nach jedem Schreiben lokal nachgeführt, also kein erneutes Lesen.
+class TabMirror:
+    def __init__(self, sheet, header, key_columns, group_column):
+        self.sheet = sheet
+        self.header = list(header)
+        self.key_index = [header.index(column) for column in key_columns]
+        self.group_index = header.index(group_column)
+        self.rows = [[cell_text(value) for value in row] for row in sheet.get_all_values(value_render_option="UNFORMATTED_VALUE")]
+        header_cells = [cell_text(value) for value in header]
+        if not self.rows or self.rows[0][:len(header)] != header_cells:
+            sheet.batch_update([{"range": f"A1:{column_letter(len(header))}1", "values": [self.header]}], value_input_option="RAW")
+            if self.rows:
+                self.rows[0][:len(header)] = header_cells
+            else:
+                self.rows.append(header_cells)
+
+    def key(self, row):
+        return tuple(cell_text(row[i]) if i < len(row) else "" for i in self.key_index)
+
+    def group(self, row):
+        return row[self.group_index] if self.group_index < len(row) else ""
+
+    def groups(self):
+        return {self.group(row) for row in self.rows[1:]}
+
+    def replace_groups(self, groups, rows):
+        groups = {cell_text(group) for group in groups}
+        stats = {"cells_written": 0, "cells_unchanged": 0, "rows_updated": 0, "rows_appended": 0, "rows_deleted": 0}
+        new_rows = {}
+        for row in rows:
+            new_rows.setdefault(self.key(row), row)
+
+        updates = []
+        stale_rows = []
+        for row_number, old_row in enumerate(self.rows[1:], start=2):
+            if self.group(old_row) not in groups:
+                continue
+            row = new_rows.pop(self.key(old_row), None)
+            if row is None:
+                stale_rows.append(row_number)
+                continue
+            row_updates = changed_ranges(old_row, row, row_number, stats)
+            if row_updates:
+                updates.extend(row_updates)
+                self.rows[row_number - 1] = [cell_text(value) for value in row]
+
+        if updates:
+            self.sheet.batch_update(updates, value_input_option="RAW")
+        if stale_rows:
+            delete_rows(self.sheet, stale_rows)
+            for row_number in sorted(stale_rows, reverse=True):
+                del self.rows[row_number - 1]
+            stats["rows_deleted"] = len(stale_rows)
+        if new_rows:
+            appended = list(new_rows.values())
+            self.sheet.append_rows(appended, value_input_option="RAW")
+            self.rows.extend([cell_text(value) for value in row] for row in appended)
+            stats["rows_appended"] = len(appended)
+            stats["cells_written"] += sum(len(row) for row in appended)
+        return stats
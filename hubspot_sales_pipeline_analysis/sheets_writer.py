@@ -0,0 +1,142 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+MAX_CELLS_PER_REQUEST = 50000  # hält einen append_rows-Request deutlich unter dem Payload-Limit der Sheets API
+RETRY_STATUS = {429, 500, 502, 503}
+APPEND_RETRY_STATUS = {429}  # append ist nicht idempotent: nach einem 5xx kann die Zeile schon drin sein, 429 wurde sicher abgelehnt
+STAGING_SUFFIX = " (staging)"
+
+
+# 🔹 Schreibt Tabs eines einmal geöffneten Spreadsheets in größenbegrenzten Chunks, mit Retry bei Quota-Fehlern
+# Mit staging=True wird jeder Tab erst in "<Tab> (staging)" geschrieben und dann in einem einzigen batch_update
+# in den Live-Tab kopiert; der Live-Tab ist also nie halb geschrieben und behält seine Sheet-ID (Formeln bleiben gültig).
+class SheetsWriter:
+    def __init__(self, spreadsheet, max_cells=MAX_CELLS_PER_REQUEST, max_retries=5, backoff=1.0, staging=False, metrics=None):
+        self.spreadsheet = spreadsheet
+        self.metrics = metrics
+        self.max_cells = max_cells
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.staging = staging
+        self.rng = random.Random()  # eigener Generator für den Jitter, Retries dürfen das geseedete `random` nicht verschieben
+        self.worksheets = {sheet.title: sheet for sheet in self._call(spreadsheet.worksheets)}
+
+    # Sheets-Aufruf mit Retry und Jitter, wenn die API 429/5xx meldet (gspread APIError trägt die Response)
+    # retry_status: bei welchen Status wiederholt wird, für nicht idempotente Aufrufe nur APPEND_RETRY_STATUS
+    def _call(self, method, *args, retry_status=RETRY_STATUS, **kwargs):
+        endpoint = f"SHEETS {method.__name__}"
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+                if self.metrics:
+                    self.metrics.observe_request(endpoint, 200, time.perf_counter() - started)
+                return result
+            except Exception as error:
+                status = getattr(getattr(error, "response", None), "status_code", None)
+                if self.metrics:
+                    self.metrics.observe_request(endpoint, status or type(error).__name__, time.perf_counter() - started)
+                if status not in retry_status or attempt == self.max_retries:
+                    raise
+                if self.metrics:
+                    self.metrics.retry(endpoint, status)
+                time.sleep(self.rng.uniform(0, self.backoff * 2 ** attempt))
+
+    def _worksheet(self, title):
+        if title not in self.worksheets:
+            self.worksheets[title] = self._call(self.spreadsheet.add_worksheet, title=title, rows=1000, cols=26)
+        return self.worksheets[title]
+
+    # Zeilen-Chunks beliebiger Größe in Requests mit höchstens max_cells Zellen umpacken
+    def _batches(self, row_chunks):
+        batch = []
+        cells = 0
+        for chunk in row_chunks:
+            for row in chunk:
+                if batch and cells + len(row) > self.max_cells:
+                    yield batch
+                    batch = []
+                    cells = 0
+                batch.append(row)
+                cells += len(row)
+        if batch:
+            yield batch
+
+    # 🔹 Einen Tab komplett schreiben, gibt die Anzahl der Datenzeilen zurück
+    def write_tab(self, title, header, row_chunks):
+        sheet = self._worksheet(title + STAGING_SUFFIX if self.staging else title)
+        # Erst leeren, wenn der erste Batch fertig ist (bis dahin bleibt der alte Inhalt sichtbar)
+        batches = self._batches(row_chunks)
+        first_batch = next(batches, None)
+        self._call(sheet.clear)
+        self._call(sheet.append_row, header, retry_status=APPEND_RETRY_STATUS)
+        rows_written = 0
+        columns = len(header)
+        for batch in chain([first_batch] if first_batch else [], batches):
+            self._call(sheet.append_rows, batch, retry_status=APPEND_RETRY_STATUS)
+            rows_written += len(batch)
+            columns = max(columns, max(len(row) for row in batch))
+        if self.staging:
+            self._swap(sheet, self._worksheet(title), rows_written + 1, columns)
+        return rows_written
+
+    # Staging-Inhalt in einem atomaren batch_update in den Live-Tab übernehmen, danach Staging-Tab löschen
+    def _swap(self, staging, live, row_count, column_count):
+        self._call(self.spreadsheet.batch_update, {"requests": [
+            {"updateSheetProperties": {
+                "properties": {"sheetId": live.id, "gridProperties": {"rowCount": max(row_count, 1), "columnCount": max(column_count, 1)}},
+                "fields": "gridProperties(rowCount,columnCount)"
+            }},
+            {"updateCells": {"range": {"sheetId": live.id}, "fields": "userEnteredValue"}},
+            # Quelle auf den geschriebenen Bereich begrenzen: der Staging-Tab hat mindestens 1000x26 Zellen, der Live-Tab
+            # ist gerade auf row_count x column_count verkleinert worden, ein größerer Paste würde abgelehnt
+            {"copyPaste": {
+                "source": {"sheetId": staging.id, "startRowIndex": 0, "endRowIndex": max(row_count, 1),
+                           "startColumnIndex": 0, "endColumnIndex": max(column_count, 1)},
+                "destination": {"sheetId": live.id, "startRowIndex": 0, "startColumnIndex": 0},
+                "pasteType": "PASTE_VALUES"
+            }}
+        ]})
+        self._call(self.spreadsheet.del_worksheet, staging)
+        del self.worksheets[staging.title]
+
+    # 🔹 Mehrere Tabs gleichzeitig schreiben: tabs = [(title, header, row_chunks), ...]
+    # Innerhalb eines Tabs bleiben die Chunks in Reihenfolge, die Tabs laufen parallel.
+    def write_tabs(self, tabs):
+        with ThreadPoolExecutor(max_workers=len(tabs) or 1) as executor:
+            futures = {title: executor.submit(self.write_tab, title, header, row_chunks) for title, header, row_chunks in tabs}
+            return {title: future.result() for title, future in futures.items()}
+
+    # Einzelnen Tab über _call ansprechen (Retry, Jitter, Metrics), z. B. für den TabMirror im Watch-Modus
+    def retrying(self, title):
+        return RetryingWorksheet(self, self.worksheets[title])
+
+
+# 🔹 Worksheet-Proxy mit den Aufrufen, die der TabMirror braucht, jeweils mit dem Retry des SheetsWriters
+# batch_update schreibt feste Bereiche und darf nach jedem Fehler wiederholt werden; append_rows und delete_rows
+# verschieben Zeilen und werden wie beim Export nur nach 429 wiederholt.
+class RetryingWorksheet:
+    def __init__(self, writer, sheet):
+        self.writer = writer
+        self.sheet = sheet
+        self.title = sheet.title
+
+    def get_all_values(self, **kwargs):
+        return self.writer._call(self.sheet.get_all_values, **kwargs)
+
+    def batch_update(self, data, **kwargs):
+        return self.writer._call(self.sheet.batch_update, data, **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        return self.writer._call(self.sheet.append_rows, values, retry_status=APPEND_RETRY_STATUS, **kwargs)
+
+    def delete_rows(self, start_index, end_index=None):
+        return self.writer._call(self.sheet.delete_rows, start_index, end_index, retry_status=APPEND_RETRY_STATUS)
+
+
+# Funktion: Fehlertypen der Sheets API für except-Klauseln (gspread wird erst hier importiert)
+def sheets_errors():
+    from gspread.exceptions import GSpreadException
+    return (GSpreadException,)
@@ -0,0 +1,112 @@
+import numpy as np
+
+from hubspot_sales_pipeline_analysis.export_pipeline import STAGE_PATHS, STAGE_WEIGHTS, STAGE_PROBABILITIES, SALES_REPS
+
+# 🔹 Stages als kleine Integer-Codes, Pfade als Matrix (-1 = kein Stage mehr)
+STAGES = list(STAGE_PROBABILITIES)
+STAGE_CODES = {stage: code for code, stage in enumerate(STAGES)}
+STAGE_NAMES = np.array(STAGES, dtype=object)
+STAGE_PROBABILITY_ARRAY = np.array([STAGE_PROBABILITIES[stage] for stage in STAGES])
+CLOSED_STAGE_CODES = np.array([STAGE_CODES["closedwon"], STAGE_CODES["closedlost"]])
+
+PATH_LENGTHS = np.array([len(path) for path in STAGE_PATHS])
+MAX_PATH_LENGTH = int(PATH_LENGTHS.max())
+PATH_MATRIX = np.full((len(STAGE_PATHS), MAX_PATH_LENGTH), -1, dtype=np.int8)
+for path_index, path in enumerate(STAGE_PATHS):
+    PATH_MATRIX[path_index, :len(path)] = [STAGE_CODES[stage] for stage in path]
+PATH_PROBABILITIES = np.array(STAGE_WEIGHTS) / sum(STAGE_WEIGHTS)  # random.choices normalisiert die Gewichte genauso
+
+SALES_REPS_ID_START = 1001
+MIN_DAYS, MAX_DAYS = 2, 30  # Tage zwischen zwei Stages, wie random.randint(2, 30)
+
+
+# 🔹 Vektorisierte Stage-History-Simulation für viele Deals auf einmal
+# Gleiche Semantik wie synthesize_history/build_stage_rows, nur mit NumPy-Arrays und eigenem, seedbarem RNG.
+class StageHistoryEngine:
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    # Zufällige Teile für n Deals ziehen: Pfad-Index, Sales Rep ID und Tage zwischen den Stages
+    def sample(self, n):
+        return {
+            "path_index": self.rng.choice(len(STAGE_PATHS), size=n, p=PATH_PROBABILITIES),
+            "sales_reps_id": self.rng.integers(0, len(SALES_REPS), size=n) + SALES_REPS_ID_START,
+            "day_offsets": self.rng.integers(MIN_DAYS, MAX_DAYS + 1, size=(n, MAX_PATH_LENGTH - 1))
+        }
+
+    @staticmethod
+    def final_stages(samples):
+        path_index = samples["path_index"]
+        return STAGE_NAMES[PATH_MATRIX[path_index, PATH_LENGTHS[path_index] - 1]]
+
+    # History eines Deals im selben Format wie synthesize_history (für den DealStore)
+    @staticmethod
+    def history(samples, i, computed_deal_type):
+        path_index = int(samples["path_index"][i])
+        length = int(PATH_LENGTHS[path_index])
+        return {
+            "stages": STAGE_PATHS[path_index],
+            "sales_reps_id": int(samples["sales_reps_id"][i]),
+            "day_offsets": samples["day_offsets"][i, :length - 1].tolist(),
+            "deal_type": computed_deal_type
+        }
+
+    # 🔹 Komplette Stage-Tabelle als Spalten: eine Zeile pro (Deal, Stage)
+    # create_days: Create Date als Tage seit 1970-01-01, amounts: float (NaN = kein Amount)
+    @staticmethod
+    def stage_table(create_days, amounts, samples):
+        path_index = samples["path_index"]
+        lengths = PATH_LENGTHS[path_index]
+        deal_index = np.repeat(np.arange(len(path_index)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        position = np.arange(int(lengths.sum())) - np.repeat(starts, lengths)
+
+        offsets = samples["day_offsets"]
+        cumulative = np.concatenate([np.zeros((len(path_index), 1), dtype=offsets.dtype), np.cumsum(offsets, axis=1)], axis=1)
+        stage_code = PATH_MATRIX[path_index[deal_index], position]
+        is_last = position == lengths[deal_index] - 1
+        probability = STAGE_PROBABILITY_ARRAY[stage_code]
+        return {
+            "deal_index": deal_index,
+            "position": position,
+            "stage_code": stage_code,
+            "sales_reps_id": samples["sales_reps_id"][deal_index],
+            "entered_day": np.asarray(create_days)[deal_index] + cumulative[deal_index, position],
+            "days_in_stage": np.where(is_last, -1, offsets[deal_index, np.minimum(position, MAX_PATH_LENGTH - 2)]),
+            "probability": probability,
+            "weighted_amount": np.asarray(amounts, dtype=float)[deal_index] * probability,  # ungerundet, siehe stage_rows
+            "is_closed": np.isin(stage_code, CLOSED_STAGE_CODES)
+        }
+
+    # 🔹 Stage-Zeilen im Format von build_stage_rows (15 Spalten) für eine Liste von Deals
+    def stage_rows(self, deals, company_ids, deal_ids, computed_deal_types, samples):
+        create_dates = np.array([deal["createdate"][:10] for deal in deals], dtype="datetime64[D]")
+        amount_strings = [deal.get("amount", "") for deal in deals]
+        amounts = [float(amount) if amount else np.nan for amount in amount_strings]
+        table = self.stage_table(create_dates.astype(np.int64), amounts, samples)
+
+        deal_index = table["deal_index"]
+        entered = np.datetime_as_string(table["entered_day"].astype("datetime64[D]"))
+        create_strings = np.datetime_as_string(create_dates)[deal_index]
+        # Python-round pro Zeile statt np.round: np.round skaliert mit 100 und rundet dann, das weicht bei ~2,5 %
+        # der Beträge um einen Cent von round(float(amount) * probability, 2) in build_stage_rows ab
+        forecast = [round(value, 2) for value in table["weighted_amount"].tolist()]
+        days_in_stage = table["days_in_stage"].tolist()
+        is_first = (table["position"] == 0).tolist()
+        is_closed = table["is_closed"].tolist()
+        stages = STAGE_NAMES[table["stage_code"]].tolist()
+        probability = table["probability"].tolist()
+        sales_reps_ids = table["sales_reps_id"].tolist()
+        entered = entered.tolist()
+        create_strings = create_strings.tolist()
+
+        rows = []
+        for r, i in enumerate(deal_index.tolist()):
+            deal = deals[i]
+            rows.append([
+                deal_ids[i], company_ids[i], sales_reps_ids[r], deal.get("dealname", ""), amount_strings[i],
+                forecast[r] if amount_strings[i] else "", probability[r], stages[r],
+                computed_deal_types[i], entered[r] if is_closed[r] else "", create_strings[r] if is_first[r] else "", entered[r],
+                days_in_stage[r] if days_in_stage[r] >= 0 else "", "Sales Pipeline", deal.get("deal_type", "")
+            ])
+        return rows
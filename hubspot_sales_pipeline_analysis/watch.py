@@ -0,0 +1,375 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver, DEFAULT_CACHE_DAYS
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.metrics import phase
+from hubspot_sales_pipeline_analysis.sheets_sync import TabMirror, cell_text, DEAL_KEY, COMPANY_KEY, OWNER_KEY
+from hubspot_sales_pipeline_analysis.export_pipeline import (
+    DEALS_URL, PARAMS, DEAL_HEADER, COMPANY_HEADER, OWNER_HEADER, ExportState, attach_company_associations, fetch_pages,
+    resolve_companies, synthesize, stored_stage_rows, number_deals
+)
+
+BATCH_READ_URL = DEALS_URL + "/batch/read"
+WEBHOOK_PATH = "/webhooks/hubspot"
+DEFAULT_LISTEN = "127.0.0.1:8780"
+DEFAULT_DEBOUNCE = 5.0        # Sekunden ohne neue Events, bevor ein Batch verarbeitet wird
+DEFAULT_MAX_WAIT = 30.0       # spätestens so viele Sekunden nach dem ersten Event, auch wenn weiter Events kommen
+DEFAULT_POLL_INTERVAL = 300.0  # Polling über hs_lastmodifieddate als Fallback für verlorene Webhooks (0 = aus)
+SIGNATURE_MAX_AGE = 300  # HubSpot-Signaturen v3 älter als 5 Minuten werden abgelehnt
+PENDING_KEY = "watch_pending_companies"  # Companies, deren Zeilen im Sheet noch nicht zum Store passen
+
+
+# 🔹 Gesammelte Deal-Änderungen zwischen Webhook-Threads und Watch-Schleife
+# Mehrere Events zum selben Deal fallen zu einem Eintrag zusammen; ein Batch wird erst fertig, wenn `debounce`
+# Sekunden lang nichts mehr kam, spätestens aber `max_wait` Sekunden nach der ersten Änderung.
+class ChangeQueue:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.changed = set()
+        self.deleted = set()
+        self.first_change = None
+        self.last_change = None
+
+    def put(self, deal_ids, deleted=False):
+        deal_ids = {str(deal_id) for deal_id in deal_ids}
+        if not deal_ids:
+            return
+        with self.condition:
+            now = time.monotonic()
+            if deleted:
+                self.deleted |= deal_ids
+                self.changed -= deal_ids
+            else:
+                self.changed |= deal_ids
+                self.deleted -= deal_ids
+            self.first_change = self.first_change or now
+            self.last_change = now
+            self.condition.notify_all()
+
+    # Nächsten Batch abholen: (geänderte IDs, gelöschte IDs); ohne Änderungen nach `timeout` Sekunden zwei leere Sets
+    def take(self, debounce=DEFAULT_DEBOUNCE, max_wait=DEFAULT_MAX_WAIT, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                if self.first_change is not None:
+                    due = min(self.last_change + debounce, self.first_change + max_wait)
+                    if now >= due:
+                        batch = self.changed, self.deleted
+                        self.changed, self.deleted = set(), set()
+                        self.first_change = self.last_change = None
+                        return batch
+                    self.condition.wait(due - now)
+                elif deadline is not None and now >= deadline:
+                    return set(), set()
+                else:
+                    self.condition.wait(None if deadline is None else deadline - now)
+
+
+# Funktion: Signatur v3 wie HubSpot: base64(HMAC-SHA256(Client Secret, Methode + URI + Body + Timestamp))
+def webhook_signature(client_secret, method, uri, body, timestamp):
+    message = method.encode() + uri.encode() + body + str(timestamp).encode()
+    return base64.b64encode(hmac.new(client_secret.encode(), message, hashlib.sha256).digest()).decode()
+
+# Funktion: Deal-Events aus einem Webhook-Body lesen, gibt (geänderte IDs, gelöschte IDs) zurück
+# deal.deletion -> gelöscht, deal.merge -> Gewinner geändert und die zusammengeführten IDs gelöscht, alle übrigen deal.* -> geändert
+def parse_events(events):
+    changed, deleted = set(), set()
+    for event in events if isinstance(events, list) else [events]:
+        subscription_type = str(event.get("subscriptionType", ""))
+        if not subscription_type.startswith("deal.") or event.get("objectId") is None:
+            continue
+        if subscription_type == "deal.deletion":
+            deleted.add(str(event["objectId"]))
+            continue
+        changed.add(str(event["objectId"]))
+        if subscription_type == "deal.merge":
+            deleted.update(str(deal_id) for deal_id in event.get("mergedObjectIds", []))
+    return changed - deleted, deleted
+
+
+# 🔹 HTTP-Handler für HubSpot-Webhooks: Events nur in die ChangeQueue legen und sofort mit 204 antworten
+# Mit client_secret werden Signatur v3 und Timestamp geprüft, sonst 401. public_url ist die URL, die HubSpot aufruft
+# (hinter einem Proxy), ohne sie wird die URI aus dem Host-Header gebildet (http und https).
+def make_handler(changes, client_secret=None, public_url=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def verified(self, body):
+            timestamp = self.headers.get("X-HubSpot-Request-Timestamp", "")
+            signature = self.headers.get("X-HubSpot-Signature-v3", "")
+            if not timestamp.isdigit() or abs(time.time() * 1000 - int(timestamp)) > SIGNATURE_MAX_AGE * 1000:
+                return False
+            uris = [public_url] if public_url else [f"{scheme}://{self.headers.get('Host', '')}{self.path}" for scheme in ("https", "http")]
+            return any(
+                hmac.compare_digest(webhook_signature(client_secret, "POST", uri, body, timestamp), signature) for uri in uris
+            )
+
+        def reply(self, status):
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.split("?")[0] != WEBHOOK_PATH:
+                return self.reply(404)
+            if client_secret and not self.verified(body):
+                return self.reply(401)
+            try:
+                changed, deleted = parse_events(json.loads(body or b"[]"))
+            except (ValueError, AttributeError):
+                return self.reply(400)
+            changes.put(changed)
+            changes.put(deleted, deleted=True)
+            self.reply(204)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+# Funktion: Webhook-Empfänger in einem Hintergrund-Thread starten, gibt den Server zurück (shutdown() zum Beenden)
+def serve_webhooks(changes, host="127.0.0.1", port=8780, client_secret=None, public_url=None):
+    server = ThreadingHTTPServer((host, port), make_handler(changes, client_secret, public_url))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# 🔹 Watch-Modus: Änderungen übernehmen und nur die betroffenen Companies im Sheet nachziehen
+# Die drei Tabs werden einmal gelesen (TabMirror), danach schreibt jeder Batch nur geänderte Zellen, neue und entfernte
+# Zeilen. Deal Numbers zählen pro Company, deshalb werden alle Deals der betroffenen Companies aus dem Store neu
+# aufgebaut und nummeriert, alle anderen Zeilen bleiben unberührt. Der Store muss aus einem vorherigen Export stammen.
+# Sheets-Aufrufe laufen über den Retry des SheetsWriters. Scheitert das Schreiben trotzdem, bleiben die betroffenen
+# Companies im Store als ausstehend vermerkt und werden mit dem nächsten Batch (auch nach einem Neustart) nachgezogen.
+class DealWatcher:
+    def __init__(self, hubspot, store, spreadsheet, resolver, state, engine=None, metrics=None):
+        from hubspot_sales_pipeline_analysis.sheets_writer import SheetsWriter
+
+        self.hubspot = hubspot
+        self.store = store
+        self.resolver = resolver
+        self.state = state
+        self.engine = engine
+        self.metrics = metrics
+        self.writer = SheetsWriter(spreadsheet, metrics=metrics)
+        self.pending = set(json.loads(store.get_state(PENDING_KEY) or "[]"))
+        self.load_mirrors()
+
+    # Die drei Tabs (neu) einlesen; nach einem gescheiterten Schreiben ist der lokale Spiegel nicht mehr verlässlich
+    def load_mirrors(self):
+        from hubspot_sales_pipeline_analysis.exporter import DEAL_TAB, COMPANY_TAB, OWNER_TAB
+
+        with phase(self.metrics, "watch_load"):
+            self.deal_tab = TabMirror(self.writer.retrying(DEAL_TAB), DEAL_HEADER, DEAL_KEY, "Company ID")
+            self.company_tab = TabMirror(self.writer.retrying(COMPANY_TAB), COMPANY_HEADER, COMPANY_KEY, "Company ID")
+            self.owner_tab = TabMirror(self.writer.retrying(OWNER_TAB), OWNER_HEADER, OWNER_KEY, "Sales Rep ID")
+        self.stale = False
+
+    # Aktuelle Properties und Company-Assoziationen per batch/read (100 pro Request); fehlende Deals sind gelöscht
+    def fetch_deals(self, deal_ids):
+        deal_ids = sorted(deal_ids, key=int)
+        deals = []
+        for start in range(0, len(deal_ids), PARAMS["limit"]):
+            response = self.hubspot.post(BATCH_READ_URL, json={
+                "properties": PARAMS["properties"].split(","),
+                "inputs": [{"id": deal_id} for deal_id in deal_ids[start:start + PARAMS["limit"]]]
+            })
+            if response.status_code not in (200, 207):  # 207 = einzelne IDs nicht gefunden
+                raise HubSpotError(response)
+            results = sorted(response.json().get("results", []), key=lambda deal: int(deal["id"]))
+            attach_company_associations(self.hubspot, results)
+            deals.extend(results)
+        return deals
+
+    # 🔹 Einen Batch übernehmen: Store aktualisieren, betroffene Companies neu nummerieren, Unterschiede schreiben
+    # Ohne neue Deals werden nur noch ausstehende Companies eines vorher gescheiterten Schreibens nachgezogen.
+    def apply(self, deals, deleted=()):
+        started = time.perf_counter()
+        # Doppelte Webhooks und die Überlappung beim Polling: nichts Neueres als im Store -> überspringen
+        changed = []
+        affected = set()
+        for deal in deals:
+            record = self.store.get_deal(deal["id"])
+            modified = deal["properties"].get("hs_lastmodifieddate") or ""
+            if record is not None and modified and modified <= (record["properties"].get("hs_lastmodifieddate") or ""):
+                continue
+            changed.append(deal)
+            if record is not None:
+                affected.add(record["company_id"])
+        for deal_id in deleted:
+            record = self.store.get_deal(deal_id)
+            if record is not None:
+                affected.add(record["company_id"])
+                self.store.delete_deal(deal_id)
+                self.state.recount_company(self.store, record["company_id"])  # Deal Type späterer Deals wie bei einem frischen Export
+        if not changed and not affected and not self.pending:
+            return None
+
+        with phase(self.metrics, "watch_store"):
+            for _ in synthesize(resolve_companies([changed], self.resolver), self.state, self.store, self.engine):
+                pass
+            for deal in changed:
+                record = self.store.get_deal(deal["id"])
+                if record is not None:  # Deals ohne gültiges Create Date landen nicht im Store
+                    affected.add(record["company_id"])
+            # Im selben Commit wie Deals und High-Water-Mark: HubSpot meldet diese Änderungen nicht noch einmal,
+            # also muss der Store selbst wissen, welche Companies im Sheet noch fehlen
+            self.pending |= affected
+            self.store.set_state(PENDING_KEY, json.dumps(sorted(self.pending)))
+            self.state.save(self.store)
+            self.store.commit()
+
+        companies = set(self.pending)
+        with phase(self.metrics, "watch_write"):
+            try:
+                if self.stale:
+                    self.load_mirrors()
+                stats = self.write(companies)
+            except Exception:
+                self.stale = True  # Teilweise geschrieben: vor dem nächsten Versuch den Tab-Inhalt neu lesen
+                raise
+        self.pending -= companies
+        self.store.set_state(PENDING_KEY, json.dumps(sorted(self.pending)))
+        self.store.commit()
+        cells = sum(tab_stats["cells_written"] for tab_stats in stats)
+        if self.metrics:
+            self.metrics.add_rows("watch", len(changed) + len(deleted))
+        print(
+            f"👀 {len(changed)} Deals geändert, {len(deleted)} gelöscht -> {len(companies)} Companies neu nummeriert, "
+            f"{cells} Zellen geschrieben in {time.perf_counter() - started:.2f}s"
+        )
+        return stats
+
+    # Alle Zeilen der Companies aus dem Store neu aufbauen und nur die Unterschiede in die drei Tabs schreiben
+    def write(self, companies):
+        deal_rows = [row for chunk in number_deals(stored_stage_rows(self.store, self.state, companies)) for row in chunk]
+        stats = [
+            self.deal_tab.replace_groups(companies, deal_rows),
+            self.company_tab.replace_groups(companies, [
+                list(self.state.companies[company_id].values()) for company_id in companies if company_id in self.state.companies
+            ])
+        ]
+        # Sales Reps nur ergänzen, bestehende Zeilen (Department, Team, Region) bleiben wie sie sind
+        known_reps = self.owner_tab.groups()
+        new_reps = [row for row in self.state.owner_rows() if cell_text(row[0]) not in known_reps]
+        if new_reps:
+            stats.append(self.owner_tab.replace_groups([row[0] for row in new_reps], new_reps))
+        return stats
+
+    # 🔹 Polling-Fallback: alle seit der High-Water-Mark geänderten Deals über die Search-API (fängt verlorene Webhooks ab)
+    def poll(self):
+        deals = [deal for page in fetch_pages(self.hubspot, self.state.latest_modified) for deal in page]
+        return self.apply(deals)
+
+    # 🔹 Hauptschleife: zuerst einmal pollen (Änderungen seit dem letzten Lauf), dann Webhook-Batches abarbeiten
+    # und alle poll_interval Sekunden pollen, bis stop gesetzt ist. Scheitert ein Batch an HubSpot, kommen seine
+    # IDs zurück in die Queue und werden nach dem nächsten Debounce erneut versucht. Scheitert das Schreiben ins
+    # Sheet, stehen die Änderungen schon im Store; die ausstehenden Companies werden dann etwa jede Sekunde nachgezogen.
+    def run(self, changes, debounce=DEFAULT_DEBOUNCE, max_wait=DEFAULT_MAX_WAIT, poll_interval=DEFAULT_POLL_INTERVAL, stop=None):
+        from hubspot_sales_pipeline_analysis.sheets_writer import sheets_errors
+
+        errors = (HubSpotError, requests.RequestException) + sheets_errors()
+        stop = stop or threading.Event()
+        # Der Abgleich beim Start läuft schon in der Schleife: scheitert er, wird er wie ein Poll wiederholt.
+        # Ohne poll_interval bleibt es bei diesem einen Abgleich (next_poll = None).
+        next_poll = time.monotonic()
+        while not stop.is_set():
+            timeout = 1.0 if next_poll is None else max(0.0, min(1.0, next_poll - time.monotonic()))
+            changed, deleted = changes.take(debounce, max_wait, timeout)
+            try:
+                if changed or deleted:
+                    deals = self.fetch_deals(changed)
+                    self.apply(deals, deleted | (changed - {deal["id"] for deal in deals}))
+                elif self.pending:
+                    self.apply([])
+                if next_poll is not None and time.monotonic() >= next_poll:
+                    next_poll = time.monotonic() + (poll_interval or DEFAULT_POLL_INTERVAL)
+                    self.poll()
+                    if not poll_interval:
+                        next_poll = None
+            except errors as error:
+                print(f"⚠️ Batch fehlgeschlagen, wird wiederholt: {error}")
+                changes.put(changed)
+                changes.put(deleted, deleted=True)
+
+
+# 🔹 Watch-Modus starten: Webhook-Empfänger auf listen ("host:port") plus Watch-Schleife, läuft bis Ctrl+C oder stop
+# Signaturen werden mit HUBSPOT_CLIENT_SECRET (Secret der HubSpot-App) geprüft, wenn es gesetzt ist.
+def watch_deals(store_path, spreadsheet=None, hubspot=None, company_cache=None, listen=DEFAULT_LISTEN, client_secret=None,
+                public_url=None, debounce=DEFAULT_DEBOUNCE, max_wait=DEFAULT_MAX_WAIT, poll_interval=DEFAULT_POLL_INTERVAL,
+                engine="python", seed=None, metrics=None, stop=None, company_cache_days=DEFAULT_CACHE_DAYS):
+    from hubspot_sales_pipeline_analysis.exporter import open_spreadsheet
+
+    stage_engine = None
+    if engine == "numpy":
+        from hubspot_sales_pipeline_analysis.stage_engine import StageHistoryEngine
+        stage_engine = StageHistoryEngine(seed)
+    hubspot = hubspot or HubSpotClient.from_env(metrics=metrics)
+    client_secret = client_secret or os.getenv("HUBSPOT_CLIENT_SECRET")
+    if spreadsheet is None:
+        spreadsheet = open_spreadsheet()
+    store = DealStore(store_path)
+    company_resolver = CompanyResolver(hubspot, company_cache, company_cache_days)
+    watcher = DealWatcher(hubspot, store, spreadsheet, company_resolver, ExportState.from_store(store, rng=random.Random(seed)), stage_engine, metrics)
+
+    host, port = listen.rsplit(":", 1)
+    changes = ChangeQueue()
+    server = serve_webhooks(changes, host, int(port), client_secret, public_url)
+    print(f"👂 Warte auf Webhooks unter http://{listen}{WEBHOOK_PATH}" + ("" if client_secret else " (ohne Signaturprüfung)"))
+    try:
+        watcher.run(changes, debounce, max_wait, poll_interval, stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
+        company_resolver.save()
+        store.close()
+
+
+# 🔹 Lokaler Webhook-Sender zum Testen: schickt Deal-Events im HubSpot-Format (optional signiert) an den Watch-Modus
+def send_webhook(url, deal_ids, subscription_type="deal.propertyChange", client_secret=None, property_name=None):
+    now = int(time.time() * 1000)
+    events = [
+        {"eventId": now + i, "subscriptionType": subscription_type, "objectId": int(deal_id), "occurredAt": now,
+         "propertyName": property_name, "attemptNumber": 0}
+        for i, deal_id in enumerate(deal_ids)
+    ]
+    body = json.dumps(events).encode()
+    headers = {"Content-Type": "application/json"}
+    if client_secret:
+        headers["X-HubSpot-Request-Timestamp"] = str(now)
+        headers["X-HubSpot-Signature-v3"] = webhook_signature(client_secret, "POST", url, body, now)
+    response = requests.post(url, data=body, headers=headers, timeout=10)
+    response.raise_for_status()
+    return response.status_code
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Send HubSpot-style deal webhooks to a local watch daemon (hubspot-export --watch)")
+    parser.add_argument("deal_ids", nargs="+", help="HubSpot deal IDs")
+    parser.add_argument("--url", default=f"http://{DEFAULT_LISTEN}{WEBHOOK_PATH}", help="webhook URL of the watch daemon")
+    parser.add_argument("--type", default="deal.propertyChange",
+                        help="subscription type, e.g. deal.creation, deal.propertyChange or deal.deletion (default: deal.propertyChange)")
+    parser.add_argument("--property", help="propertyName of the events")
+    args = parser.parse_args(argv)
+    status = send_webhook(args.url, args.deal_ids, args.type, os.getenv("HUBSPOT_CLIENT_SECRET"), args.property)
+    print(f"📨 {len(args.deal_ids)} Events gesendet ({status})")
+
+
+if __name__ == "__main__":
+    main()
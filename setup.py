@@ -6,6 +6,7 @@ setup(
     packages=find_packages(),
     install_requires=[
         'requests',
+        'numpy',
         'python-dotenv',
         'setuptools',
         'openai',
@@ -14,6 +15,16 @@ setup(
         'google-auth',
         'oauth2client'
     ],
+    extras_require={
+        'files': ['pyarrow'],
+    },
+    entry_points={
+        'console_scripts': [
+            'hubspot-export=hubspot_sales_pipeline_analysis.exporter:main',
+            'hubspot-generate-deals=hubspot_sales_pipeline_analysis.hubspot_deals_generator:main',
+            'hubspot-send-webhook=hubspot_sales_pipeline_analysis.watch:main',
+        ],
+    },
     author='David Meszaros',
     description='Automatisierung und Analyse für HubSpot und mehr',
     long_description=open('README.md').read(),
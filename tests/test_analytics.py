@@ -0,0 +1,84 @@
+import unittest
+
+import numpy as np
+
+from hubspot_sales_pipeline_analysis.analytics import PipelineAnalytics, STAGES, histogram_percentile
+
+
+# Zeile im Format von DEAL_HEADER: nur die Spalten, die PipelineAnalytics liest, sind belegt
+def row(deal_id, stage, amount, forecast, days, company_id=111111, sales_rep_id=1001, deal_type="newbusiness"):
+    return [deal_id, company_id, sales_rep_id, "Deal", amount, forecast, 0.0, stage, deal_type, "", "", "2024-01-01", days, "Sales Pipeline", 1]
+
+
+class PipelineAnalyticsTest(unittest.TestCase):
+    def test_missing_amounts_count_as_zero(self):
+        analytics = PipelineAnalytics()
+        analytics.update([
+            row(1, "sql", "1000", 50.0, 3), row(1, "appointmentscheduled", "1000", 100.0, ""),
+            row(2, "sql", None, "", ""),  # HubSpot "amount": null
+            row(3, "sql", "", "", 4), row(3, "closedwon", "", "", ""),
+            row(4, "sql", None, "", 2), row(4, "closedlost", None, "", "")
+        ])
+        stages = {stage_row[0]: stage_row for stage_row in analytics.stage_rows()}
+        self.assertEqual(stages["sql"][1], 4)
+        self.assertEqual(stages["sql"][6], 1)  # Deal 2 ist offen in sql
+        self.assertEqual(stages["appointmentscheduled"][7], 1000.0)
+        self.assertEqual(stages["Total"][6:], [2, 1000.0, 100.0])
+        win_rates = {(r[0], r[1]): r for r in analytics.win_rate_rows({111111: {"Company Name": "ACME", "Industry": "SaaS", "ICP Tier": "ICP 1"}})}
+        self.assertEqual(win_rates[("Company", "ACME")][2:], [1, 1, 0.5, 0.0])
+        self.assertEqual(len(analytics.stage_rows()), len(STAGES) + 1)
+
+    # 5 Deals von Hand nachgerechnet:
+    # 1: sql 2 Tage -> appointmentscheduled 1 Tag -> qualifiedtobuy (offen, 1000 / Forecast 250)
+    # 2: sql 4 Tage -> appointmentscheduled 3 Tage -> closedwon
+    # 3: sql 6 Tage -> appointmentscheduled 10 Tage -> closedlost
+    # 4: sql 8 Tage -> closedlost
+    # 5: sql (offen, 500 / Forecast 25)
+    def test_stage_table_matches_hand_computed_values(self):
+        analytics = PipelineAnalytics()
+        analytics.update([
+            row(1, "sql", "1000", 50.0, 2), row(1, "appointmentscheduled", "1000", 100.0, 1), row(1, "qualifiedtobuy", "1000", 250.0, ""),
+            row(2, "sql", "2000", 100.0, 4), row(2, "appointmentscheduled", "2000", 200.0, 3), row(2, "closedwon", "2000", 2000.0, "")
+        ])
+        # Zweiter Chunk: die Reihenfolge der Zeilen und Chunks spielt keine Rolle
+        analytics.update([
+            row(3, "closedlost", "300", 0.0, ""), row(3, "appointmentscheduled", "300", 30.0, 10), row(3, "sql", "300", 15.0, 6),
+            row(4, "sql", "400", 20.0, 8), row(4, "closedlost", "400", 0.0, ""),
+            row(5, "sql", "500", 25.0, "")
+        ])
+        # Deal Stage, Entered, Conversion to Next, Conversion from SQL, Median, P90, Open Deals, Open Amount, Forecast
+        self.assertEqual(analytics.stage_rows(), [
+            ["sql", 5, 0.6, 1.0, 4, 8, 1, 500.0, 25.0],  # Tage 2, 4, 6, 8: Median 4 (Nearest Rank, nicht 5)
+            ["appointmentscheduled", 3, 0.3333, 0.6, 3, 10, 0, 0.0, 0.0],  # Tage 1, 3, 10
+            ["qualifiedtobuy", 1, 0.0, 0.2, "", "", 1, 1000.0, 250.0],
+            ["presentationscheduled", 0, "", 0.0, "", "", 0, 0.0, 0.0],
+            ["decisionmakerboughtin", 0, "", 0.0, "", "", 0, 0.0, 0.0],
+            ["contractsent", 0, "", 0.0, "", "", 0, 0.0, 0.0],
+            ["closedwon", 1, "", 0.2, "", "", 0, 0.0, 0.0],
+            ["closedlost", 2, "", 0.4, "", "", 0, 0.0, 0.0],
+            ["Total", 5, "", "", "", "", 2, 1500.0, 275.0]
+        ])
+        win_rates = {(r[0], r[1]): r[2:] for r in analytics.win_rate_rows({})}
+        self.assertEqual(win_rates[("Deal Type", "newbusiness")], [1, 2, 0.3333, 2000.0])
+
+
+class HistogramPercentileTest(unittest.TestCase):
+    # Histogramm (Index = Tage) aus einzelnen Werten
+    def percentile(self, values, q):
+        return histogram_percentile(np.bincount(values), q)
+
+    def test_nearest_rank_without_interpolation(self):
+        # Gerade Anzahl: kein Mittelwert der beiden mittleren Werte, sondern der kleinere
+        self.assertEqual(self.percentile([2, 4, 6, 8], 0.5), 4)
+        self.assertEqual(self.percentile([2, 4, 6, 8], 0.9), 8)
+        self.assertEqual(self.percentile(list(range(1, 11)), 0.5), 5)
+        self.assertEqual(self.percentile(list(range(1, 11)), 0.9), 9)
+        self.assertEqual(self.percentile([0, 0, 0, 7], 0.5), 0)
+        self.assertEqual(self.percentile([0, 0, 0, 7], 0.9), 7)
+
+    def test_empty_histogram(self):
+        self.assertEqual(histogram_percentile(np.zeros(3, dtype=np.int64), 0.5), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
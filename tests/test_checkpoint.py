@@ -0,0 +1,70 @@
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState
+from hubspot_sales_pipeline_analysis.checkpoint import Checkpoint, checkpointed_stage_rows
+from hubspot_sales_pipeline_analysis.stage_engine import StageHistoryEngine
+
+SEED = 7
+EVERY = 2  # Checkpoint alle 2 Seiten, bei 600 Deals also nach Seite 2 und 4
+
+
+# Client, dessen Deal-Liste ab Seite `fail_after` + 1 scheitert, der Abruf bricht also mitten drin ab
+class CrashingClient(HubSpotClient):
+    fail_after = 5
+    pages = 0
+
+    def get_json(self, path, **kwargs):
+        self.pages += 1
+        if self.pages > self.fail_after:
+            raise HubSpotError(mock.Mock(status_code=503, text="Service Unavailable"))
+        return super().get_json(path, **kwargs)
+
+
+class CheckpointResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeHubSpot(deals=600)
+        self.base_url = self.fake.start()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.fake.stop()
+        self.tmp.cleanup()
+
+    # Stage-Zeilen und Endzustand eines Laufs, die Checkpoint-Datei bleibt wie nach einem echten Abbruch liegen
+    def run_stage_rows(self, client, checkpoint_path, engine, resume=False):
+        state = ExportState(rng=random.Random(SEED))
+        stage_engine = StageHistoryEngine(SEED) if engine == "numpy" else None
+        checkpoint = Checkpoint(checkpoint_path)
+        try:
+            rows = list(checkpointed_stage_rows(
+                client, CompanyResolver(client), state, checkpoint, engine=stage_engine, resume=resume, every=EVERY
+            ))
+        finally:
+            checkpoint.close()
+        return rows, (state.companies, state.company_mapping, state.sales_reps, state.deal_id_counter, state.company_id_counter)
+
+    def test_resume_after_crash_matches_uninterrupted_run(self):
+        for engine in ("python", "numpy"):
+            with self.subTest(engine=engine):
+                expected = self.run_stage_rows(
+                    HubSpotClient("token", base_url=self.base_url, burst=100000), os.path.join(self.tmp.name, f"{engine}-full.db"), engine
+                )
+                checkpoint_path = os.path.join(self.tmp.name, f"{engine}-crash.db")
+                with self.assertRaises(HubSpotError):
+                    self.run_stage_rows(CrashingClient("token", base_url=self.base_url, burst=100000), checkpoint_path, engine)
+                # Seite 5 war schon synthetisiert, aber noch nicht gesichert, der Resume holt sie noch einmal
+                resumed = self.run_stage_rows(
+                    HubSpotClient("token", base_url=self.base_url, burst=100000), checkpoint_path, engine, resume=True
+                )
+                self.assertEqual(resumed, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver, UNKNOWN_COMPANY
+
+
+class StubResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+# Client, der batch/read aus einem dict beantwortet; fehlende IDs wie HubSpot mit 207
+class StubClient:
+    def __init__(self, names):
+        self.names = names
+        self.requested = []
+
+    def post(self, path, json=None):
+        ids = [entry["id"] for entry in json["inputs"]]
+        self.requested.extend(ids)
+        results = [{"id": i, "properties": {"name": self.names[i]}} for i in ids if i in self.names]
+        return StubResponse(207 if len(results) < len(ids) else 200, {"results": results})
+
+
+class CompanyResolverTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_file = os.path.join(tempfile.mkdtemp(), "companies.json")
+
+    def test_misses_are_not_cached(self):
+        resolver = CompanyResolver(StubClient({"1": "Acme"}), self.cache_file)
+        self.assertEqual(resolver.resolve(["1", "2"]), {"1": "Acme", "2": UNKNOWN_COMPANY})
+        resolver.save()
+
+        client = StubClient({"1": "Acme", "2": "Globex"})
+        resolver = CompanyResolver(client, self.cache_file)
+        self.assertEqual(resolver.resolve(["1", "2"]), {"1": "Acme", "2": "Globex"})
+        self.assertEqual(client.requested, ["2"])
+
+    def test_old_names_are_read_again(self):
+        with open(self.cache_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "1": {"name": "Acme", "fetched": time.time() - 8 * 86400},
+                "2": {"name": "Globex", "fetched": time.time()},
+                "3": "Initech"  # Cache-Datei im alten Format ohne Zeitstempel
+            }, f)
+        client = StubClient({"1": "Acme Corp", "2": "Globex Renamed", "3": "Initech"})
+        resolver = CompanyResolver(client, self.cache_file, cache_days=7)
+        self.assertEqual(resolver.resolve(["1", "2", "3"]), {"1": "Acme Corp", "2": "Globex", "3": "Initech"})
+        self.assertEqual(client.requested, ["1", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
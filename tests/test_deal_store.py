@@ -0,0 +1,106 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from benchmarks.memory_sheets import MemorySpreadsheet
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.exporter import DEAL_TAB, export
+
+
+# Client, dessen Deal-Liste ab der dritten Seite scheitert, der Export bricht also mitten in der Synthese ab
+class FailingPageClient(HubSpotClient):
+    pages = 0
+
+    def get_json(self, path, **kwargs):
+        self.pages += 1
+        if self.pages > 2:
+            raise HubSpotError(mock.Mock(status_code=503, text="Service Unavailable"))
+        return super().get_json(path, **kwargs)
+
+
+class IncrementalStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeHubSpot(deals=300)
+        self.client = HubSpotClient("token", base_url=self.fake.start(), burst=100000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp.name, "store.db")
+        export(spreadsheet=MemorySpreadsheet(), hubspot=self.client, store_path=self.store_path, seed=5)
+
+    def tearDown(self):
+        self.fake.stop()
+        self.tmp.cleanup()
+
+    def export(self, **kwargs):
+        spreadsheet = MemorySpreadsheet()
+        export(spreadsheet=spreadsheet, hubspot=self.client, store_path=self.store_path, **kwargs)
+        return spreadsheet
+
+    # Deal Count und first_closed_won jeder Company passen zu ihren gespeicherten Deals
+    def assert_company_counts(self, store):
+        _, company_mapping = store.load_companies()
+        for company_name, comp_info in company_mapping.items():
+            deal_count, first_closed_won = store.company_stats(comp_info["company_id"])
+            self.assertEqual((comp_info["deal_count"], comp_info["first_closed_won"]), (deal_count, first_closed_won), company_name)
+
+    def test_moved_deal_changes_company(self):
+        deal = next(deal for deal in self.fake.deals if deal["company"])
+        target = next(company_id for company_id in self.fake.companies if company_id != deal["company"])
+        self.fake.update_deal(deal["id"], {}, company_id=target)
+        self.export()
+
+        store = DealStore(self.store_path)
+        try:
+            _, company_mapping = store.load_companies()
+            record = store.get_deal(deal["id"])
+            self.assertEqual(record["company_id"], company_mapping[self.fake.companies[target]]["company_id"])
+            self.assert_company_counts(store)
+        finally:
+            store.close()
+
+    def test_full_export_drops_deleted_deals(self):
+        deleted = [deal["id"] for deal in self.fake.deals[:40:4]]
+        for deal_id in deleted:
+            self.fake.delete_deal(deal_id)
+
+        self.export()  # inkrementell: Löschungen sind über die Search-API nicht sichtbar
+        store = DealStore(self.store_path)
+        self.assertTrue(all(store.get_deal(deal_id) for deal_id in deleted))
+        store.close()
+
+        spreadsheet = self.export(full=True)
+        store = DealStore(self.store_path)
+        try:
+            self.assertEqual([store.get_deal(deal_id) for deal_id in deleted], [None] * len(deleted))
+            self.assertEqual(
+                {row[0] for row in spreadsheet.worksheet(DEAL_TAB).rows[1:]},
+                {record["deal_id"] for record in store.iter_deals()}
+            )
+            self.assert_company_counts(store)
+        finally:
+            store.close()
+
+    def test_failed_export_releases_the_store(self):
+        self.fake.update_deal(self.fake.deals[0]["id"], {"amount": "1234"})
+        failing = FailingPageClient("token", base_url=self.client.base_url, burst=100000)
+        try:
+            export(spreadsheet=MemorySpreadsheet(), hubspot=failing, store_path=self.store_path, full=True)
+        except HubSpotError as error:
+            failure = error  # hält den Traceback und damit die Frames des Exports am Leben, wie ein Retry-Loop mit Logging
+        self.assertIsInstance(failure, HubSpotError)
+        # ohne Aufräumen hielte der abgebrochene Export die Schreibsperre und der Retry scheiterte mit "database is locked"
+        spreadsheet = self.export(full=True)
+        store = DealStore(self.store_path)
+        try:
+            self.assertEqual(
+                {row[0] for row in spreadsheet.worksheet(DEAL_TAB).rows[1:]},
+                {record["deal_id"] for record in store.iter_deals()}
+            )
+        finally:
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
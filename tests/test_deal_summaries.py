@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from benchmarks.fake_llm import FakeChatAPI
+from hubspot_sales_pipeline_analysis.deal_summaries import DealSummarizer, DealFacts
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState
+
+
+def stage_rows(count):
+    rows = []
+    for deal_id in range(1001, 1001 + count):
+        rows.append([deal_id, 111111, 1001, f"Deal {deal_id}", "1000", 50.0, 0.05, "sql", "newbusiness", "", "2024-01-01", "2024-01-01", 3, "Sales Pipeline", 1])
+        rows.append([deal_id, 111111, 1001, f"Deal {deal_id}", "1000", 100.0, 0.1, "appointmentscheduled", "newbusiness", "", "", "2024-01-04", "", "Sales Pipeline", 1])
+    return rows
+
+
+class DealSummarizerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp.name, "summaries.db")
+        self.facts = DealFacts()
+        self.facts.update(stage_rows(25))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def summarize(self, api):
+        summarizer = DealSummarizer(
+            self.cache_path, base_url=api.start(), api_key="test", deals_per_prompt=10, workers=3, requests_per_minute=6000, max_retries=0
+        )
+        try:
+            return summarizer.summarize("deal", self.facts.deal_records())
+        finally:
+            summarizer.close()
+            api.stop()
+
+    def test_batches_via_base_url_and_cache_hits(self):
+        api = FakeChatAPI()
+        summaries = self.summarize(api)
+        self.assertEqual((api.requests, api.records), (3, 25))  # 25 Deals in Prompts zu 10
+        self.assertEqual(summaries[1001], "Deal 1001: appointmentscheduled.")
+        self.assertEqual(len(summaries), 25)
+
+        warm = FakeChatAPI()
+        self.assertEqual(self.summarize(warm), summaries)
+        self.assertEqual(warm.requests, 0)
+
+    def test_failed_batch_is_skipped_and_retried_next_run(self):
+        failing = FakeChatAPI(fail_ids=["1005"])
+        summaries = self.summarize(failing)
+        self.assertEqual(failing.failed, 1)
+        self.assertEqual(len(summaries), 15)
+        self.assertNotIn(1005, summaries)
+
+        retry = FakeChatAPI()
+        self.assertEqual(len(self.summarize(retry)), 25)
+        self.assertEqual((retry.requests, retry.records), (1, 10))
+
+    def test_tabs_leave_failed_records_empty(self):
+        api = FakeChatAPI(fail_ids=["1001"])
+        summarizer = DealSummarizer(self.cache_path, base_url=api.start(), api_key="test", deals_per_prompt=10, max_retries=0)
+        state = ExportState()
+        state.companies[111111] = {"Company ID": 111111, "Company Name": "ACME"}
+        try:
+            (_, _, [deal_rows]), (_, _, [account_rows]) = summarizer.tabs(self.facts, state)
+        finally:
+            summarizer.close()
+            api.stop()
+        self.assertEqual([row[3] == "" for row in deal_rows], [True] * 10 + [False] * 15)  # erster Prompt (1001-1010) scheitert
+        self.assertEqual(account_rows, [[111111, "ACME", "ACME: 25."]])
+
+if __name__ == "__main__":
+    unittest.main()
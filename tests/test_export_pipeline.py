@@ -0,0 +1,111 @@
+import random
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from benchmarks.fake_hubspot import FakeHubSpot, FIRST_CREATEDATE
+from benchmarks.run import number_in_memory
+from benchmarks.memory_sheets import MemorySpreadsheet
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState, fetch_pages, fetch_pages_sharded, number_deals, synthesize
+from hubspot_sales_pipeline_analysis.exporter import export
+
+SEARCH_LIMIT = 250  # kleines Search-Limit, damit 600 Deals den Neustart an der Grenze auslösen
+
+
+class FakeHubSpotTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeHubSpot(deals=600)
+        self.client = HubSpotClient("token", base_url=self.fake.start(), burst=100000)
+        for target in ("hubspot_sales_pipeline_analysis.export_pipeline", "benchmarks.fake_hubspot"):
+            patch = mock.patch(f"{target}.SEARCH_RESULT_LIMIT", SEARCH_LIMIT)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def export_tabs(self, **kwargs):
+        spreadsheet = MemorySpreadsheet()
+        export(spreadsheet=spreadsheet, hubspot=self.client, seed=7, **kwargs)
+        return {sheet.title: sheet.rows for sheet in spreadsheet.sheets}
+
+
+class ShardedFetchTest(FakeHubSpotTestCase):
+    def test_shards_and_windows_match_the_serial_fetch(self):
+        serial = self.export_tabs()
+        self.assertEqual(self.export_tabs(shards=2, workers=2), serial)  # 300 Deals pro Shard: Neustart ab der letzten ID
+        self.assertEqual(self.export_tabs(window_days=45, workers=4), serial)
+        self.assertEqual(self.export_tabs(shards=3, engine="numpy"), self.export_tabs(engine="numpy"))
+
+    def test_search_restarts_at_the_result_limit(self):
+        since = (FIRST_CREATEDATE + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+        ids = [deal["id"] for page in fetch_pages(self.client, since) for deal in page]
+        # ohne Neustart antwortet die Fake-Search ab SEARCH_LIMIT mit 400; neu gestartet wird ab dem letzten
+        # hs_lastmodifieddate (GTE), der Deal an der Grenze kommt also zweimal
+        self.assertEqual(set(ids), {deal["id"] for deal in self.fake.deals})
+        self.assertGreater(len(ids), len(set(ids)))
+
+
+class SeededExportTest(FakeHubSpotTestCase):
+    def test_seed_does_not_touch_global_random(self):
+        random.seed(3)
+        expected = random.random()
+        random.seed(3)
+        first = self.export_tabs()
+        self.assertEqual(random.random(), expected)
+        self.assertEqual(self.export_tabs(), first)
+
+
+class SpoolNumberingTest(unittest.TestCase):
+    def test_same_rows_and_order_as_in_memory_numbering(self):
+        rng = random.Random(4)
+        deals = []
+        for i in range(2000):
+            # wenige Create Dates für viele Gleichstände, leere Amounts bleiben "" und Amounts bleiben Text
+            deals.append(({"id": str(i + 1), "properties": {
+                "dealname": f"Deal {i}", "amount": rng.choice(["", str(rng.randint(500, 50000))]),
+                "deal_type": "newbusiness", "createdate": f"2024-0{rng.randint(1, 3)}-{rng.randint(1, 28):02d}T10:00:00.000Z"
+            }}, f"Company {rng.randint(0, 80)}"))
+        stage_row_lists = list(synthesize(deals, ExportState(rng=random.Random(4))))
+        expected = [row for chunk in number_in_memory(stage_row_lists) for row in chunk]
+        self.assertEqual([row for chunk in number_deals(stage_row_lists, chunk_size=300) for row in chunk], expected)
+
+
+# Client, dessen erster Shard sofort scheitert, während die übrigen endlos Seiten liefern
+class FailingShardClient:
+    def __init__(self, failing_start):
+        self.failing_start = failing_start
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def post_json(self, path, json=None):
+        with self.lock:
+            self.requests += 1
+            next_id = self.requests * 100
+        if json["filterGroups"][0]["filters"][0]["value"] == str(self.failing_start):
+            time.sleep(0.2)  # erst scheitern, wenn die anderen Shards die Queue gefüllt haben
+            raise RuntimeError("shard failed")
+        results = [{"id": str(next_id + i), "properties": {}} for i in range(100)]
+        return {"results": results, "paging": {"next": {"after": "100"}}}
+
+    def post(self, path, json=None):
+        return mock.Mock(status_code=200, json=lambda: {"results": []})
+
+
+class ShardFailureTest(unittest.TestCase):
+    def test_first_failure_stops_the_other_shards(self):
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        client = FailingShardClient(int(start.timestamp() * 1000))
+        pages = fetch_pages_sharded(client, start, start + timedelta(days=40), shards=4, workers=4)
+        with self.assertRaisesRegex(RuntimeError, "shard failed"):
+            next(pages)
+        requests = client.requests
+        time.sleep(0.3)
+        self.assertEqual(client.requests, requests)  # keine Requests mehr nach dem Abbruch
+
+
+if __name__ == "__main__":
+    unittest.main()
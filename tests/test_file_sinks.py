@@ -0,0 +1,40 @@
+import tempfile
+import unittest
+
+import pyarrow.ipc
+import pyarrow.parquet as pq
+
+from hubspot_sales_pipeline_analysis.file_sinks import ParquetSink, ArrowSink
+
+HEADER = ["Deal ID", "Deal Name", "Amount", "Forecast Amount", "Close Date", "Days in Stage", "Deal Stage"]
+ROWS = [
+    [1001, "Deal A", "1200.50", 60.03, "2024-01-05", 3, "sql"],
+    [1002, "Deal B", None, "", "", "", "closedwon"],  # HubSpot "amount": null
+    [1003, None, "", "", None, None, "sql"]
+]
+
+
+class ArrowFileSinkTest(unittest.TestCase):
+    def check(self, table):
+        self.assertEqual(table.column("Amount").to_pylist(), [1200.5, None, None])
+        self.assertEqual(table.column("Forecast Amount").to_pylist(), [60.03, None, None])
+        self.assertEqual(table.column("Days in Stage").to_pylist(), [3, None, None])
+        self.assertEqual(table.column("Close Date").null_count, 2)
+        self.assertEqual(table.column("Deal Name").to_pylist(), ["Deal A", "Deal B", None])
+
+    def test_parquet_writes_null_and_empty_values_as_null(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            sink = ParquetSink(output_dir)
+            self.assertEqual(sink.write_tab("HubSpot - Deal", HEADER, [ROWS]), 3)
+            self.check(pq.read_table(sink.path("HubSpot - Deal")))
+
+    def test_arrow_writes_null_and_empty_values_as_null(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            sink = ArrowSink(output_dir)
+            sink.write_tab("HubSpot - Deal", HEADER, [ROWS])
+            with pyarrow.ipc.open_file(sink.path("HubSpot - Deal")) as reader:
+                self.check(reader.read_all())
+
+
+if __name__ == "__main__":
+    unittest.main()
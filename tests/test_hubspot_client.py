@@ -0,0 +1,197 @@
+import random
+import time
+import unittest
+from unittest import mock
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from benchmarks.memory_sheets import MemorySpreadsheet
+from hubspot_sales_pipeline_analysis import hubspot_client
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError, TokenBucket, AdaptiveLimiter
+from hubspot_sales_pipeline_analysis.exporter import export
+
+
+class StubResponse:
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+# Session, die der Reihe nach die vorgegebenen Status zurückgibt
+class StubSession:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return StubResponse(self.statuses.pop(0))
+
+
+def seeded_export(burst):
+    hubspot = FakeHubSpot(deals=600, burst=burst, interval=0.3)
+    url = hubspot.start()
+    try:
+        spreadsheet = MemorySpreadsheet()
+        export(spreadsheet=spreadsheet, hubspot=HubSpotClient("token", base_url=url, burst=10000, backoff=0.05), seed=7)
+        return {sheet.title: sheet.rows for sheet in spreadsheet.sheets}, hubspot.stats()["rate_limited"]
+    finally:
+        hubspot.stop()
+
+
+class RetryJitterTest(unittest.TestCase):
+    def test_retries_do_not_touch_global_random(self):
+        client = HubSpotClient("token", backoff=0.001)
+        client.session = StubSession([429, 503, 500, 200])
+        random.seed(7)
+        expected = random.random()
+        random.seed(7)
+        response = client.get("/crm/v3/objects/deals")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.session.calls, 4)
+        self.assertEqual(random.random(), expected)
+
+    def test_retries_do_not_change_seeded_output(self):
+        expected, _ = seeded_export(burst=None)
+        tabs, rate_limited = seeded_export(burst=3)
+        self.assertGreater(rate_limited, 0)
+        self.assertEqual(tabs, expected)
+
+
+# Uhr für TokenBucket-Tests: sleep() stellt nur die Zeit vor
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.slept = 0.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(hubspot_client, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_refills_evenly_up_to_capacity(self):
+        bucket = TokenBucket(burst=10, interval=10.0)  # 1 Token pro Sekunde
+        for _ in range(10):
+            bucket.acquire()
+        self.assertEqual(self.clock.slept, 0.0)
+        bucket.acquire()
+        self.assertAlmostEqual(self.clock.slept, 1.0)
+        self.clock.now += 60
+        bucket._refill()
+        self.assertEqual(bucket.tokens, 10)
+
+    def test_pause_holds_back_the_next_acquire(self):
+        bucket = TokenBucket(burst=10, interval=10.0)
+        bucket.pause(3.0)
+        self.assertEqual(bucket.tokens, -3.0)
+        bucket.acquire()
+        # 3 Sekunden Pause plus 1 Sekunde für das Token selbst
+        self.assertAlmostEqual(self.clock.slept, 4.0)
+
+    def test_daily_limit_is_enforced(self):
+        bucket = TokenBucket(burst=10, interval=10.0, daily_limit=2)
+        bucket.acquire()
+        bucket.acquire()
+        with self.assertRaises(RuntimeError):
+            bucket.acquire()
+
+
+class AdaptiveLimiterTest(unittest.TestCase):
+    def test_halves_on_decrease_and_grows_by_one(self):
+        limiter = AdaptiveLimiter(10)
+        steps = []
+        for _ in range(5):
+            limiter.decrease()
+            steps.append(limiter.limit)
+        self.assertEqual(steps, [5, 2, 1, 1, 1])
+        for _ in range(12):
+            limiter.increase()
+        self.assertEqual(limiter.limit, 10)
+
+
+# 🔹 Client gegen FakeHubSpot mit vorgegebenen 429/5xx-Antworten
+class ClientRetryTest(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeHubSpot(deals=20)
+        self.base_url = self.fake.start()
+
+    def tearDown(self):
+        self.fake.stop()
+
+    def client(self, **kwargs):
+        kwargs.setdefault("burst", 100000)
+        kwargs.setdefault("backoff", 0.001)
+        return HubSpotClient("token", base_url=self.base_url, **kwargs)
+
+    def requests_to(self, endpoint):
+        return self.fake.stats()["by_endpoint"].get(endpoint, 0)
+
+    def test_honors_retry_after(self):
+        for status in (429, 503):
+            with self.subTest(status=status):
+                client = self.client()
+                self.fake.script("GET", "/crm/v3/objects/deals", (status, {"Retry-After": "0.4"}))
+                started = time.monotonic()
+                deals = client.get_json("/crm/v3/objects/deals", params={"limit": 5})
+                self.assertGreaterEqual(time.monotonic() - started, 0.4)
+                self.assertEqual(len(deals["results"]), 5)
+
+    def test_syncs_bucket_from_rate_limit_headers(self):
+        client = self.client(burst=100)
+        self.fake.script("GET", "/crm/v3/objects/deals", (200, {
+            "X-HubSpot-RateLimit-Max": "100",
+            "X-HubSpot-RateLimit-Remaining": "3",
+            "X-HubSpot-RateLimit-Daily-Remaining": "50"
+        }))
+        client.get_json("/crm/v3/objects/deals")
+        self.assertLessEqual(client.bucket.tokens, 3.1)
+        self.assertEqual(client.bucket.daily_remaining, 50)
+        # Weniger als 10 % übrig: Limit halbiert (10 -> 5), der erfolgreiche Request erhöht es wieder um 1
+        self.assertEqual(client.limiter.limit, 6)
+
+    def test_429_shrinks_concurrency_and_success_grows_it(self):
+        client = self.client()
+        self.fake.script("GET", "/crm/v3/objects/deals", 429, 429)
+        client.get_json("/crm/v3/objects/deals")
+        self.assertEqual(self.requests_to("GET /crm/v3/objects/deals"), 3)
+        self.assertEqual(client.limiter.limit, 3)  # 10 -> 5 -> 2, dann +1
+        client.get_json("/crm/v3/objects/deals")
+        self.assertEqual(client.limiter.limit, 4)
+
+    def test_search_has_its_own_bucket(self):
+        client = self.client(search_rate=2)
+        body = {"filterGroups": [], "limit": 1}
+        started = time.monotonic()
+        for _ in range(4):
+            client.get_json("/crm/v3/objects/deals", params={"limit": 1})
+        self.assertLess(time.monotonic() - started, 0.4)
+        started = time.monotonic()
+        for _ in range(4):
+            client.post_json("/crm/v3/objects/deals/search", json=body)
+        # 2 Searches aus dem vollen Bucket, die nächsten 2 warten je 0,5 s
+        self.assertGreaterEqual(time.monotonic() - started, 0.9)
+        self.assertGreater(client.bucket.tokens, 100000 - 10)
+
+    def test_raises_hubspot_error_when_retries_run_out(self):
+        for status in (429, 503):
+            with self.subTest(status=status):
+                client = self.client(max_retries=2)
+                before = self.requests_to("GET /crm/v3/objects/deals")
+                self.fake.script("GET", "/crm/v3/objects/deals", status, status, status)
+                with self.assertRaises(HubSpotError) as caught:
+                    client.get_json("/crm/v3/objects/deals")
+                self.assertEqual(caught.exception.response.status_code, status)
+                self.assertEqual(self.requests_to("GET /crm/v3/objects/deals") - before, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from datetime import datetime
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.hubspot_deals_generator import (
+    synthesize_ndjson, replay_ndjson, load_progress, send_batch, random_deal, URL, BATCH_URL
+)
+
+
+# Fake HubSpot whose batch/create answers the `fail_on`-th call with 503
+class FlakyHubSpot(FakeHubSpot):
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+        self.batch_calls = 0
+
+    def create_deals(self, body):
+        self.batch_calls += 1
+        if self.batch_calls == self.fail_on:
+            return 503, {"status": "error", "message": "Service unavailable"}
+        return super().create_deals(body)
+
+
+class ReplayTest(unittest.TestCase):
+    def test_failed_batch_is_not_skipped_on_resume(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = synthesize_ndjson(os.path.join(tmp, "deals"), 450, shards=2, workers=1, seed=1, today=datetime(2025, 1, 31))
+            progress_file = os.path.join(tmp, "replay.json")
+            hubspot = FlakyHubSpot(fail_on=3)
+            client = HubSpotClient("token", base_url=hubspot.start(), max_retries=0)
+            try:
+                with self.assertRaises(HubSpotError):
+                    replay_ndjson(paths, client, progress_file=progress_file)
+                self.assertEqual(len(hubspot.deals), 200)
+                progress = load_progress(progress_file)
+                self.assertEqual(progress["file"], os.path.abspath(paths[0]))
+                self.assertEqual(progress["lines"], 200)
+
+                output = io.StringIO()
+                with redirect_stdout(output):
+                    replay_ndjson(paths, client, progress_file=progress_file, resume=True)
+            finally:
+                hubspot.stop()
+
+            # Die Deal-Nummern im Log zählen nach dem Resume in der ersten Datei bei 201 weiter
+            numbers = [int(line.split()[2]) for line in output.getvalue().splitlines() if line.startswith("✅")]
+            self.assertEqual(numbers, list(range(201, 226)) + list(range(1, 226)))
+            self.assertEqual(load_progress(progress_file)["lines"], 225)
+
+            # every deal exactly once, in file order
+            expected = [json.loads(line)["properties"] for path in paths for line in open(path, encoding="utf-8") if line.strip()]
+            created = [
+                {key: value for key, value in deal["properties"].items() if key not in ("hs_object_id", "hs_lastmodifieddate")}
+                for deal in hubspot.deals
+            ]
+            self.assertEqual(created, expected)
+
+
+class SendBatchTest(unittest.TestCase):
+    # 5 Deals, der dritte (Index 2) hat ein ungültiges amount
+    def batch(self):
+        rng = random.Random(3)
+        batch = [(i, random_deal(rng, datetime(2025, 1, 31))) for i in range(5)]
+        batch[2][1]["properties"]["amount"] = "n/a"
+        return batch
+
+    def send(self, hubspot):
+        client = HubSpotClient("token", base_url=hubspot.start(), max_retries=0)
+        output = io.StringIO()
+        try:
+            with redirect_stdout(output):
+                created = send_batch(client, self.batch())
+        finally:
+            hubspot.stop()
+        return created, output.getvalue().splitlines()
+
+    def assert_only_third_deal_failed(self, hubspot, created, lines):
+        self.assertEqual(created, 4)
+        errors = [line for line in lines if line.startswith("❌")]
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("❌ Error with Deal 3: VALIDATION_ERROR") or errors[0].startswith("❌ Error with Deal 3: 400"), errors[0])
+        self.assertIn("n/a", errors[0])
+        expected = [deal["properties"]["amount"] for i, deal in self.batch() if i != 2]
+        self.assertEqual([deal["properties"]["amount"] for deal in hubspot.deals], expected)
+
+    def test_multi_status_reports_the_failed_deal_by_trace_id(self):
+        hubspot = FakeHubSpot(partial_batches=True)
+        created, lines = self.send(hubspot)
+        self.assert_only_third_deal_failed(hubspot, created, lines)
+        self.assertTrue(lines[2].startswith("❌ Error with Deal 3: VALIDATION_ERROR"))
+        self.assertEqual(hubspot.stats()["by_endpoint"], {f"POST {BATCH_URL}": 1})
+
+    def test_rejected_batch_falls_back_to_single_posts(self):
+        hubspot = FakeHubSpot()
+        created, lines = self.send(hubspot)
+        self.assert_only_third_deal_failed(hubspot, created, lines)
+        self.assertTrue(lines[2].startswith("❌ Error with Deal 3: 400"))
+        self.assertEqual(hubspot.stats()["by_endpoint"], {f"POST {BATCH_URL}": 1, f"POST {URL}": 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+from unittest import mock
+
+from hubspot_sales_pipeline_analysis import metrics as metrics_module
+from hubspot_sales_pipeline_analysis.metrics import Metrics, endpoint_label
+
+ENDPOINT = "GET /crm/v3/objects/deals"
+
+
+# Uhr, die nur weiterläuft, wenn der Test sie stellt
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def perf_counter(self):
+        return self.now
+
+    def time(self):
+        return 1700000000.0
+
+
+class PrometheusTest(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics("export")
+        for seconds in (0.01, 0.3, 0.3):
+            self.metrics.observe_request(ENDPOINT, 200, seconds)
+        self.metrics.observe_request(ENDPOINT, 429, 20.0)  # über dem größten Bucket, landet nur in +Inf
+        self.metrics.retry(ENDPOINT, 429)
+        self.lines = self.metrics.prometheus().splitlines()
+
+    # Sample-Zeilen als {"name{labels}": Wert}
+    def samples(self):
+        return dict(line.rsplit(" ", 1) for line in self.lines if not line.startswith("#"))
+
+    def test_histogram_buckets_are_cumulative(self):
+        samples = self.samples()
+        histogram = "hubspot_export_http_request_duration_seconds"
+        expected = {"0.025": 1, "0.05": 1, "0.1": 1, "0.25": 1, "0.5": 3, "1.0": 3, "2.5": 3, "5.0": 3, "10.0": 3, "+Inf": 4}
+        for bound, count in expected.items():
+            self.assertEqual(samples[f'{histogram}_bucket{{endpoint="{ENDPOINT}",le="{bound}"}}'], str(count))
+        self.assertEqual(float(samples[f'{histogram}_sum{{endpoint="{ENDPOINT}"}}']), 20.61)
+        self.assertEqual(samples[f'{histogram}_count{{endpoint="{ENDPOINT}"}}'], "4")
+
+    def test_counter_names_and_labels(self):
+        names = [line.split()[2] for line in self.lines if line.startswith("# TYPE")]
+        self.assertEqual(names[:5], [
+            "hubspot_export_phase_seconds", "hubspot_export_phase_rows", "hubspot_export_http_requests",
+            "hubspot_export_http_retries", "hubspot_export_http_request_duration_seconds"
+        ])
+        self.assertIn("# TYPE hubspot_export_http_request_duration_seconds histogram", self.lines)
+        self.assertIn(f'hubspot_export_http_requests{{endpoint="{ENDPOINT}",status="200"}} 3', self.lines)
+        self.assertIn(f'hubspot_export_http_requests{{endpoint="{ENDPOINT}",status="429"}} 1', self.lines)
+        self.assertIn(f'hubspot_export_http_retries{{endpoint="{ENDPOINT}",reason="429"}} 1', self.lines)
+        self.assertIn("hubspot_export_rate_limited 1", self.lines)
+
+    def test_summary_keeps_per_bucket_counts(self):
+        entry = self.metrics.summary()["http"][ENDPOINT]
+        self.assertEqual(entry["requests"], 4)
+        self.assertEqual(entry["status"], {"200": 3, "429": 1})
+        self.assertEqual(entry["retries"], {"429": 1})
+        self.assertEqual(entry["latency_buckets"]["0.025"], 1)
+        self.assertEqual(entry["latency_buckets"]["0.5"], 2)
+        self.assertEqual(entry["latency_buckets"]["+Inf"], 1)
+
+    def test_endpoint_label_drops_host_query_and_ids(self):
+        self.assertEqual(endpoint_label("GET", "https://api.hubapi.com/crm/v3/objects/companies/123?properties=name"),
+                         "GET /crm/v3/objects/companies/{id}")
+
+
+class PhaseTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(metrics_module, "time", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_phase_is_subtracted_from_outer(self):
+        metrics = Metrics()
+        with metrics.phase("export"):
+            self.clock.now += 1
+            with metrics.phase("write"):
+                self.clock.now += 3
+            self.clock.now += 2
+        with metrics.phase("write"):
+            self.clock.now += 0.5
+        phases = metrics.summary()["phases"]
+        self.assertEqual(phases["export"]["seconds"], 3.0)
+        self.assertEqual(phases["write"]["seconds"], 3.5)
+
+    def test_timed_generator_excludes_upstream_and_counts_rows(self):
+        metrics = Metrics()
+
+        def fetch():
+            for page in ([1, 2], [3]):
+                self.clock.now += 1
+                yield page
+
+        def synthesize(pages):
+            for page in pages:
+                self.clock.now += 2
+                yield page * 2
+
+        rows = list(metrics.timed("synthesize", synthesize(metrics.timed("fetch", fetch()))))
+        self.assertEqual(rows, [[1, 2, 1, 2], [3, 3]])
+        phases = metrics.summary()["phases"]
+        self.assertEqual(phases["fetch"], {"seconds": 2.0, "rows": 3})
+        self.assertEqual(phases["synthesize"], {"seconds": 4.0, "rows": 6})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from benchmarks.memory_sheets import MemorySpreadsheet
+from hubspot_sales_pipeline_analysis.metrics import Metrics
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState, IdSpaceError
+from hubspot_sales_pipeline_analysis.exporter import DEAL_TAB, COMPANY_TAB, OWNER_TAB
+from hubspot_sales_pipeline_analysis.multi_portal import PORTAL_ID_SPACE, export_portal, export_portals, id_starts, read_spool
+
+
+class PortalMetricsTest(unittest.TestCase):
+    def test_hubspot_requests_of_each_portal_are_merged(self):
+        fakes = [FakeHubSpot(deals=120, seed=1), FakeHubSpot(deals=80, seed=2)]
+        portals = [{"name": f"portal-{index}", "token": "token", "base_url": fake.start()} for index, fake in enumerate(fakes)]
+        try:
+            metrics = Metrics()
+            export_portals(portals, spreadsheet=MemorySpreadsheet(), seed=7, metrics=metrics)
+            served = sum(fake.stats()["requests"] for fake in fakes)
+        finally:
+            for fake in fakes:
+                fake.stop()
+
+        summary = metrics.summary()
+        hubspot = {endpoint: entry for endpoint, entry in summary["http"].items() if not endpoint.startswith("SHEETS ")}
+        self.assertGreater(served, 0)
+        self.assertEqual(sum(entry["requests"] for entry in hubspot.values()), served)
+        for entry in hubspot.values():
+            self.assertEqual(sum(entry["latency_buckets"].values()), entry["requests"])
+        self.assertEqual(summary["phases"]["number"]["rows"], summary["phases"]["portals"]["rows"])
+
+
+class PortalMergeTest(unittest.TestCase):
+    def setUp(self):
+        self.fakes = [FakeHubSpot(deals=120, seed=1), FakeHubSpot(deals=80, seed=2)]
+        self.portals = [{"name": f"portal-{index}", "token": "token", "base_url": fake.start()} for index, fake in enumerate(self.fakes)]
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        for fake in self.fakes:
+            fake.stop()
+        self.tmp.cleanup()
+
+    # Ein Portal im Testprozess exportieren, gibt (Ergebnis, nummerierte Deal-Zeilen) zurück
+    def export_portal(self, index, **kwargs):
+        spool_file = os.path.join(self.tmp.name, f"portal-{index}.pickle")
+        result = export_portal(self.portals[index], index, spool_file, seed=7, **kwargs)
+        return result, [row for chunk in read_spool(spool_file) for row in chunk]
+
+    def test_portals_get_disjoint_id_ranges(self):
+        deal_ids, company_ids = [], []
+        for index in range(len(self.portals)):
+            result, rows = self.export_portal(index)
+            starts = id_starts(index)
+            deal_ids.append({row[0] for row in rows})
+            company_ids.append({row[1] for row in rows} | set(result["companies"]))
+            self.assertTrue(all(starts["deal_id_start"] <= deal_id < starts["deal_id_start"] + PORTAL_ID_SPACE for deal_id in deal_ids[-1]))
+            self.assertTrue(all(starts["company_id_start"] <= company_id < starts["company_id_start"] + PORTAL_ID_SPACE
+                                for company_id in company_ids[-1]))
+        self.assertEqual(len(deal_ids[0]), 120)
+        self.assertEqual(len(deal_ids[1]), 80)
+        self.assertFalse(deal_ids[0] & deal_ids[1])
+        self.assertFalse(company_ids[0] & company_ids[1])
+
+    def test_merged_company_and_owner_rows(self):
+        spreadsheet = MemorySpreadsheet()
+        export_portals(self.portals, spreadsheet=spreadsheet, seed=7)
+
+        # Erwartung aus den einzelnen Portalen: Companies in Portal-Reihenfolge, jeder Sales Rep genau einmal
+        expected = ExportState()
+        portal_companies = 0
+        for index in range(len(self.portals)):
+            result, _ = self.export_portal(index)
+            portal_companies += len(result["companies"])
+            expected.companies.update(result["companies"])
+            for sales_reps_id, sales_reps in result["sales_reps"].items():
+                expected.sales_reps.setdefault(sales_reps_id, sales_reps)
+        self.assertEqual(len(expected.companies), portal_companies)  # keine Company überschreibt eine aus einem anderen Portal
+        self.assertEqual(spreadsheet.worksheet(COMPANY_TAB).rows[1:], expected.company_rows())
+        self.assertCountEqual(spreadsheet.worksheet(OWNER_TAB).rows[1:], expected.owner_rows())
+        self.assertLessEqual({row[1] for row in spreadsheet.worksheet(DEAL_TAB).rows[1:]}, set(expected.companies))
+
+    def test_running_out_of_id_space_raises(self):
+        with mock.patch("hubspot_sales_pipeline_analysis.multi_portal.PORTAL_ID_SPACE", 100):
+            with self.assertRaisesRegex(ValueError, "portal-0"):
+                self.export_portal(0)  # 120 Deals passen nicht in 100 IDs
+            self.export_portal(1)      # 80 Deals schon
+
+    def test_overflow_leaves_the_store_unchanged(self):
+        self.portals[1]["store"] = os.path.join(self.tmp.name, "portal-1.db")
+
+        def snapshot():
+            store = DealStore(self.portals[1]["store"])
+            try:
+                return list(store.iter_deals()), store.load_companies(), store.get_state("high_water_mark")
+            finally:
+                store.close()
+
+        with mock.patch("hubspot_sales_pipeline_analysis.multi_portal.PORTAL_ID_SPACE", 100):
+            self.export_portal(1)
+            before = snapshot()
+            for number in range(30):
+                self.fakes[1].add_deal({
+                    "dealname": f"Overflow {number}", "amount": "100", "deal_type": "newbusiness",
+                    "createdate": "2024-06-01T00:00:00.000Z", "company_name": ""
+                })
+            with self.assertRaises(IdSpaceError):
+                self.export_portal(1)
+            self.assertEqual(snapshot(), before)
+            with self.assertRaises(IdSpaceError):
+                self.export_portal(1)  # der nächste Lauf scheitert genauso, statt an kaputten IDs aus dem Store
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState, synthesize, number_deals
+from hubspot_sales_pipeline_analysis.row_table import number_deals_columnar
+
+
+def stage_row_lists(seed=3, count=3000):
+    rng = random.Random(seed)
+    deals = []
+    for i in range(count):
+        # wenige Create Dates, damit es viele Gleichstände innerhalb einer Company gibt
+        create_date = f"2024-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}T10:00:00.000Z"
+        amount = rng.choice(["", None, str(rng.randint(500, 50000)), f"{rng.randint(500, 50000)}.{rng.randint(0, 99):02d}"])
+        deal = {"id": str(i + 1), "properties": {
+            "dealname": f"Deal {i}", "amount": amount, "deal_type": rng.choice(["newbusiness", "existingbusiness"]),
+            "createdate": create_date if i % 97 else "not a date"
+        }}
+        deals.append((deal, f"Company {rng.randint(0, 120)}"))
+    return list(synthesize(deals, ExportState(rng=random.Random(seed))))
+
+
+class ColumnarNumberingTest(unittest.TestCase):
+    def test_same_rows_and_order_as_sqlite_spool(self):
+        rows = stage_row_lists()
+        expected = [row for chunk in number_deals(rows, chunk_size=500) for row in chunk]
+        numbered = [row for chunk in number_deals_columnar(rows, chunk_size=500) for row in chunk]
+        self.assertEqual(numbered, expected)
+        self.assertEqual([row[14] for row in numbered], [row[14] for row in expected])  # Deal Number
+
+    def test_empty_input(self):
+        self.assertEqual(list(number_deals_columnar([])), list(number_deals([])))
+
+
+if __name__ == "__main__":
+    unittest.main()
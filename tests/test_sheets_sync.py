@@ -0,0 +1,97 @@
+import random
+import unittest
+
+from hubspot_sales_pipeline_analysis.export_pipeline import OWNER_HEADER, ExportState
+from benchmarks.memory_sheets import MemoryWorksheet
+from hubspot_sales_pipeline_analysis.sheets_sync import sync_sheet, column_letter, cell_text, OWNER_KEY
+
+HEADER = ["Deal ID", "Entered Stage Date", "Deal Name", "Amount"]
+KEY = ("Deal ID", "Entered Stage Date")
+
+
+# MemoryWorksheet, das sich zusätzlich die Argumente von delete_rows und batch_update merkt
+class RecordingWorksheet(MemoryWorksheet):
+    def __init__(self, rows=None):
+        super().__init__("Deals", rows)
+        self.deleted = []
+        self.ranges = []
+
+    def delete_rows(self, start_index, end_index=None):
+        self.deleted.append((start_index, end_index))
+        super().delete_rows(start_index, end_index)
+
+    def batch_update(self, data, **kwargs):
+        self.ranges.extend(update["range"] for update in data)
+        super().batch_update(data, **kwargs)
+
+
+def deal_rows(count):
+    return [[1000 + i, "2024-01-01", f"Deal {i}", 100 * i] for i in range(count)]
+
+
+class SyncSheetTest(unittest.TestCase):
+    def test_empty_sheet_gets_header_and_appended_rows(self):
+        sheet = RecordingWorksheet()
+        stats = sync_sheet(sheet, HEADER, [deal_rows(3), deal_rows(5)[3:]], KEY)
+        self.assertEqual(sheet.rows, [HEADER] + deal_rows(5))
+        self.assertEqual(stats["rows_appended"], 5)
+        self.assertEqual(stats["cells_written"], len(HEADER) * 6)
+        self.assertEqual(stats["rows_deleted"], 0)
+
+    def test_unchanged_rows_write_nothing(self):
+        # Sheets liefert Zahlen unformatiert als float zurück, 100.0 und 100 sind derselbe Wert
+        existing = [HEADER] + [[float(row[0]), row[1], row[2], float(row[3])] for row in deal_rows(4)]
+        sheet = RecordingWorksheet(existing)
+        stats = sync_sheet(sheet, HEADER, [deal_rows(4)], KEY)
+        self.assertEqual(sheet.calls, ["get_all_values"])
+        self.assertEqual(stats["cells_written"], 0)
+        self.assertEqual(stats["cells_unchanged"], 4 * len(HEADER))
+
+    def test_only_changed_cells_are_written(self):
+        sheet = RecordingWorksheet([HEADER] + deal_rows(4))
+        rows = deal_rows(4)
+        rows[1][3] = 999
+        rows[2][2:4] = ["Renamed", 1]
+        stats = sync_sheet(sheet, HEADER, [rows], KEY)
+        self.assertEqual(sheet.ranges, ["D3:D3", "C4:D4"])
+        self.assertEqual(stats["cells_written"], 3)
+        self.assertEqual(stats["cells_unchanged"], 4 * len(HEADER) - 3)
+        self.assertEqual(stats["rows_updated"], 2)
+        self.assertEqual([[cell_text(value) for value in row] for row in sheet.rows[1:]], [[cell_text(value) for value in row] for row in rows])
+
+    def test_new_and_stale_rows(self):
+        sheet = RecordingWorksheet([HEADER] + deal_rows(8))
+        rows = [row for i, row in enumerate(deal_rows(8)) if i not in (1, 4, 5, 6)] + [[2000, "2024-02-01", "New", 5]]
+        stats = sync_sheet(sheet, HEADER, [rows], KEY)
+        # von unten nach oben, benachbarte Zeilen (6-8) in einem Aufruf
+        self.assertEqual(sheet.deleted, [(6, 8), (3, 3)])
+        self.assertEqual(stats["rows_deleted"], 4)
+        self.assertEqual(stats["rows_appended"], 1)
+        self.assertEqual(sheet.rows, [HEADER] + rows)
+
+    def test_duplicate_keys_in_sheet_are_removed(self):
+        sheet = RecordingWorksheet([HEADER] + deal_rows(3) + deal_rows(2))
+        stats = sync_sheet(sheet, HEADER, [deal_rows(3)], KEY)
+        self.assertEqual(sheet.rows, [HEADER] + deal_rows(3))
+        self.assertEqual(stats["rows_deleted"], 2)
+
+    def test_changed_header_is_rewritten(self):
+        sheet = RecordingWorksheet([["Old"] + HEADER[1:]] + deal_rows(2))
+        sync_sheet(sheet, HEADER, [deal_rows(2)], KEY)
+        self.assertEqual(sheet.rows[0], HEADER)
+        self.assertEqual(sheet.ranges, [f"A1:{column_letter(len(HEADER))}1"])
+
+
+    def test_unchanged_sales_reps_write_nothing(self):
+        sheet = RecordingWorksheet()
+        for seed in (1, 2):
+            state = ExportState(rng=random.Random(seed))
+            for sales_reps_id in range(1001, 1016):
+                state.record_sales_rep(sales_reps_id)
+            stats = sync_sheet(sheet, OWNER_HEADER, [state.owner_rows()], OWNER_KEY)
+        self.assertEqual(stats["cells_written"], 0)
+        self.assertEqual(stats["cells_unchanged"], 15 * len(OWNER_HEADER))
+
+
+if __name__ == "__main__":
+    unittest.main()
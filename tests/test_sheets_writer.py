@@ -0,0 +1,68 @@
+import unittest
+
+from benchmarks.memory_sheets import MemorySpreadsheet, MemoryWorksheet
+from hubspot_sales_pipeline_analysis.sheets_writer import SheetsWriter
+
+
+class APIError(Exception):
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.response = type("Response", (), {"status_code": status_code})()
+
+
+# Worksheet, dessen erstes append_rows mit `status` scheitert; bei 5xx erst nachdem die Zeilen schon angekommen sind
+class FlakyWorksheet(MemoryWorksheet):
+    def __init__(self, title, status, sheet_id=0):
+        super().__init__(title, sheet_id=sheet_id)
+        self.status = status
+
+    def append_rows(self, values, **kwargs):
+        if self.status is None:
+            return super().append_rows(values, **kwargs)
+        status, self.status = self.status, None
+        if status >= 500:
+            super().append_rows(values, **kwargs)
+        raise APIError(status)
+
+
+class RecordingSpreadsheet(MemorySpreadsheet):
+    def __init__(self, titles=()):
+        super().__init__(titles)
+        self.bodies = []
+
+    def batch_update(self, body):
+        self.bodies.append(body)
+        super().batch_update(body)
+
+
+ROWS = [[1, "a"], [2, "b"]]
+
+
+class SheetsWriterTest(unittest.TestCase):
+    def test_append_is_retried_after_429(self):
+        spreadsheet = MemorySpreadsheet()
+        spreadsheet.sheets.append(FlakyWorksheet("Deals", 429))
+        SheetsWriter(spreadsheet, backoff=0).write_tab("Deals", ["ID", "Name"], [ROWS])
+        self.assertEqual(spreadsheet.worksheet("Deals").rows, [["ID", "Name"]] + ROWS)
+
+    def test_append_is_not_retried_after_5xx(self):
+        spreadsheet = MemorySpreadsheet()
+        spreadsheet.sheets.append(FlakyWorksheet("Deals", 503))
+        with self.assertRaises(APIError):
+            SheetsWriter(spreadsheet, backoff=0).write_tab("Deals", ["ID", "Name"], [ROWS])
+        self.assertEqual(spreadsheet.worksheet("Deals").rows, [["ID", "Name"]] + ROWS)  # nicht doppelt
+
+    def test_staging_swap_copies_only_the_written_range(self):
+        spreadsheet = RecordingSpreadsheet(["Deals"])
+        SheetsWriter(spreadsheet, staging=True).write_tab("Deals", ["ID", "Name", "Extra"], [ROWS])
+        self.assertEqual(spreadsheet.worksheet("Deals").rows, [["ID", "Name", "Extra"]] + ROWS)
+        self.assertEqual([sheet.title for sheet in spreadsheet.sheets], ["Deals"])
+        requests = spreadsheet.bodies[-1]["requests"]
+        grid = requests[0]["updateSheetProperties"]["properties"]["gridProperties"]
+        source = requests[2]["copyPaste"]["source"]
+        self.assertEqual((grid["rowCount"], grid["columnCount"]), (3, 3))
+        self.assertEqual((source["endRowIndex"], source["endColumnIndex"]), (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
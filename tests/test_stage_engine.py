@@ -0,0 +1,37 @@
+import random
+import unittest
+
+import numpy as np
+
+from hubspot_sales_pipeline_analysis.export_pipeline import build_stage_rows
+from hubspot_sales_pipeline_analysis.stage_engine import StageHistoryEngine
+
+
+class StageEngineTest(unittest.TestCase):
+    def test_stage_rows_match_build_stage_rows(self):
+        rng = random.Random(2)
+        deals = [
+            {"createdate": "2024-03-01", "amount": f"{rng.randint(100, 99999)}.{rng.randint(0, 99):02d}", "dealname": "Deal", "deal_type": "newbusiness"}
+            for _ in range(2000)
+        ]
+        deals.append({"createdate": "2024-03-01", "amount": "41997.74", "dealname": "Deal", "deal_type": "newbusiness"})
+        deals.append({"createdate": "2024-03-01", "amount": "", "dealname": "Deal", "deal_type": "newbusiness"})
+        engine = StageHistoryEngine(1)
+        samples = engine.sample(len(deals))
+        deal_ids = list(range(len(deals)))
+        rows = engine.stage_rows(deals, [111111] * len(deals), deal_ids, ["newbusiness"] * len(deals), samples)
+        expected = [
+            row for i, deal in enumerate(deals)
+            for row in build_stage_rows(deal, 111111, i, engine.history(samples, i, "newbusiness"))
+        ]
+        self.assertEqual(rows, expected)
+
+    def test_forecast_amount_rounds_like_python(self):
+        engine = StageHistoryEngine(1)
+        samples = {"path_index": np.array([0]), "sales_reps_id": np.array([1001]), "day_offsets": np.full((1, 6), 2)}
+        rows = engine.stage_rows([{"createdate": "2024-03-01", "amount": "41997.74"}], [111111], [1001], ["newbusiness"], samples)
+        self.assertEqual(rows[2][5], 10499.43)  # qualifiedtobuy, probability 0.25
+
+
+if __name__ == "__main__":
+    unittest.main()
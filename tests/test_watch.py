@@ -0,0 +1,250 @@
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import requests
+from gspread.exceptions import APIError
+
+from benchmarks.fake_hubspot import FakeHubSpot
+from benchmarks.memory_sheets import MemorySpreadsheet
+from hubspot_sales_pipeline_analysis.hubspot_client import HubSpotClient, HubSpotError
+from hubspot_sales_pipeline_analysis.company_resolver import CompanyResolver
+from hubspot_sales_pipeline_analysis.deal_store import DealStore
+from hubspot_sales_pipeline_analysis.export_pipeline import ExportState
+from hubspot_sales_pipeline_analysis.sheets_sync import cell_text
+from hubspot_sales_pipeline_analysis.exporter import DEAL_TAB, COMPANY_TAB, OWNER_TAB, export
+from hubspot_sales_pipeline_analysis.watch import (
+    ChangeQueue, DealWatcher, PENDING_KEY, WEBHOOK_PATH, serve_webhooks, send_webhook, watch_deals
+)
+
+TABS = (DEAL_TAB, COMPANY_TAB, OWNER_TAB)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def normalized(rows):
+    return sorted(tuple(cell_text(value) for value in row) for row in rows)
+
+
+def deal_names(spreadsheet):
+    return {row[3] for row in spreadsheet.worksheet(DEAL_TAB).rows[1:]}
+
+
+# Fehler wie gspread ihn bei einer Sheets-Antwort mit Status 500 wirft
+def sheets_error(status=500):
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({"error": {"code": status, "message": "backend error", "status": "INTERNAL"}}).encode()
+    return APIError(response)
+
+
+class WatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fake = FakeHubSpot(deals=400)
+        self.fake.update_deal("11", {"dealname": "Doomed"})
+        self.client = HubSpotClient("token", base_url=self.fake.start(), burst=100000)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store_path = os.path.join(self.tmp.name, "store.db")
+        self.spreadsheet = MemorySpreadsheet(TABS)
+        export(spreadsheet=self.spreadsheet, hubspot=self.client, store_path=self.store_path, seed=5, sync="diff")
+
+    def tearDown(self):
+        self.fake.stop()
+        self.tmp.cleanup()
+
+    # Erwartung: kompletter Neuaufbau aus demselben Store in ein leeres Spreadsheet
+    def assert_matches_rebuild(self):
+        rebuilt = MemorySpreadsheet(TABS)
+        export(spreadsheet=rebuilt, hubspot=self.client, store_path=self.store_path, sync="diff")
+        for tab in TABS:
+            self.assertEqual(normalized(self.spreadsheet.worksheet(tab).rows), normalized(rebuilt.worksheet(tab).rows), tab)
+
+    def watcher(self, store, client=None):
+        client = client or self.client
+        watcher = DealWatcher(client, store, self.spreadsheet, CompanyResolver(client), ExportState.from_store(store))
+        watcher.writer.backoff = 0
+        return watcher
+
+
+class WatchDealsTest(WatchTestCase):
+    def test_webhooks_and_poll_update_only_the_affected_companies(self):
+        for tab in TABS:
+            self.spreadsheet.worksheet(tab).calls.clear()
+        listen = f"127.0.0.1:{free_port()}"
+        stop = threading.Event()
+        thread = threading.Thread(target=watch_deals, args=(self.store_path,), daemon=True, kwargs=dict(
+            spreadsheet=self.spreadsheet, hubspot=self.client, listen=listen, client_secret="secret",
+            debounce=0.2, max_wait=1, poll_interval=1, stop=stop
+        ))
+        thread.start()
+        url = f"http://{listen}{WEBHOOK_PATH}"
+        for _ in range(50):
+            try:
+                send_webhook(url, [], client_secret="secret")
+                break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+
+        updated = [str(deal_id) for deal_id in range(20, 40)]
+        for deal_id in updated:
+            self.fake.update_deal(deal_id, {"dealname": f"Updated {deal_id}", "amount": "12345"})
+        self.fake.update_deal("10", {"createdate": "2023-01-01T00:00:00.000Z"})  # ändert die Deal Numbers der Company
+        self.fake.delete_deal("11")
+        created = self.fake.add_deal({
+            "dealname": "New on existing company", "amount": "500", "deal_type": "newbusiness",
+            "createdate": "2024-06-01T00:00:00.000Z", "company_name": ""
+        }, "900003")
+        self.fake.companies["999999"] = "Brand New Co"
+        created_with_company = self.fake.add_deal({
+            "dealname": "New on new company", "amount": "700", "deal_type": "newbusiness",
+            "createdate": "2024-06-02T00:00:00.000Z", "company_name": ""
+        }, "999999")
+        send_webhook(url, updated + ["10"], client_secret="secret")
+        send_webhook(url, [created, created_with_company], "deal.creation", client_secret="secret")
+        send_webhook(url, ["11"], "deal.deletion", client_secret="secret")
+        self.fake.update_deal("12", {"dealname": "Polled"})  # kein Webhook: nur das Polling findet diese Änderung
+
+        expected = {f"Updated {deal_id}" for deal_id in updated} | {"New on existing company", "New on new company", "Polled"}
+        deadline = time.monotonic() + 15
+        while time.monotonic() < deadline and not (expected <= deal_names(self.spreadsheet) and "Doomed" not in deal_names(self.spreadsheet)):
+            time.sleep(0.1)
+        stop.set()
+        thread.join(10)
+
+        names = deal_names(self.spreadsheet)
+        self.assertLessEqual(expected, names)
+        self.assertNotIn("Doomed", names)
+        self.assertIn("Brand New Co", {row[1] for row in self.spreadsheet.worksheet(COMPANY_TAB).rows})
+        self.assertNotIn("clear", self.spreadsheet.worksheet(DEAL_TAB).calls)
+        self.assert_matches_rebuild()
+
+
+class SheetsFailureTest(WatchTestCase):
+    def fail_batch_update(self, failures):
+        sheet = self.spreadsheet.worksheet(DEAL_TAB)
+        remaining = [failures]
+
+        def batch_update(data, **kwargs):
+            if remaining[0]:
+                remaining[0] -= 1
+                raise sheets_error()
+            return type(sheet).batch_update(sheet, data, **kwargs)
+
+        sheet.batch_update = batch_update
+        return remaining
+
+    def test_transient_errors_are_retried(self):
+        store = DealStore(self.store_path)
+        watcher = self.watcher(store)
+        remaining = self.fail_batch_update(2)
+        self.fake.update_deal("20", {"dealname": "Retried"})
+        watcher.apply(watcher.fetch_deals(["20"]))
+        store.close()
+        self.assertEqual(remaining, [0])
+        self.assertIn("Retried", deal_names(self.spreadsheet))
+        self.assert_matches_rebuild()
+
+    def test_failed_write_is_resynced_after_restart(self):
+        store = DealStore(self.store_path)
+        watcher = self.watcher(store)
+        self.fail_batch_update(100)
+        self.fake.update_deal("20", {"dealname": "After outage"})
+        self.fake.delete_deal("11")
+        with self.assertRaises(APIError):
+            watcher.apply(watcher.fetch_deals(["20"]), ["11"])
+        self.assertNotIn("After outage", deal_names(self.spreadsheet))
+        store.close()
+
+        # Neuer Prozess: HubSpot meldet nichts Neues mehr, die ausstehenden Companies stehen aber im Store
+        del self.spreadsheet.worksheet(DEAL_TAB).batch_update
+        store = DealStore(self.store_path)
+        watcher = self.watcher(store)
+        self.assertTrue(watcher.pending)
+        watcher.poll()
+        self.assertEqual(watcher.pending, set())
+        self.assertEqual(store.get_state(PENDING_KEY), "[]")
+        store.close()
+        names = deal_names(self.spreadsheet)
+        self.assertIn("After outage", names)
+        self.assertNotIn("Doomed", names)
+        self.assert_matches_rebuild()
+
+
+# Client, dessen erste Search scheitert: der Abgleich beim Start von DealWatcher.run
+class FlakySearchClient(HubSpotClient):
+    failures = 1
+
+    def post_json(self, path, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise HubSpotError(mock.Mock(status_code=502, text="Bad Gateway"))
+        return super().post_json(path, **kwargs)
+
+
+class DealWatcherTest(WatchTestCase):
+    def test_failed_startup_poll_is_retried(self):
+        self.fake.update_deal("20", {"dealname": "Missed while down"})
+        client = FlakySearchClient("token", base_url=self.client.base_url, burst=100000)
+        stop = threading.Event()
+
+        # Store im Thread der Schleife öffnen, SQLite-Verbindungen gehören zu ihrem Thread
+        def run():
+            store = DealStore(self.store_path)
+            try:
+                self.watcher(store, client).run(ChangeQueue(), poll_interval=0.2, stop=stop)
+            finally:
+                store.close()
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline and "Missed while down" not in deal_names(self.spreadsheet):
+            time.sleep(0.05)
+        stop.set()
+        thread.join(10)
+        self.assertEqual(client.failures, 0)
+        self.assertIn("Missed while down", deal_names(self.spreadsheet))
+
+    def test_deletion_recounts_the_company(self):
+        store = DealStore(self.store_path)
+        watcher = self.watcher(store)
+        company_id = store.get_deal("11")["company_id"]
+        self.fake.delete_deal("11")
+        watcher.apply([], ["11"])
+        _, company_mapping = store.load_companies()
+        comp_info = company_mapping[watcher.state.companies[company_id]["Company Name"]]
+        self.assertEqual((comp_info["deal_count"], comp_info["first_closed_won"]), store.company_stats(company_id))
+        self.assertEqual(watcher.state.company_mapping, company_mapping)
+        store.close()
+
+
+class WebhookTest(unittest.TestCase):
+    def test_signature_is_checked(self):
+        changes = ChangeQueue()
+        server = serve_webhooks(changes, port=0, client_secret="secret")
+        url = f"http://127.0.0.1:{server.server_port}{WEBHOOK_PATH}"
+        try:
+            with self.assertRaises(requests.HTTPError) as raised:
+                send_webhook(url, ["1"], client_secret="wrong")
+            self.assertEqual(raised.exception.response.status_code, 401)
+            with self.assertRaises(requests.HTTPError):
+                send_webhook(url, ["1"])
+            self.assertEqual(send_webhook(url, ["1", "2"], client_secret="secret"), 204)
+            self.assertEqual(send_webhook(url, ["3"], "deal.deletion", client_secret="secret"), 204)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(changes.take(debounce=0, max_wait=0, timeout=0), ({"1", "2"}, {"3"}))
+
+
+if __name__ == "__main__":
+    unittest.main()